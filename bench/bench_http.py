@@ -0,0 +1,137 @@
+"""
+Load test for the Shell Dash JSON move API (shelldash.py --http).
+
+Starts the API in a child process and has a number of clients, each on one
+keep-alive connection, play complete games against a bot for a fixed
+number of requests. Reports requests per second, round-trip latency
+percentiles, the average response size and the server's CPU time per
+request:
+
+    python bench/bench_http.py --clients 8 --requests 2000
+
+Every game is seeded, so repeated runs play the same boards.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+
+from bench_server import percentile, server_cpu_seconds, start_server
+
+
+class Client:
+    """One keep-alive HTTP connection to the API."""
+    
+    def __init__(self, reader, writer, latencies):
+        self.reader = reader
+        self.writer = writer
+        self.latencies = latencies
+        self.response_bytes = 0
+    
+    async def call(self, endpoint, payload):
+        """POST a JSON payload and return (status code, decoded body)."""
+        body = json.dumps(payload).encode()
+        start = time.perf_counter_ns()
+        self.writer.write(f"POST /api/{endpoint} HTTP/1.1\r\nHost: localhost\r\n"
+                          "Content-Type: application/json\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line == b'\r\n':
+                break
+            name, _, value = line.partition(b':')
+            if name.lower() == b'content-length':
+                length = int(value)
+        data = await self.reader.readexactly(length)
+        self.latencies.append(time.perf_counter_ns() - start)
+        self.response_bytes += len(data)
+        return status, json.loads(data)
+
+
+async def play(port, requests, latencies, opponent):
+    """Play games back to back until this client has sent its share of requests."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    client = Client(reader, writer, latencies)
+    sent = 0
+    while sent < requests:
+        _, game = await client.call('new_game', {'opponent': opponent})
+        sent += 1
+        move = {'game': game['game'], 'token': game['token']}
+        revealed = set()
+        row, winner = 0, None
+        while winner is None and sent < requests:
+            if game.get('awaiting_flip_flop'):
+                status, game = await client.call('use_flip_flop', dict(move, use=True))
+            else:
+                col = next(c for c in range(3) if (row, c) not in revealed)
+                revealed.add((row, col))
+                status, game = await client.call('reveal', dict(move, col=col))
+            sent += 1
+            if any(event['type'] == 'end' for event in game['events']):
+                revealed.clear()
+            row, winner = game['current_row'], game['winner']
+    writer.close()
+    return client.response_bytes
+
+
+async def run(port, pid, clients, requests, opponent):
+    latencies = []
+    cpu_before = server_cpu_seconds(pid)
+    start = time.perf_counter()
+    sizes = await asyncio.gather(*(play(port, requests, latencies, opponent) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    cpu_after = server_cpu_seconds(pid)
+    
+    latencies.sort()
+    result = {
+        'clients': clients,
+        'requests': len(latencies),
+        'requests_per_sec': len(latencies) / elapsed,
+        'mean_response_bytes': sum(sizes) / len(latencies),
+        'latency_us': {name: percentile(latencies, q) / 1000
+                       for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))},
+    }
+    if cpu_before is not None and cpu_after is not None:
+        result['server_cpu_us_per_request'] = (cpu_after - cpu_before) * 1e6 / len(latencies)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shell Dash HTTP API load test")
+    parser.add_argument('--clients', type=int, default=8, help="concurrent keep-alive connections")
+    parser.add_argument('--requests', type=int, default=2000, help="requests per client")
+    parser.add_argument('--opponent', default='leftmost',
+                        help="opponent for every game: a bot policy, or 'human' for hot-seat")
+    parser.add_argument('--output', metavar='FILE', help="write results as JSON")
+    args = parser.parse_args(argv)
+    
+    process, port = start_server('--http')
+    try:
+        result = asyncio.run(run(port, process.pid, args.clients, args.requests, args.opponent))
+    finally:
+        process.terminate()
+        process.wait()
+    
+    latency = result['latency_us']
+    print(f"{result['requests']:,} requests from {result['clients']} clients at "
+          f"{result['requests_per_sec']:,.0f}/sec, {result['mean_response_bytes']:.0f} bytes per response")
+    print(f"latency p50 {latency['p50']:.0f}us  p90 {latency['p90']:.0f}us  "
+          f"p99 {latency['p99']:.0f}us  max {latency['max']:.0f}us")
+    if 'server_cpu_us_per_request' in result:
+        print(f"server CPU {result['server_cpu_us_per_request']:.0f}us per request")
+    
+    if args.output:
+        result['python'] = platform.python_version()
+        result['platform'] = platform.platform()
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
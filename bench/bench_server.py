@@ -0,0 +1,188 @@
+"""
+Load test for the Shell Dash game server (shelldash.py --serve).
+
+Starts a server in a child process, opens many connections that each start
+a game against a bot and then sit idle, and meanwhile has a few active
+clients play moves as fast as they can. Reports the per-move round-trip
+latency seen by the active clients, the server's CPU time per move and
+its memory use:
+
+    python bench/bench_server.py --idle 10000 --moves 5000
+
+With several --active clients the measured latency includes queueing in
+this (single-threaded) client process, so compare server CPU per move too.
+
+Every game is seeded, so repeated runs play the same boards.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+SEED = 20240601
+
+
+def start_server(option='--serve'):
+    """Launch the server (--serve or --http) on a free port and return (process, port)."""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'shelldash.py'), option, '0', '--seed', str(SEED)],
+        stdout=subprocess.PIPE, text=True)
+    banner = process.stdout.readline()  # "Shell Dash ... listening on HOST:PORT"
+    return process, int(banner.rsplit(':', 1)[1])
+
+
+def server_rss_kib(pid):
+    """Resident memory of a process in KiB, or None where /proc is unavailable."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def server_cpu_seconds(pid):
+    """User plus system CPU time of a process, or None where /proc is unavailable."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+async def open_game(port, opponent='leftmost'):
+    """Connect and start a game against a bot; returns (reader, writer)."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    await reader.readline()  # HELLO
+    writer.write(f"NEW {opponent}\n".encode())
+    return reader, writer
+
+
+async def play_moves(port, moves, latencies):
+    """Play moves against a bot, timing each command until its first reply."""
+    reader, writer = await open_game(port)
+    tried = set()
+    sent_at = None
+    while moves > 0:
+        line = (await reader.readline()).decode().split()
+        if sent_at is not None:
+            latencies.append(time.perf_counter_ns() - sent_at)
+            sent_at = None
+        if not line:
+            break
+        if line[0] == 'TURN' and line[1] == '1':
+            column = next(c for c in 'ABC' if (line[2], c) not in tried)
+            tried.add((line[2], column))
+            command = f"PICK {column}\n"
+        elif line[0] == 'FLIP' and line[1] == '1':
+            command = "FLIP Y\n"
+        elif line[0] == 'END':
+            tried.clear()
+            continue
+        elif line[0] == 'WIN':
+            tried.clear()
+            command = "NEW leftmost\n"
+        else:
+            continue
+        moves -= 1
+        sent_at = time.perf_counter_ns()
+        writer.write(command.encode())
+    writer.close()
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def run(port, pid, idle, active, moves):
+    rss_before = server_rss_kib(pid)
+    start = time.perf_counter()
+    idle_games = []
+    for first in range(0, idle, 500):
+        batch = [open_game(port) for _ in range(min(500, idle - first))]
+        idle_games.extend(await asyncio.gather(*batch))
+    for reader, _ in idle_games:
+        await reader.readline()  # GAME line: the session exists on the server
+    setup_seconds = time.perf_counter() - start
+    rss_idle = server_rss_kib(pid)
+    
+    latencies = []
+    cpu_before = server_cpu_seconds(pid)
+    start = time.perf_counter()
+    await asyncio.gather(*(play_moves(port, moves, latencies) for _ in range(active)))
+    elapsed = time.perf_counter() - start
+    cpu_after = server_cpu_seconds(pid)
+    for _, writer in idle_games:
+        writer.close()
+    
+    latencies.sort()
+    result = {
+        'idle_games': idle,
+        'active_clients': active,
+        'moves': len(latencies),
+        'setup_seconds': setup_seconds,
+        'moves_per_sec': len(latencies) / elapsed,
+        'latency_us': {name: percentile(latencies, q) / 1000
+                       for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))},
+    }
+    if cpu_before is not None and cpu_after is not None:
+        result['server_cpu_us_per_move'] = (cpu_after - cpu_before) * 1e6 / max(len(latencies), 1)
+    if rss_before is not None and rss_idle is not None:
+        result['server_rss_kib'] = rss_idle
+        result['bytes_per_idle_game'] = (rss_idle - rss_before) * 1024 / max(idle, 1)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shell Dash server load test")
+    parser.add_argument('--idle', type=int, default=10000, help="idle games held open")
+    parser.add_argument('--active', type=int, default=1, help="clients playing moves")
+    parser.add_argument('--moves', type=int, default=5000, help="moves per active client")
+    parser.add_argument('--output', metavar='FILE', help="write results as JSON")
+    args = parser.parse_args(argv)
+    
+    # Each idle game needs a socket on both ends
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = args.idle + args.active + 100
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+    
+    process, port = start_server()
+    try:
+        result = asyncio.run(run(port, process.pid, args.idle, args.active, args.moves))
+    finally:
+        process.terminate()
+        process.wait()
+    
+    latency = result['latency_us']
+    print(f"{result['idle_games']:,} idle games opened in {result['setup_seconds']:.2f}s")
+    if 'server_rss_kib' in result:
+        print(f"server RSS {result['server_rss_kib'] / 1024:.1f} MiB "
+              f"(~{result['bytes_per_idle_game']:,.0f} bytes per idle game)")
+    print(f"{result['moves']:,} moves at {result['moves_per_sec']:,.0f}/sec: "
+          f"p50 {latency['p50']:.0f}us  p90 {latency['p90']:.0f}us  "
+          f"p99 {latency['p99']:.0f}us  max {latency['max']:.0f}us")
+    if 'server_cpu_us_per_move' in result:
+        print(f"server CPU {result['server_cpu_us_per_move']:.0f}us per move")
+    
+    if args.output:
+        result['python'] = platform.python_version()
+        result['platform'] = platform.platform()
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
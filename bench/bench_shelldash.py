@@ -0,0 +1,240 @@
+"""
+Benchmarks for the Shell Dash rules engine, board generation and rendering.
+
+Every case runs with fixed seeds so numbers are comparable between commits.
+Each case is timed over several rounds; the report shows operations per
+second plus per-operation percentiles, and can be written to JSON and
+compared against a previous run:
+
+    python bench/bench_shelldash.py --output before.json
+    python bench/bench_shelldash.py --compare before.json --threshold 0.10
+
+With --compare the script exits with status 1 if any case's median time
+per operation got slower by more than the threshold.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+# Allow running straight from a checkout without installing anything
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from shelldash import LeftmostPolicy, ShellDashGame, run_game, run_turn  # noqa: E402
+
+
+SEED = 20240601  # Fixed seed shared by every case
+
+
+def bench_create_deck():
+    """Build and shuffle a full 51-card deck."""
+    game = ShellDashGame(seed=SEED)
+    return game.create_deck
+
+
+def bench_setup_board():
+    """Deal a fresh 3x3 board."""
+    game = ShellDashGame(seed=SEED)
+    return game.setup_board
+
+
+def bench_play_turn():
+    """Play one whole turn with the leftmost bot (includes dealing the next board)."""
+    game = ShellDashGame(seed=SEED)
+    policy = LeftmostPolicy()
+    
+    def op():
+        run_turn(game, policy)
+        if game.check_winner():
+            game.reset()
+    return op
+
+
+def bench_check_winner():
+    """Scan both players' shell counts for a winner."""
+    game = ShellDashGame(seed=SEED)
+    game.shell_count = [2, 1]
+    return game.check_winner
+
+
+def bench_display_board():
+    """Render the board into a null stream."""
+    game = ShellDashGame(seed=SEED)
+    game.board.reveal(0, 1)
+    sink = io.StringIO()
+    
+    def op():
+        sink.seek(0)
+        sink.truncate()
+        with contextlib.redirect_stdout(sink):
+            game.display_board(0)
+    return op
+
+
+def bench_full_game():
+    """Play a complete game between two leftmost bots, reusing one game object."""
+    game = ShellDashGame(seed=SEED)
+    policies = [LeftmostPolicy(), LeftmostPolicy()]
+    
+    def op():
+        game.reset()
+        run_game(game, policies)
+    return op
+
+
+def bench_snapshot():
+    """Pack a game in progress into a snapshot."""
+    game = ShellDashGame(seed=SEED)
+    game.board.reveal(0, 1)
+    return game.snapshot
+
+
+def bench_restore():
+    """Rehydrate a game from a snapshot."""
+    game = ShellDashGame(seed=SEED)
+    game.board.reveal(0, 1)
+    data = game.snapshot()
+    
+    def op():
+        game.restore(data)
+    return op
+
+
+CASES = {
+    'create_deck': bench_create_deck,
+    'setup_board': bench_setup_board,
+    'play_turn': bench_play_turn,
+    'check_winner': bench_check_winner,
+    'display_board': bench_display_board,
+    'full_game': bench_full_game,
+    'snapshot': bench_snapshot,
+    'restore': bench_restore,
+}
+
+
+def calibrate(op, target_seconds):
+    """Find how many calls of op take roughly target_seconds."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        elapsed = time.perf_counter() - start
+        if elapsed >= target_seconds / 10 or number >= 1 << 24:
+            return max(1, int(number * target_seconds / max(elapsed, 1e-9)))
+        number *= 10
+
+
+def percentile(sorted_values, fraction):
+    """Linear-interpolated percentile of an already sorted list."""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    position = fraction * (len(sorted_values) - 1)
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def run_case(factory, rounds, round_seconds):
+    """
+    Time one benchmark case.
+    
+    Returns:
+        dict: ops/sec and per-operation percentiles (in nanoseconds)
+    """
+    op = factory()
+    number = calibrate(op, round_seconds)
+    op = factory()  # Fresh state so every run times the same seeded sequence
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            op()
+        samples.append((time.perf_counter_ns() - start) / number)
+    samples.sort()
+    return {
+        'ops_per_sec': 1e9 / percentile(samples, 0.5),
+        'ns_per_op': {
+            'min': samples[0],
+            'p50': percentile(samples, 0.5),
+            'p90': percentile(samples, 0.9),
+            'p99': percentile(samples, 0.99),
+            'max': samples[-1],
+        },
+        'rounds': rounds,
+        'ops_per_round': number,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare median times against a baseline run.
+    
+    Returns:
+        list: (case, change) pairs for cases slower than the threshold
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('cases', {}).get(name)
+        if not before:
+            continue
+        change = result['ns_per_op']['p50'] / before['ns_per_op']['p50'] - 1
+        print(f"{name:<15} {change:+8.1%} vs baseline")
+        if change > threshold:
+            regressions.append((name, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shell Dash benchmarks")
+    parser.add_argument('cases', nargs='*', metavar='CASE',
+                        help="cases to run (default: all of %s)" % ", ".join(CASES))
+    parser.add_argument('--rounds', type=int, default=15, help="timed rounds per case")
+    parser.add_argument('--round-seconds', type=float, default=0.1,
+                        help="approximate duration of each round")
+    parser.add_argument('--output', metavar='FILE', help="write results as JSON")
+    parser.add_argument('--compare', metavar='FILE', help="baseline JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="allowed slowdown of the median before failing (default 0.10)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.cases if name not in CASES]
+    if unknown:
+        parser.error("unknown case(s): " + ", ".join(unknown))
+    
+    results = {}
+    print(f"{'case':<15} {'ops/sec':>14} {'p50 ns':>12} {'p90 ns':>12} {'p99 ns':>12}")
+    for name in args.cases or CASES:
+        result = run_case(CASES[name], args.rounds, args.round_seconds)
+        results[name] = result
+        ns = result['ns_per_op']
+        print(f"{name:<15} {result['ops_per_sec']:>14,.1f} {ns['p50']:>12,.0f} "
+              f"{ns['p90']:>12,.0f} {ns['p99']:>12,.0f}")
+    
+    if args.output:
+        report = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': SEED,
+            'cases': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            for name, change in regressions:
+                print(f"REGRESSION: {name} is {change:.1%} slower (threshold {args.threshold:.0%})")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
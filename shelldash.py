@@ -1,4 +1,841 @@
 import random
+import struct
+import sys
+from collections import namedtuple
+
+
+class MoveResult:
+    """
+    Outcome of a single engine move (a reveal or a Flip-Flop decision).
+
+    Returned by ShellDashGame.reveal() and ShellDashGame.use_flip_flop() so
+    front ends can react to what happened without re-inspecting the board.
+
+    Attributes:
+        row (int): Row index of the card the move acted on
+        col (int): Column index of the card the move acted on
+        card (str): Card type that was revealed
+        effect (str): What the card did - one of 'sand', 'wave', 'wave_end',
+                      'flip_flop', 'jellyfish', 'flip_flop_used', 'sting',
+                      'sun' or 'shell'
+        expanded (bool): True if a Sun card added rows to the board
+        turn_over (bool): True if this move ended the player's turn
+    """
+
+    def __init__(self, row, col, card, effect, expanded=False, turn_over=False):
+        self.row = row
+        self.col = col
+        self.card = card
+        self.effect = effect
+        self.expanded = expanded
+        self.turn_over = turn_over
+
+    def __repr__(self):
+        return (f"MoveResult(row={self.row}, col={self.col}, card={self.card!r}, "
+                f"effect={self.effect!r}, expanded={self.expanded}, turn_over={self.turn_over})")
+
+
+class TurnResult:
+    """
+    Running tally of one player's turn, finalized by ShellDashGame.end_turn().
+
+    Attributes:
+        player (int): Player number (1 or 2) who took the turn
+        shells_gained (int): Shell cards collected this turn
+        flip_flops_gained (int): Flip-Flop cards picked up this turn
+        flip_flops_used (int): Flip-Flop cards spent to pass Jellyfish
+        sun_expansions (int): Number of times a Sun card added rows
+        wave_retries (int): Wave cards that forced another pick in the same row
+        reveals (int): Total cards revealed this turn
+        end_row (int): Row the player stopped on (equals rows if they reached the end)
+        reached_end (bool): True if the player traversed every row
+        winner (int or None): Winner after this turn, filled in by end_turn()
+    """
+
+    def __init__(self, player):
+        self.player = player
+        self.shells_gained = 0
+        self.flip_flops_gained = 0
+        self.flip_flops_used = 0
+        self.sun_expansions = 0
+        self.wave_retries = 0
+        self.reveals = 0
+        self.end_row = 0
+        self.reached_end = False
+        self.winner = None
+
+    def __repr__(self):
+        return (f"TurnResult(player={self.player}, shells_gained={self.shells_gained}, "
+                f"flip_flops_gained={self.flip_flops_gained}, flip_flops_used={self.flip_flops_used}, "
+                f"sun_expansions={self.sun_expansions}, end_row={self.end_row}, "
+                f"reached_end={self.reached_end}, winner={self.winner})")
+
+
+# Fixed-size head of a game snapshot (see ShellDashGame.snapshot): version, flags,
+# rows, cols, current row, Jellyfish column, shells and Flip-Flops per player,
+# the turn tally, the deck's card counts, the game's seed, its turn index and
+# the rest of its RuleSet (starting rows, max rows, Sun rows, shells to win).
+# Version 1 stored a Mersenne Twister reseed value in place of the seed and
+# had no turn index; versions 1 and 2 predate RuleSet and were always played
+# on standard boards. restore() still reads both.
+SNAPSHOT_VERSION = 3
+SNAPSHOT_HEADS = {1: struct.Struct('<6B2B2B6B6BQ'), 2: struct.Struct('<6B2B2B6B6BQI'),
+                  3: struct.Struct('<6B2B2B6B6BQI4B')}
+SNAPSHOT_HEAD = SNAPSHOT_HEADS[SNAPSHOT_VERSION]
+SNAPSHOT_PLAYER_2, SNAPSHOT_AWAITING, SNAPSHOT_TURN_OVER, SNAPSHOT_REACHED_END = 1, 2, 4, 8
+
+# Card type codes used by the compact Board (indices into CARD_NAMES)
+SAND, WAVE, FLIP_FLOP, JELLYFISH, SUN, SHELL = range(6)
+CARD_NAMES = ('Sand', 'Wave', 'Flip-Flop', 'Jellyfish', 'Sun', 'Shell')
+CARD_CODES = {name: code for code, name in enumerate(CARD_NAMES)}
+
+# Events a ShellDashGame can report to hooks (see ShellDashGame.add_hook)
+HOOK_NAMES = ('on_reveal', 'on_flip_flop', 'on_sun_expand', 'on_turn_end', 'on_deal', 'on_render',
+              'on_snapshot')
+
+# Move effects as small integer codes (see MoveResult.effect), for compact logs
+EFFECTS = ('sand', 'wave', 'wave_end', 'flip_flop', 'jellyfish', 'flip_flop_used', 'sting', 'sun', 'shell')
+EFFECT_CODES = {effect: code for code, effect in enumerate(EFFECTS)}
+
+# Event log file layout (see EventLog): a header, then fixed-width records
+EVENT_LOG_MAGIC = b'SDEV'
+EVENT_LOG_VERSION = 1
+EVENT_LOG_HEADER = struct.Struct('<4sBB2x')  # Magic, format version, record size
+EVENT_RECORD = struct.Struct('<I6B')         # Game id, kind, player, row, col, a, b
+EVENT_REVEAL, EVENT_FLIP_FLOP, EVENT_SUN, EVENT_TURN_END, EVENT_SEED = range(1, 6)
+
+# Turn table file layout (see TurnTable.save): a header and the policy name,
+# a state count, then per state its header followed by its outcomes
+TURN_TABLE_MAGIC = b'SDTT'
+TURN_TABLE_VERSION = 2
+TURN_TABLE_HEADER = struct.Struct('<4sBBB6HB')  # Magic, version, cols, Flip-Flop cap, card counts, name length
+TURN_TABLE_RULES = struct.Struct('<4B')         # Rows, max rows, Sun rows, Shells to win (version 2+)
+TURN_TABLE_STATE = struct.Struct('<BBH')        # Rows, Flip-Flops, number of outcomes
+TURN_TABLE_OUTCOME = struct.Struct('<5Bd')      # TurnOutcome fields, probability
+
+# Game store layout (see GameStore): a JSON metadata file and one file of
+# fixed-width little-endian values per column, in this order
+GAME_STORE_VERSION = 1
+GAME_STORE_META = 'games.json'
+GAME_STORE_COLUMNS = (
+    # Name, NumPy dtype, array typecode
+    ('seed', '<u8', 'Q'),             # Seed the game was dealt from (game.seed)
+    ('winner', 'u1', 'B'),            # Winning player, 1 or 2
+    ('turns', '<u4', 'I'),            # Turns played
+    ('shells_1', 'u1', 'B'),          # Shells Player 1 ended with
+    ('shells_2', 'u1', 'B'),          # Shells Player 2 ended with
+    ('flip_flops_used', '<u2', 'H'),  # Flip-Flops spent on Jellyfish by both players
+    ('sun_expansions', '<u2', 'H'),   # Times a Sun card added rows
+    ('rows', 'u1', 'B'),              # Rows the board reached
+)
+GAME_STORE_CHUNK_ROWS = 1 << 20   # Column files grow by this many games at a time
+GAME_STORE_SCAN_ROWS = 1 << 22    # Games per block when a query scans the columns
+GAME_STORE_SHARD_GAMES = 1 << 16  # Most games a simulation worker buffers before they are stored
+
+# One decoded event log record, as yielded by read_events()
+EventRecord = namedtuple('EventRecord', [
+    'game',    # Game id the event belongs to
+    'kind',    # EVENT_REVEAL, EVENT_FLIP_FLOP, EVENT_SUN, EVENT_TURN_END or EVENT_SEED
+    'player',  # Player (1 or 2) whose turn it was
+    'row',     # Row index the event happened on
+    'col',     # Column index (for EVENT_TURN_END, the winner or 0)
+    'a',       # Kind-specific value, see EventLog
+    'b',       # Kind-specific value, see EventLog
+])
+
+
+class CellView:
+    """
+    Read-only view of one board cell that looks like the old
+    {'card': str, 'revealed': bool} dict, for display code and callers that
+    index cells by key.
+    """
+    
+    __slots__ = ('_board', '_row', '_col')
+    _keys = ('card', 'revealed')
+    
+    def __init__(self, board, row, col):
+        self._board = board
+        self._row = row
+        self._col = col
+    
+    def __getitem__(self, key):
+        if key == 'card':
+            return CARD_NAMES[self._board.card(self._row, self._col)]
+        if key == 'revealed':
+            return self._board.is_revealed(self._row, self._col)
+        raise KeyError(key)
+    
+    def __contains__(self, key):
+        return key in self._keys
+    
+    def __iter__(self):
+        return iter(self._keys)
+    
+    def __len__(self):
+        return len(self._keys)
+    
+    def keys(self):
+        return self._keys
+    
+    def get(self, key, default=None):
+        return self[key] if key in self._keys else default
+    
+    def __eq__(self, other):
+        try:
+            return {key: self[key] for key in self._keys} == dict(other)
+        except (TypeError, ValueError):
+            return NotImplemented
+    
+    def __repr__(self):
+        return repr({key: self[key] for key in self._keys})
+
+
+class RowView:
+    """Read-only sequence of CellViews for one board row."""
+    
+    __slots__ = ('_board', '_row')
+    
+    def __init__(self, board, row):
+        self._board = board
+        self._row = row
+    
+    def __len__(self):
+        return self._board.cols
+    
+    def __getitem__(self, col):
+        if col < 0:
+            col += self._board.cols
+        if not 0 <= col < self._board.cols:
+            raise IndexError("column index out of range")
+        return CellView(self._board, self._row, col)
+    
+    def __iter__(self):
+        for col in range(self._board.cols):
+            yield CellView(self._board, self._row, col)
+
+
+class Board:
+    """
+    Compact game board: one byte per card code plus a revealed bitmask per row.
+    
+    Cells are stored row-major in a bytearray of CARD_NAMES indices, and bit j
+    of revealed[row] is set once column j of that row has been turned over.
+    Indexing a Board (board[row][col]) returns read-only views that behave
+    like the {'card': ..., 'revealed': ...} dicts used for display.
+    """
+    
+    __slots__ = ('cols', 'codes', 'revealed')
+    
+    def __init__(self, codes, cols):
+        """
+        Args:
+            codes (iterable): Card codes for every cell, row by row
+            cols (int): Number of columns per row (at most 8)
+        """
+        self.cols = cols
+        self.codes = bytearray(codes)
+        self.revealed = bytearray(len(self.codes) // cols)
+    
+    @classmethod
+    def from_cards(cls, grid):
+        """
+        Build a board from a grid of card names.
+        
+        Args:
+            grid (list): List of rows, each a list of card names
+            
+        Returns:
+            Board: Board with every card hidden
+        """
+        return cls([CARD_CODES[name] for row in grid for name in row], len(grid[0]) if grid else 3)
+    
+    def __len__(self):
+        return len(self.revealed)
+    
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self.revealed)
+        if not 0 <= row < len(self.revealed):
+            raise IndexError("row index out of range")
+        return RowView(self, row)
+    
+    def __iter__(self):
+        for row in range(len(self.revealed)):
+            yield RowView(self, row)
+    
+    def card(self, row, col):
+        """Return the card code at (row, col)."""
+        return self.codes[row * self.cols + col]
+    
+    def is_revealed(self, row, col):
+        """Return True if the card at (row, col) has been turned over."""
+        return bool(self.revealed[row] >> col & 1)
+    
+    def reveal(self, row, col):
+        """Turn over the card at (row, col) and return its code."""
+        self.revealed[row] |= 1 << col
+        return self.codes[row * self.cols + col]
+    
+    def row_full(self, row):
+        """Return True if every card in the row has been turned over."""
+        return self.revealed[row] == (1 << self.cols) - 1
+    
+    def append_rows(self, codes):
+        """Add hidden rows to the bottom of the board from a flat list of card codes."""
+        self.codes.extend(codes)
+        self.revealed.extend(bytes(len(codes) // self.cols))
+    
+    def card_names(self):
+        """Return the whole board as a grid of card names."""
+        cols = self.cols
+        return [[CARD_NAMES[code] for code in self.codes[r * cols:(r + 1) * cols]]
+                for r in range(len(self.revealed))]
+
+
+# One possible result of a turn, as tabulated by WinCalculator.turn_outcomes()
+TurnOutcome = namedtuple('TurnOutcome', [
+    'shells',             # Shell cards collected
+    'flip_flops_gained',  # Flip-Flop cards picked up
+    'flip_flops_spent',   # Flip-Flops used to pass Jellyfish
+    'end_row',            # Row the turn ended on (equals rows if the player reached the end)
+    'sun_expansions',     # Times a Sun card added rows
+])
+
+
+class RuleSet(namedtuple('RuleSet', [
+    'card_counts',  # Cards of each type in a fresh deck, in CARD_NAMES order
+    'rows',         # Rows of a new board
+    'cols',         # Cards per row
+    'max_rows',     # A Sun only adds rows while the board has fewer than this
+    'sun_rows',     # Rows a Sun card adds
+    'win_shells',   # Shells needed to win
+])):
+    """
+    The tunable rules of Shell Dash, as one immutable value.
+    
+    Pass a RuleSet to ShellDashGame (and to WinCalculator, simulate and
+    friends) to play by different rules. Fields left out take the standard
+    game's values, and _replace() derives variants. Rule sets are hashable
+    and compare by value, and key() gives a stable digest for caching
+    results across runs (see sweep).
+    """
+    
+    __slots__ = ()
+    
+    def __new__(cls, card_counts=(20, 10, 6, 6, 5, 4), rows=3, cols=3, max_rows=6, sun_rows=3, win_shells=3):
+        """
+        Raises:
+            ValueError: If a rule is out of range
+        """
+        card_counts = tuple(int(count) for count in card_counts)
+        if len(card_counts) != len(CARD_NAMES) or min(card_counts) < 0 or not sum(card_counts):
+            raise ValueError(f"card_counts needs {len(CARD_NAMES)} non-negative counts, not all zero")
+        if max(card_counts) > 255:
+            raise ValueError("card_counts can't exceed 255 (snapshots store each count in a byte)")
+        if not 1 <= cols <= 8:
+            raise ValueError("cols must be between 1 and 8 (a row's revealed flags are one byte)")
+        if rows < 1 or sun_rows < 1 or max_rows < 1:
+            raise ValueError("rows, max_rows and sun_rows must be positive")
+        if sun_rows > 255:
+            raise ValueError("sun_rows can't exceed 255")
+        if not 1 <= win_shells <= 255:
+            raise ValueError("win_shells must be between 1 and 255")
+        rules = super().__new__(cls, card_counts, int(rows), int(cols), int(max_rows), int(sun_rows), int(win_shells))
+        largest = rules.row_sizes()[-1]
+        if largest * rules.cols > 255:
+            # Snapshots store rows and the turn's tallies (reveals and so on) in a byte each
+            raise ValueError("a board can't grow past 255 cards")
+        if largest * rules.cols > sum(card_counts):
+            raise ValueError("the deck is too small to deal the largest board")
+        return rules
+    
+    def _replace(self, **changes):
+        """Return a copy with some rules changed, validated like a new RuleSet."""
+        return RuleSet(**dict(self._asdict(), **changes))
+    
+    def row_sizes(self):
+        """Every number of rows a board can have under these rules, smallest first."""
+        sizes = [self.rows]
+        while sizes[-1] < self.max_rows:
+            sizes.append(sizes[-1] + self.sun_rows)
+        return sizes
+    
+    def key(self):
+        """
+        Stable digest of the rules, the same in every process and Python version.
+        
+        Returns:
+            str: 16 hex digits
+        """
+        import hashlib
+        
+        return hashlib.blake2b(repr(tuple(self)).encode(), digest_size=8).hexdigest()
+
+
+# The rules of the standard game
+STANDARD_RULES = RuleSet()
+
+
+class TerminalRenderer:
+    """
+    Writes board frames to the terminal with as little output as possible.
+    
+    Every frame goes out in a single write. In redraw mode the previous frame
+    is remembered and only the lines that changed are rewritten, using ANSI
+    cursor positioning instead of clearing the screen. Once watch_resize() has
+    been called, the terminal width is cached and only re-queried after the
+    terminal reports a resize (SIGWINCH); until then it is queried every frame.
+    """
+    
+    _size_stale = True     # Set by the SIGWINCH handler, shared by all renderers
+    _cached_columns = 80
+    _handler_installed = False
+    _watching_resize = False  # False until watch_resize() succeeds: width is queried every frame
+    _previous_handler = None
+    
+    def __init__(self, stream=None):
+        """
+        Args:
+            stream (file, optional): Where frames are written; defaults to
+                                     whatever sys.stdout is at write time
+        """
+        self.stream = stream
+        self.previous = None  # Lines of the last frame drawn in redraw mode
+    
+    @classmethod
+    def _on_resize(cls, signum, frame):
+        cls._size_stale = True
+        if callable(cls._previous_handler):
+            cls._previous_handler(signum, frame)
+    
+    @classmethod
+    def watch_resize(cls):
+        """
+        Install the SIGWINCH handler so the terminal width can be cached.
+        
+        Called once by the interactive game before its first frame. Does
+        nothing where SIGWINCH is unavailable or off the main thread (signal
+        handlers can only be installed there); the width is then queried
+        every frame. Calling it again has no effect.
+        
+        Returns:
+            bool: True if resizes are being watched
+        """
+        if cls._handler_installed:
+            return cls._watching_resize
+        cls._handler_installed = True
+        import signal
+        import threading
+        
+        if not hasattr(signal, 'SIGWINCH') or threading.current_thread() is not threading.main_thread():
+            return False
+        cls._previous_handler = signal.getsignal(signal.SIGWINCH)
+        signal.signal(signal.SIGWINCH, cls._on_resize)
+        cls._watching_resize = True
+        return True
+    
+    def terminal_width(self):
+        """Return the terminal width in columns, re-queried only after a resize."""
+        cls = TerminalRenderer
+        if cls._size_stale:
+            import shutil
+            cls._cached_columns = shutil.get_terminal_size().columns
+            cls._size_stale = not cls._watching_resize
+        return cls._cached_columns
+    
+    def _write(self, text):
+        stream = self.stream or sys.stdout
+        stream.write(text)
+        stream.flush()
+    
+    def write(self, lines):
+        """Print a frame below whatever is already on screen, in one write."""
+        self._write("\n".join(lines) + "\n")
+    
+    def draw(self, lines):
+        """
+        Show a frame at the top of the screen, rewriting only changed lines.
+        
+        The first frame (or one with a different number of lines) clears the
+        screen; later frames move the cursor to each changed line and rewrite
+        it. Anything printed below the previous frame is cleared, just as a
+        full-screen clear would.
+        """
+        previous = self.previous
+        if previous is None or len(previous) != len(lines):
+            parts = ["\033[H\033[2J", "\n".join(lines), "\n"]
+        else:
+            parts = [f"\033[{i + 1};1H{line}\033[K"
+                     for i, (line, old) in enumerate(zip(lines, previous)) if line != old]
+            parts.append(f"\033[{len(lines) + 1};1H\033[J")
+        self.previous = list(lines)
+        self._write("".join(parts))
+    
+    def clear(self):
+        """Clear the screen and forget the previous frame."""
+        self.previous = None
+        self._write("\033[H\033[2J")
+    
+    def invalidate(self):
+        """Forget the previous frame so the next draw repaints the whole screen."""
+        self.previous = None
+
+
+# SplitMix64: the golden-ratio increment between counter values and the
+# multipliers of its output mixer (see CounterRandom)
+MASK64 = (1 << 64) - 1
+SPLITMIX_GAMMA = 0x9E3779B97F4A7C15
+SPLITMIX_MUL1 = 0xBF58476D1CE4E5B9
+SPLITMIX_MUL2 = 0x94D049BB133111EB
+
+# Counter values reserved for each deal of a game: deal d of a game (the
+# board of turn t is deal 2t, its Sun rows deal 2t + 1) starts at d * DEAL_STRIDE
+DEAL_STRIDE = 1 << 16
+
+
+def splitmix64(x):
+    """Scramble a 64-bit integer with the SplitMix64 output mixer (a bijection)."""
+    x = (x ^ (x >> 30)) * SPLITMIX_MUL1 & MASK64
+    x = (x ^ (x >> 27)) * SPLITMIX_MUL2 & MASK64
+    return x ^ (x >> 31)
+
+
+class CounterRandom:
+    """
+    Counter-based random number generator in the style of SplitMix64.
+    
+    Draw n of a stream is a pure function of the stream's key and n:
+    splitmix64(key + (n + 1) * SPLITMIX_GAMMA). There is no hidden state to
+    advance, so any position of a stream can be drawn directly, and the
+    whole generator state is two integers.
+    
+    Attributes:
+        key (int): 64-bit stream key, derived from the seed
+        counter (int): Index of the next draw
+    """
+    
+    __slots__ = ('key', 'counter')
+    
+    def __init__(self, seed=0, counter=0):
+        self.seed(seed)
+        self.counter = counter
+    
+    def seed(self, seed):
+        """Select the stream for seed (taken modulo 2**64) and rewind to its start."""
+        self.key = splitmix64((seed + SPLITMIX_GAMMA) & MASK64)
+        self.counter = 0
+    
+    def seek(self, counter):
+        """Move to draw number counter of the stream."""
+        self.counter = counter
+    
+    def random64(self):
+        """Return the next 64-bit draw."""
+        self.counter += 1
+        return splitmix64((self.key + self.counter * SPLITMIX_GAMMA) & MASK64)
+    
+    def randrange(self, n):
+        """
+        Return the next draw as an integer in range(n), for n >= 1.
+        
+        Uses one multiply-shift of a 64-bit draw; the bias this leaves is
+        below n / 2**64, far too small to ever show up.
+        """
+        return self.random64() * n >> 64
+
+
+def deal_codes(key, counter, card_counts, count):
+    """
+    Deal cards from a fresh shuffled deck, drawing from a deck stream.
+    
+    Only the cards actually needed are sampled: each draw picks one of the
+    cards still left in the (virtual) deck uniformly at random, which is
+    exactly a partial Fisher-Yates shuffle of the whole deck without
+    materializing or shuffling the cards that aren't dealt.
+    
+    If the deck runs out of cards, Sand cards are used as fallbacks so the
+    requested count is always met.
+    
+    Args:
+        key (int): CounterRandom key of the stream
+        counter (int): Stream position to draw from
+        card_counts (list): Number of cards of each type in the deck
+        count (int): Number of cards to deal
+        
+    Returns:
+        tuple: (card codes as a list, stream position after the draws)
+    """
+    remaining = list(card_counts)  # Cards of each type left in the deck
+    total = sum(remaining)
+    # CounterRandom draws, inlined since this is the hottest loop of board
+    # setup. Each 64-bit draw yields three picks: a pick is the high part of
+    # draw * total and the low 64 bits carry on to the next one, which leaves
+    # a bias below total**3 / 2**64 (under 2**-46 for the standard deck).
+    gamma, mul1, mul2, mask = SPLITMIX_GAMMA, SPLITMIX_MUL1, SPLITMIX_MUL2, MASK64
+    dealt = []
+    x = 0
+    for drawn in range(min(count, total)):
+        if drawn % 3 == 0:
+            counter += 1
+            x = (key + counter * gamma) & mask
+            x = (x ^ (x >> 30)) * mul1 & mask
+            x = (x ^ (x >> 27)) * mul2 & mask
+            x ^= x >> 31
+        x *= total
+        # Pick the n-th remaining card and find which type it belongs to
+        pick = x >> 64
+        x &= mask
+        code = 0
+        while pick >= remaining[code]:
+            pick -= remaining[code]
+            code += 1
+        remaining[code] -= 1
+        total -= 1
+        dealt.append(code)
+    dealt.extend([SAND] * (count - len(dealt)))  # Fallback if deck is exhausted
+    return dealt, counter
+
+
+def deal_slots(key, counter, layout, count):
+    """
+    Deal cards from a fresh shuffled deck of numbered slots.
+    
+    Like deal_codes, but the deck is a list of slots, each holding the card
+    code given by layout, and every draw picks one of the slots left. Two
+    decks whose layouts differ in a few slots (see coupled_layouts) are
+    therefore dealt in the same order from the same stream, and only the
+    changed slots deal different cards. This couples games across deck
+    variants far more tightly than deal_codes, where changing any card
+    count moves the boundaries between every card type.
+    
+    Args:
+        key (int): CounterRandom key of the stream
+        counter (int): Stream position to draw from
+        layout (list): Card code held by each slot of the deck
+        count (int): Number of cards to deal
+        
+    Returns:
+        tuple: (card codes as a list, stream position after the draws)
+    """
+    slots = list(layout)  # Slots left in the deck; dealt ones are swapped out
+    total = len(slots)
+    gamma, mul1, mul2, mask = SPLITMIX_GAMMA, SPLITMIX_MUL1, SPLITMIX_MUL2, MASK64
+    dealt = []
+    x = 0
+    for drawn in range(min(count, total)):
+        if drawn % 3 == 0:
+            counter += 1
+            x = (key + counter * gamma) & mask
+            x = (x ^ (x >> 30)) * mul1 & mask
+            x = (x ^ (x >> 27)) * mul2 & mask
+            x ^= x >> 31
+        x *= total
+        pick = x >> 64
+        x &= mask
+        total -= 1
+        dealt.append(slots[pick])
+        slots[pick] = slots[total]
+    dealt.extend([SAND] * (count - len(dealt)))  # Fallback if deck is exhausted
+    return dealt, counter
+
+
+def coupled_layouts(variants):
+    """
+    Lay out the decks of several card_counts variants slot by slot, sharing as many slots as possible.
+    
+    The first variant's deck holds its cards in type order. Every other
+    variant keeps a card in each slot where it has a card of the same type
+    left, and fills the freed slots with its extra cards, so two variants
+    that differ by one card differ in one slot.
+    
+    Args:
+        variants (list): card_counts list for each deck variant
+        
+    Returns:
+        list: Slot layout (list of card codes) for each variant, for deal_slots()
+    """
+    base = [code for code, count in enumerate(variants[0]) for _ in range(count)]
+    layouts = []
+    for counts in variants:
+        left = list(counts)
+        layout = []
+        freed = []  # Slots of the base layout this variant has no card of that type for
+        for slot, code in enumerate(base):
+            if left[code]:
+                left[code] -= 1
+                layout.append(code)
+            else:
+                freed.append(slot)
+                layout.append(None)
+        extra = [code for code, count in enumerate(left) for _ in range(count)]
+        for slot, code in zip(freed, extra):
+            layout[slot] = code
+        layout.extend(extra[len(freed):])
+        # A smaller deck: close the remaining gaps with slots from the end
+        for slot in reversed(freed[len(extra):]):
+            last = layout.pop()
+            if slot < len(layout):
+                layout[slot] = last
+        layouts.append(layout)
+    return layouts
+
+
+# Approximate memory held by one BoardPool entry besides its cards: the key
+# tuple, the bytes object and the dict slot
+BOARD_POOL_ENTRY_BYTES = 180
+
+
+class BoardPool:
+    """
+    Bounded pool of boards and Sun rows dealt ahead of time.
+    
+    Deals are pure functions of the game's deck stream, so the cards a game
+    will need next (the Sun rows of the current turn and the board of the
+    next one) are known in advance. Games attached to a pool ask for them
+    when a board is dealt, a background thread deals them while the game
+    waits on its players, and the game later takes the finished deal instead
+    of dealing it on the spot. A game deals exactly the same cards with or
+    without a pool.
+    
+    The pool holds at most max_size deals and about max_bytes of memory;
+    when full, the oldest deals (usually of abandoned games, or boards made
+    stale by a Sun expansion) are evicted first.
+    
+    Attributes:
+        hits (int): Deals served from the pool
+        misses (int): Deals a game had to make itself
+        evictions (int): Deals dropped to stay within the limits
+    """
+    
+    def __init__(self, max_size=4096, max_bytes=1 << 20, background=True):
+        """
+        Args:
+            max_size (int): Most deals held (and queued) at once
+            max_bytes (int): Approximate memory cap for the held deals
+            background (bool): Deal in a daemon thread; with False, queued
+                               deals wait for refill() to be called
+        """
+        import queue
+        import threading
+        
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.deals = {}  # (key, deal, count, card counts) -> card codes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        if background:
+            self.thread = threading.Thread(target=self._run, name='board-pool', daemon=True)
+            self.thread.start()
+    
+    def attach(self, game):
+        """
+        Serve a game's deals from this pool.
+        
+        Args:
+            game (ShellDashGame): Game to deal ahead for
+        """
+        game.board_pool = self
+        game.prefetch_deals()
+    
+    def prefetch(self, key, deal, count, card_counts):
+        """Queue a deal (see DEAL_STRIDE) of a deck stream to be made ahead of time."""
+        if self.queue.qsize() < self.max_size:
+            self.queue.put((key, deal, count, tuple(card_counts)))
+    
+    def take(self, key, deal, count, card_counts):
+        """
+        Remove and return a prefetched deal.
+        
+        Returns:
+            bytes or None: The deal's card codes, or None if it isn't ready
+        """
+        request = (key, deal, count, tuple(card_counts))
+        with self.lock:
+            codes = self.deals.pop(request, None)
+            if codes is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.bytes -= len(codes) + BOARD_POOL_ENTRY_BYTES
+        return codes
+    
+    def discard(self, key, deal, count, card_counts):
+        """Drop a prefetched deal that will not be needed after all."""
+        with self.lock:
+            codes = self.deals.pop((key, deal, count, tuple(card_counts)), None)
+            if codes is not None:
+                self.bytes -= len(codes) + BOARD_POOL_ENTRY_BYTES
+    
+    def refill(self):
+        """
+        Make every queued deal now, in the calling thread.
+        
+        Returns:
+            int: Number of deals made
+        """
+        import queue
+        
+        made = 0
+        while True:
+            try:
+                request = self.queue.get_nowait()
+            except queue.Empty:
+                return made
+            if request is not None:
+                self._fill(request)
+                made += 1
+    
+    def _fill(self, request):
+        key, deal, count, card_counts = request
+        codes = bytes(deal_codes(key, deal * DEAL_STRIDE, card_counts, count)[0])
+        size = len(codes) + BOARD_POOL_ENTRY_BYTES
+        with self.lock:
+            if request in self.deals:
+                return
+            deals = self.deals
+            while deals and (len(deals) >= self.max_size or self.bytes + size > self.max_bytes):
+                self.bytes -= len(deals.pop(next(iter(deals)))) + BOARD_POOL_ENTRY_BYTES
+                self.evictions += 1
+            deals[request] = codes
+            self.bytes += size
+    
+    def _run(self):
+        while True:
+            request = self.queue.get()
+            if request is None:
+                return
+            self._fill(request)
+    
+    def stats(self):
+        """
+        Summarize the pool's contents and effectiveness.
+        
+        Returns:
+            dict: Deals held, approximate bytes, hits, misses, hit rate and evictions
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.deals),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+        }
+    
+    def close(self):
+        """Stop the background thread, if any."""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
 
 class ShellDashGame:
     """
@@ -8,71 +845,173 @@ class ShellDashGame:
     cards like Flip-Flops to help them advance. See https://www.manzanitagameco.com/shell-dash-card-game.html.
     """
     
-    def __init__(self):
+    # Visual styling is shared by every game, so it is defined once on the class
+    
+    # ANSI color codes for visual card representation in terminal
+    # Each card type has a unique color for easy identification
+    card_colors = {
+        'Sand': '\033[93m',      # Yellow - represents beach sand
+        'Wave': '\033[94m',      # Blue - represents ocean waves
+        'Flip-Flop': '\033[95m', # Magenta - represents beach footwear
+        'Jellyfish': '\033[91m', # Red - represents dangerous sea creature
+        'Sun': '\033[33m',       # Orange - represents expanding sunshine
+        'Shell': '\033[92m'      # Green - represents collectible treasure
+    }
+    
+    # Icon representation for each card type
+    card_icons = {
+        'Sand': '🏖️',       # Beach/sand icon
+        'Wave': '🌊',       # Water wave icon
+        'Flip-Flop': '🩴',  # Flip-flop/sandal icon
+        'Jellyfish': '🪼',  # Jellyfish icon
+        'Sun': '☀️',        # Sun icon
+        'Shell': '🐚'       # Shell icon
+    }
+    
+    # ANSI reset code to return text to normal color
+    reset_color = '\033[0m'
+    
+    # Player name colors for consistent identification
+    player_colors = {
+        1: '\033[96m',  # Cyan for Player 1
+        2: '\033[93m'   # Yellow for Player 2
+    }
+    
+    def __init__(self, seed=None, players=None, rules=None):
         """
         Initialize the Shell Dash game with all necessary game components.
-        Sets up the card types, their quantities, visual styling, and game state.
+        Sets up the card types, their quantities, and game state.
+        
+        Args:
+            seed (int, optional): Seed for this game's private random number
+                                  generator; None seeds from system entropy
+            players (list, optional): Bot Policy for each seat, or None for a
+                                      human seat; defaults to two human players
+            rules (RuleSet, optional): Rules to play by; defaults to STANDARD_RULES
         """
+        self.rules = rules if rules is not None else STANDARD_RULES
+        
         # Define all available card types in the game
         # Each card has a specific function: Sand (advance), Wave (stay), 
         # Flip-Flop (protection), Jellyfish (obstacle), Sun (expand board), Shell (goal)
-        self.cards = ['Sand', 'Wave', 'Flip-Flop', 'Jellyfish', 'Sun', 'Shell']
+        self.cards = list(CARD_NAMES)
         
-        # Card distribution for a balanced 51-card deck
+        # Card distribution, from the rules (the standard deck has 51 cards)
         # Sand cards are most common (safe advancement), Shells are rarest (winning condition)
-        self.card_counts = [20, 10, 6, 6, 5, 4]  # Exact counts for 51-card deck
-        
-        # ANSI color codes for visual card representation in terminal
-        # Each card type has a unique color for easy identification
-        self.card_colors = {
-            'Sand': '\033[93m',      # Yellow - represents beach sand
-            'Wave': '\033[94m',      # Blue - represents ocean waves
-            'Flip-Flop': '\033[95m', # Magenta - represents beach footwear
-            'Jellyfish': '\033[91m', # Red - represents dangerous sea creature
-            'Sun': '\033[33m',       # Orange - represents expanding sunshine
-            'Shell': '\033[92m'      # Green - represents collectible treasure
-        }
+        self.card_counts = list(self.rules.card_counts)
         
-        # Icon representation for each card type
-        self.card_icons = {
-            'Sand': '🏖️',       # Beach/sand icon
-            'Wave': '🌊',       # Water wave icon
-            'Flip-Flop': '🩴',  # Flip-flop/sandal icon
-            'Jellyfish': '🪼',  # Jellyfish icon
-            'Sun': '☀️',        # Sun icon
-            'Shell': '🐚'       # Shell icon
-        }
+        # Every game owns its RNGs so games are independent and reproducible.
+        # Boards are dealt from a counter-based stream, so the cards of any
+        # turn follow directly from (seed, turn); self.rng serves everything else.
+        self.rng = random.Random(seed)
+        self.deck_rng = CounterRandom()
+        self.seed = None  # Seed the current game was dealt from (set by reset)
         
-        # ANSI reset code to return text to normal color
-        self.reset_color = '\033[0m'
+        # Player tracking
+        self.player_names = ["Player 1", "Player 2"]  # Default names, will be updated
+        self.players = list(players) if players else [None, None]  # Policy per seat (None = human)
         
-        # Player name colors for consistent identification
-        self.player_colors = {
-            1: '\033[96m',  # Cyan for Player 1
-            2: '\033[93m'   # Yellow for Player 2
-        }
+        self.cols = self.rules.cols  # Number of columns (3 for A, B, C choices by default)
+        self._renderer = None  # TerminalRenderer, created on first display
+        self.redraw = False    # Redraw the board in place during play() instead of scrolling
+        self.event_log = None  # EventLog recording every move, if any
+        self.game_id = 0       # Identifies this game's records in the event log
+        self.board_pool = None  # BoardPool dealing boards ahead of time, if any
+        self.hooks = None       # Hook name -> callbacks; None while no hook is registered
+        self.reset(seed)
+    
+    def add_hook(self, name, callback):
+        """
+        Register a callback to observe the game.
         
-        # Game state variables
-        self.board = []  # 2D array representing the game board grid
-        self.rows = 3    # Initial number of rows (can expand with Sun cards)
-        self.cols = 3    # Number of columns (fixed at 3 for A, B, C choices)
+        Hooks are called as callback(game, *args) after the event, with these
+        arguments:
         
-        # Player tracking
+            on_reveal      MoveResult of the card just revealed
+            on_flip_flop   MoveResult of a Flip-Flop decision
+            on_sun_expand  rows on the board after the expansion
+            on_turn_end    TurnResult of the turn that just ended
+            on_deal        index of the deal (see DEAL_STRIDE), before dealing it
+            on_render      display lines just built by render_board_lines()
+            on_snapshot    bytes just packed by snapshot()
+        
+        While no hook is registered each event costs one attribute check.
+        
+        Args:
+            name (str): One of HOOK_NAMES
+            callback (callable): Function to call
+            
+        Raises:
+            ValueError: If the hook name is unknown
+        """
+        if name not in HOOK_NAMES:
+            raise ValueError(f"Unknown hook: {name}")
+        if self.hooks is None:
+            self.hooks = {}
+        self.hooks.setdefault(name, []).append(callback)
+    
+    def remove_hook(self, name, callback):
+        """Unregister a callback added with add_hook()."""
+        callbacks = (self.hooks or {}).get(name, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+            if not callbacks:
+                del self.hooks[name]
+            if not self.hooks:
+                self.hooks = None
+    
+    def _fire(self, name, *args):
+        for callback in self.hooks.get(name, ()):
+            callback(self, *args)
+    
+    def reset(self, seed=None):
+        """
+        Return the game to its starting state so the object can be reused.
+        
+        Keeps the player names, seat policies and deck composition, and deals
+        a fresh board. Reusing one game for many games avoids rebuilding it.
+        
+        Every game is dealt from a known seed, kept in self.seed, so that the
+        game can be replayed from that seed and its moves (see replay_game).
+        
+        Args:
+            seed (int, optional): Seed for the new game; None draws one from
+                                  the game's current random stream
+        """
+        if seed is None:
+            seed = self.rng.getrandbits(64)
+        self.seed = seed
+        self.rng.seed(seed)
+        self.deck_rng.seed(seed)
+        
+        # Game state variables
+        self.board = None  # Compact Board grid of hidden/revealed cards
+        self.rows = self.rules.rows  # Initial number of rows (can expand with Sun cards)
         self.current_player = 1  # Player 1 goes first
-        self.player_names = ["Player 1", "Player 2"]  # Default names, will be updated
+        self.turn_index = 0      # Turns completed so far; picks the boards dealt
         
         # Score tracking: index 0 = Player 1, index 1 = Player 2
         self.shell_count = [0, 0]      # Number of Shell cards collected (win at 3)
         self.flip_flop_count = [0, 0]  # Number of Flip-Flop cards held (used against Jellyfish)
         
+        # Turn engine state (driven by reveal/use_flip_flop/end_turn)
+        self.current_row = 0              # Row the current player is choosing from
+        self.awaiting_flip_flop = False   # True while a Jellyfish waits on use_flip_flop()
+        self.jellyfish_col = None         # Column of the Jellyfish awaiting a decision
+        self.turn_over = False            # True once the current player's turn has ended
+        self.turn_result = TurnResult(self.current_player)  # Tally for the turn in progress
+        
         # Initialize the game board with shuffled cards
         self.setup_board()
+        if self.event_log is not None:
+            self.event_log.record_seed(self.game_id, seed)
     
     def create_deck(self):
         """
         Create and shuffle a complete deck of cards for the game.
         
-        The deck contains 51 cards total with specific distributions:
+        The deck holds card_counts[i] copies of each card type, so its size is
+        sum(card_counts). The standard rules give a 51-card deck:
         - 20 Sand cards (safe advancement)
         - 10 Wave cards (forced to stay in row)
         - 6 Flip-Flop cards (protection against Jellyfish)
@@ -84,7 +1023,6 @@ class ShellDashGame:
             list: A shuffled deck of card names ready for distribution
         """
         deck = []  # Initialize empty deck list
-        total_cards = 51  # Total cards in complete deck
         
         # Build deck by adding the specified count of each card type
         for i, card_type in enumerate(self.cards):
@@ -92,87 +1030,159 @@ class ShellDashGame:
             deck.extend([card_type] * count)  # Add 'count' copies of this card
         
         # Randomize card order to ensure unpredictable gameplay
-        random.shuffle(deck)
+        self.rng.shuffle(deck)
         return deck
     
+    def deal_cards(self, count):
+        """
+        Deal cards from a fresh shuffled deck as compact card codes.
+        
+        Only the cards actually needed are sampled, as a partial Fisher-Yates
+        shuffle of create_deck() (see deal_codes). Draws come from the game's
+        counter-based deck_rng at its current position.
+        
+        If the deck runs out of cards (RuleSet makes sum(card_counts) cover the
+        largest board, so only a hand-set card_counts can run short), Sand
+        cards are used as fallbacks so the requested count is always met.
+        
+        Args:
+            count (int): Number of cards to deal
+            
+        Returns:
+            list: Card codes (indices into CARD_NAMES)
+        """
+        deck_rng = self.deck_rng
+        dealt, deck_rng.counter = deal_codes(deck_rng.key, deck_rng.counter, self.card_counts, count)
+        return dealt
+    
+    def _deal(self, deal, count):
+        """Cards of one of this game's deals (see DEAL_STRIDE), from the board pool if it has them."""
+        if self.hooks is not None:
+            self._fire('on_deal', deal)
+        if self.board_pool is not None:
+            codes = self.board_pool.take(self.deck_rng.key, deal, count, self.card_counts)
+            if codes is not None:
+                return codes
+        self.deck_rng.seek(deal * DEAL_STRIDE)
+        return self.deal_cards(count)
+    
+    def prefetch_deals(self):
+        """Ask the board pool to deal this turn's Sun rows and the next turn's board ahead of time."""
+        pool = self.board_pool
+        deal = 2 * self.turn_index
+        if self.rows < self.rules.max_rows:
+            pool.prefetch(self.deck_rng.key, deal + 1, self.rules.sun_rows * self.cols, self.card_counts)
+        pool.prefetch(self.deck_rng.key, deal + 2, self.rows * self.cols, self.card_counts)
+    
+    def _discard_deal(self, deal, rows):
+        """Tell the board pool a prefetched deal of this game won't be used."""
+        self.board_pool.discard(self.deck_rng.key, deal, rows * self.cols, self.card_counts)
+    
     def setup_board(self):
         """
         Initialize the game board with a fresh shuffled deck of cards.
         
         Creates a grid of cards (initially 3x3) where each position contains
-        a hidden card that players will reveal during their turns. Each cell
-        stores both the card type and whether it has been revealed.
+        a hidden card that players will reveal during their turns. The grid is
+        a compact Board of card codes with a revealed bitmask per row.
         
-        If the deck runs out of cards (unlikely with 51 cards for 9 positions),
-        Sand cards are used as fallbacks to ensure the board is complete.
+        Each turn's board comes from its own block of the deck stream, so it
+        depends only on the game's seed and turn_index.
         """
-        # Get a fresh shuffled deck for this board setup
-        deck = self.create_deck()
-        
-        # Reset board to empty state
-        self.board = []
+        self.board = Board(self._deal(2 * self.turn_index, self.rows * self.cols), self.cols)
+        if self.board_pool is not None:
+            self.prefetch_deals()
+    
+    def board_for_turn(self, turn, rows=None, expanded=False):
+        """
+        Deal the board of any turn of this game directly, without playing up to it.
         
-        # Create rows x cols grid of hidden cards
-        for row in range(self.rows):
-            board_row = []  # Initialize new row
-            
-            for col in range(self.cols):
-                if deck:  # If cards remain in deck
-                    # Place card from deck with hidden state
-                    board_row.append({'card': deck.pop(), 'revealed': False})
-                else:
-                    # Fallback to Sand card if deck is exhausted (rare)
-                    board_row.append({'card': 'Sand', 'revealed': False})
+        The game itself is left untouched. A turn's cards depend only on the
+        game's seed and the turn number, so this matches the board the game
+        deals (or dealt) for that turn, given the rows it had then.
+        
+        Args:
+            turn (int): Turn number, counting from 0 for the first turn of the game
+            rows (int, optional): Rows the board had when the turn started;
+                                  defaults to the starting rows of the game's rules
+            expanded (bool or int): Also add the rows a Sun card would add during
+                                    the turn, or those of this many Sun cards
             
-            # Add completed row to board
-            self.board.append(board_row)
+        Returns:
+            Board: The turn's cards, all hidden
+        """
+        key, counts, cols = self.deck_rng.key, self.card_counts, self.cols
+        if rows is None:
+            rows = self.rules.rows
+        board = Board(deal_codes(key, 2 * turn * DEAL_STRIDE, counts, rows * cols)[0], cols)
+        if expanded:
+            sun_cards = int(expanded) * self.rules.sun_rows * cols
+            board.append_rows(deal_codes(key, (2 * turn + 1) * DEAL_STRIDE, counts, sun_cards)[0])
+        return board
     
-    def display_board(self, current_row=None, clear_screen=False):
+    def card_fragment(self, card):
         """
-        Display the current game board in a formatted ASCII box.
+        Colored "[icon Name] " text for a revealed card and its visible width.
         
-        Shows a visual representation of the board with:
-        - Revealed cards in their assigned colors with card names
-        - Hidden cards as letter choices (A, B, C)
-        - Proper padding and alignment within a bordered box
-        - Header showing current board dimensions
-        - Optional row marker showing which row is currently active
+        Fragments are built once per card type and cached on the class, since
+        every redraw shows the same handful of strings.
         
-        The display uses Unicode box-drawing characters for clean borders
-        and ANSI color codes to make different card types easily distinguishable.
+        Args:
+            card (str): Card name
+            
+        Returns:
+            tuple: (display text with ANSI colors, visible width in columns)
+        """
+        cache = ShellDashGame._fragment_cache
+        if card not in cache:
+            color = self.card_colors.get(card, '')
+            icon = self.card_icons.get(card, '?')
+            # Visible length: icon is 2 chars, brackets and spaces add to the card name length
+            cache[card] = (f"{color}[{icon} {card}]{self.reset_color} ", len(f"[{card}] ") + 2)
+        return cache[card]
+    
+    _fragment_cache = {}  # card name -> (display text, visible width)
+    
+    @property
+    def renderer(self):
+        """TerminalRenderer used by display_board, created on first use."""
+        if self._renderer is None:
+            self._renderer = TerminalRenderer()
+        return self._renderer
+    
+    def render_board_lines(self, current_row=None):
+        """
+        Build the lines of the board display without printing them.
         
         Args:
             current_row (int, optional): The row index to highlight as current turn
-            clear_screen (bool): Whether to clear screen for inline updates
+            
+        Returns:
+            list: Display lines, including ANSI color codes
         """
-        
-        # Clear screen for inline updates if requested
-        if clear_screen:
-            import os
-            os.system('clear' if os.name == 'posix' else 'cls')
+        lines = []
         
         # Define box dimensions for consistent formatting
         box_width = 50  # Total box width including left and right borders
         inner_width = box_width - 2  # Available space inside borders
         
-        # Get terminal width for centering
-        import shutil
-        terminal_width = shutil.get_terminal_size().columns
+        # Get terminal width for centering (cached until the terminal is resized)
+        terminal_width = self.renderer.terminal_width()
         left_margin = max(0, (terminal_width - box_width) // 2)
         margin = " " * left_margin
         
         # Draw top border of the display box (centered)
-        print(f"{margin}┌{'─' * inner_width}┐")
+        lines.append(f"{margin}┌{'─' * inner_width}┐")
         
         # Create centered header showing current board size
         header_text_plain = f"Shell Dash - Card Game (Rows: {self.rows})"
         header_text_colored = f"\033[94mShell Dash - Card Game\033[0m (Rows: {self.rows})"
         left_pad = (inner_width - len(header_text_plain)) // 2  # Left padding for centering
         right_pad = inner_width - len(header_text_plain) - left_pad  # Right padding
-        print(f"{margin}│{' ' * left_pad}{header_text_colored}{' ' * right_pad}│")
+        lines.append(f"{margin}│{' ' * left_pad}{header_text_colored}{' ' * right_pad}│")
         
         # Draw separator line between header and board content
-        print(f"{margin}├{'─' * inner_width}┤")
+        lines.append(f"{margin}├{'─' * inner_width}┤")
         
         # Prepare player status for side display (one line per player)
         status_lines = []
@@ -184,11 +1194,12 @@ class ShellDashGame:
             shell_color = self.card_colors['Shell'] if shells > 0 else ''
             
             # Combine all player info on one line
-            status_line = f"{player_color}{player_name}{self.reset_color}: {shell_color}{shells}🐚/3{self.reset_color} {flip_flops}🩴"
+            status_line = f"{player_color}{player_name}{self.reset_color}: {shell_color}{shells}🐚/{self.rules.win_shells}{self.reset_color} {flip_flops}🩴"
             status_lines.append(status_line)
         
         # Display each row of the game board with status on the right
-        for i, row in enumerate(self.board):
+        board = self.board
+        for i in range(len(board)):
             # Create consistent spacing by using fixed-width markers
             if current_row is not None and i == current_row:
                 # Current row gets colored arrow marker (using text instead of emoji for consistent width)
@@ -201,20 +1212,17 @@ class ShellDashGame:
                 visible_length = len(content)
             
             # Process each cell in the current row
-            for j, cell in enumerate(row):
-                if cell['revealed']:
+            for j in range(board.cols):
+                if board.is_revealed(i, j):
                     # Show revealed cards with their icons, names and colors
-                    color = self.card_colors.get(cell['card'], '')
-                    icon = self.card_icons.get(cell['card'], '?')
-                    card_display = f"{color}[{icon} {cell['card']}]{self.reset_color} "
+                    card_display, width = self.card_fragment(CARD_NAMES[board.card(i, j)])
                     content += card_display
-                    # Calculate visible length (icon is 2 chars, brackets and spaces add to actual card name length)
-                    visible_length += len(f"[{cell['card']}] ") + 2  # +2 for emoji visual width
+                    visible_length += width
                 else:
                     # Show hidden cards as selectable letters (A=0, B=1, C=2)
                     letter = chr(65 + j)  # Convert column index to letter (A, B, C)
                     content += f"[{letter}] "
-                    visible_length += len(f"[{letter}] ")
+                    visible_length += 4
             
             # Calculate padding needed to fill the remaining space in the box
             padding_needed = inner_width - visible_length
@@ -225,11 +1233,429 @@ class ShellDashGame:
             if i < len(status_lines):
                 status_text = f"  {status_lines[i]}"
             
-            # Print the complete row with borders and status (centered)
-            print(f"{margin}│{content}│{status_text}")
+            # Complete row with borders and status (centered)
+            lines.append(f"{margin}│{content}│{status_text}")
             
         # Draw bottom border to close the display box (centered)
-        print(f"{margin}└{'─' * inner_width}┘")
+        lines.append(f"{margin}└{'─' * inner_width}┘")
+        if self.hooks is not None:
+            self._fire('on_render', lines)
+        return lines
+    
+    def display_board(self, current_row=None, clear_screen=False, header=(), footer=()):
+        """
+        Display the current game board in a formatted ASCII box.
+        
+        Shows a visual representation of the board with:
+        - Revealed cards in their assigned colors with card names
+        - Hidden cards as letter choices (A, B, C)
+        - Proper padding and alignment within a bordered box
+        - Header showing current board dimensions
+        - Optional row marker showing which row is currently active
+        
+        The display uses Unicode box-drawing characters for clean borders
+        and ANSI color codes to make different card types easily distinguishable.
+        Each frame is emitted with a single write.
+        
+        Args:
+            current_row (int, optional): The row index to highlight as current turn
+            clear_screen (bool): Redraw in place at the top of the screen, rewriting
+                                 only the lines that changed since the last frame
+            header (list): Lines shown above the board, as part of the same frame
+            footer (list): Lines shown below the board, as part of the same frame
+        """
+        lines = self.render_board_lines(current_row)
+        if header or footer:
+            lines = [*header, *lines, *footer]
+        if clear_screen:
+            self.renderer.draw(lines)
+        else:
+            self.renderer.write(lines)
+    
+    def _advance(self):
+        """
+        Move the current player down one row, ending the turn if they ran off
+        the bottom of the board.
+        """
+        self.current_row += 1
+        if self.current_row >= self.rows:
+            self.turn_result.reached_end = True
+            self.turn_over = True
+    
+    def expand_board(self):
+        """
+        Apply the Sun card effect: add fresh rows (3 by default) drawn from a new deck.
+        
+        Expansion is capped (at 6 rows by default) to keep games manageable;
+        at the cap this does nothing and the Sun card simply lets the player
+        advance. Where the rules let a turn expand the board more than once,
+        later Suns keep dealing from the same Sun deck.
+        
+        Returns:
+            bool: True if rows were added, False if the board was already at the cap
+        """
+        rules = self.rules
+        if self.rows >= rules.max_rows:  # Maximum rows, to keep the game manageable
+            return False
+        
+        self.rows += rules.sun_rows  # Add the new rows
+        
+        # Generate new rows with fresh cards from a new deck, from the turn's Sun block
+        sun_cards = rules.sun_rows * self.cols
+        earlier = self.turn_result.sun_expansions * sun_cards  # Dealt by this turn's earlier Suns
+        self.board.append_rows(self._deal(2 * self.turn_index + 1, earlier + sun_cards)[earlier:])
+        if self.board_pool is not None:
+            self._discard_deal(2 * self.turn_index + 2, self.rows - rules.sun_rows)
+            self.prefetch_deals()  # The next board now has the added rows too
+        if self.hooks is not None:
+            self._fire('on_sun_expand', self.rows)
+        return True
+    
+    def reveal(self, col):
+        """
+        Reveal a card in the current row and apply its effect.
+        
+        This is the I/O-free core of a turn: it validates the move, flips the
+        card, updates scores and row position, and reports what happened. The
+        terminal front end (play_turn) and bots both drive the game through it.
+        
+        Args:
+            col (int): Column index (0-based) of the card to reveal
+            
+        Returns:
+            MoveResult: What the revealed card did
+            
+        Raises:
+            ValueError: If the turn is over, a Flip-Flop decision is pending,
+                        the column is out of range or the card is already revealed
+        """
+        if self.turn_over:
+            raise ValueError("Turn is over; call end_turn() first")
+        if self.awaiting_flip_flop:
+            raise ValueError("Flip-Flop decision pending; call use_flip_flop() first")
+        if col < 0 or col >= self.cols:
+            raise ValueError(f"Column {col} is out of range")
+        
+        row = self.current_row
+        board = self.board
+        if board.is_revealed(row, col):
+            raise ValueError("Card already revealed")
+        
+        # Reveal the selected card
+        code = board.reveal(row, col)
+        player_index = self.current_player - 1
+        self.turn_result.reveals += 1
+        expanded = False
+        
+        if code == SAND:
+            # Sand cards provide safe passage to the next row
+            effect = 'sand'
+            self._advance()
+        
+        elif code == WAVE:
+            # Wave cards force the player to select another card in the same row;
+            # if every card in the row turns out to be a Wave the turn ends
+            self.turn_result.wave_retries += 1
+            effect = 'wave'
+            if board.row_full(row):
+                effect = 'wave_end'
+                self.turn_over = True
+        
+        elif code == FLIP_FLOP:
+            # Flip-Flop cards are protective items that can counter Jellyfish
+            effect = 'flip_flop'
+            self.flip_flop_count[player_index] += 1
+            self.turn_result.flip_flops_gained += 1
+            self._advance()
+        
+        elif code == JELLYFISH:
+            # Jellyfish end the turn unless the player spends a Flip-Flop
+            if self.flip_flop_count[player_index] > 0:
+                effect = 'jellyfish'
+                self.awaiting_flip_flop = True
+                self.jellyfish_col = col
+            else:
+                effect = 'sting'
+                self.turn_over = True
+        
+        elif code == SUN:
+            # Sun cards expand the board (up to the cap) and let the player advance
+            effect = 'sun'
+            expanded = self.expand_board()
+            if expanded:
+                self.turn_result.sun_expansions += 1
+            self._advance()
+        
+        else:
+            # Shell cards are the main objective - collect 3 to win
+            effect = 'shell'
+            self.shell_count[player_index] += 1
+            self.turn_result.shells_gained += 1
+            self._advance()
+        
+        self.turn_result.end_row = self.current_row
+        if self.event_log is not None:
+            self.event_log.record(self.game_id, EVENT_REVEAL, self.current_player, row, col,
+                                  code, EFFECT_CODES[effect])
+            if expanded:
+                self.event_log.record(self.game_id, EVENT_SUN, self.current_player, row, col, self.rows)
+        result = MoveResult(row, col, CARD_NAMES[code], effect, expanded, self.turn_over)
+        if self.hooks is not None:
+            self._fire('on_reveal', result)
+        return result
+    
+    def use_flip_flop(self, use):
+        """
+        Resolve a pending Jellyfish by spending a Flip-Flop or taking the sting.
+        
+        Args:
+            use (bool): True to spend a Flip-Flop and advance, False to end the turn
+            
+        Returns:
+            MoveResult: effect 'flip_flop_used' or 'sting' for the Jellyfish cell
+            
+        Raises:
+            ValueError: If no Jellyfish decision is pending
+        """
+        if not self.awaiting_flip_flop:
+            raise ValueError("No Jellyfish decision pending")
+        
+        self.awaiting_flip_flop = False
+        row = self.current_row
+        col = self.jellyfish_col
+        
+        if use:
+            # Consume one Flip-Flop to safely pass the Jellyfish
+            self.flip_flop_count[self.current_player - 1] -= 1
+            self.turn_result.flip_flops_used += 1
+            effect = 'flip_flop_used'
+            self._advance()
+        else:
+            # Player chooses not to use protection
+            effect = 'sting'
+            self.turn_over = True
+        
+        self.turn_result.end_row = self.current_row
+        if self.event_log is not None:
+            self.event_log.record(self.game_id, EVENT_FLIP_FLOP, self.current_player, row, col,
+                                  1 if use else 0, EFFECT_CODES[effect])
+        result = MoveResult(row, col, 'Jellyfish', effect, False, self.turn_over)
+        if self.hooks is not None:
+            self._fire('on_flip_flop', result)
+        return result
+    
+    def end_turn(self):
+        """
+        Finish the current turn: deal a fresh board and pass play to the other player.
+        
+        Returns:
+            TurnResult: Final tally of the turn that just ended, including the
+                        winner (if any) as reported by check_winner()
+            
+        Raises:
+            ValueError: If the current turn has not ended yet
+        """
+        if not self.turn_over:
+            raise ValueError("Turn is still in progress")
+        
+        result = self.turn_result
+        result.end_row = self.current_row
+        result.winner = self.check_winner()
+        if self.event_log is not None:
+            index = self.current_player - 1
+            self.event_log.record(self.game_id, EVENT_TURN_END, self.current_player, result.end_row,
+                                  result.winner or 0, self.shell_count[index], self.flip_flop_count[index])
+        
+        # Each player gets a completely new, randomly shuffled board
+        if self.board_pool is not None and self.rows < self.rules.max_rows:
+            self._discard_deal(2 * self.turn_index + 1, self.rules.sun_rows)  # No Sun expanded the board
+        self.turn_index += 1
+        self.setup_board()
+        
+        # Alternate between Player 1 and Player 2 and reset turn state
+        self.current_player = 2 if self.current_player == 1 else 1
+        self.current_row = 0
+        self.awaiting_flip_flop = False
+        self.jellyfish_col = None
+        self.turn_over = False
+        self.turn_result = TurnResult(self.current_player)
+        if self.hooks is not None:
+            self._fire('on_turn_end', result)
+        return result
+    
+    def state(self):
+        """
+        Describe the full game state as plain Python data.
+        
+        Hidden cards are reported as None so the result can be shown to
+        players (or serialized) without leaking the board.
+        
+        Returns:
+            dict: Players, scores, board and turn state of the game
+        """
+        return {
+            'player_names': list(self.player_names),
+            'current_player': self.current_player,
+            'shell_count': list(self.shell_count),
+            'flip_flop_count': list(self.flip_flop_count),
+            'rows': self.rows,
+            'cols': self.cols,
+            'current_row': self.current_row,
+            'awaiting_flip_flop': self.awaiting_flip_flop,
+            'turn_over': self.turn_over,
+            'winner': self.check_winner(),
+            'board': [[name if self.board.is_revealed(r, c) else None
+                       for c, name in enumerate(row)]
+                      for r, row in enumerate(self.board.card_names())],
+        }
+    
+    def snapshot(self):
+        """
+        Pack the game into a compact, versioned binary snapshot.
+        
+        The snapshot holds everything needed to carry on exactly where the game
+        left off, even mid-turn: the board's cards and revealed flags, rows,
+        turn position, scores, the turn tally, names, the game's rules and
+        random state. A game with default names packs into 47 bytes.
+        
+        Boards are dealt from a counter-based stream, so the random state is
+        just the game's 64-bit seed and turn index. Taking a snapshot leaves
+        the game untouched, and the game and any copy restored from the
+        snapshot deal identical boards from this point on.
+        
+        Seat policies are not included; restore() keeps the restoring game's.
+        
+        Returns:
+            bytes: Snapshot accepted by restore()
+        """
+        flags = ((SNAPSHOT_PLAYER_2 if self.current_player == 2 else 0)
+                 | (SNAPSHOT_AWAITING if self.awaiting_flip_flop else 0)
+                 | (SNAPSHOT_TURN_OVER if self.turn_over else 0)
+                 | (SNAPSHOT_REACHED_END if self.turn_result.reached_end else 0))
+        tally = self.turn_result
+        head = SNAPSHOT_HEAD.pack(
+            SNAPSHOT_VERSION, flags, self.rows, self.cols, self.current_row,
+            255 if self.jellyfish_col is None else self.jellyfish_col,
+            *self.shell_count, *self.flip_flop_count,
+            tally.shells_gained, tally.flip_flops_gained, tally.flip_flops_used,
+            tally.sun_expansions, tally.wave_retries, tally.reveals,
+            *self.card_counts, self.seed & MASK64, self.turn_index,
+            self.rules.rows, self.rules.max_rows, self.rules.sun_rows, self.rules.win_shells)
+        
+        # Board: two card codes per byte, then one revealed bit per cell
+        board = self.board
+        codes = board.codes
+        cells = len(codes)
+        packed = bytes(codes[i] | (codes[i + 1] << 4 if i + 1 < cells else 0)
+                       for i in range(0, cells, 2))
+        revealed = 0
+        for row, mask in enumerate(board.revealed):
+            revealed |= mask << (row * board.cols)
+        
+        # Names: length-prefixed UTF-8, with length 0 meaning the default "Player N"
+        names = b''
+        for i, name in enumerate(self.player_names):
+            encoded = b'' if name == f"Player {i + 1}" else name.encode()[:255]
+            names += bytes((len(encoded),)) + encoded
+        data = head + packed + revealed.to_bytes((cells + 7) // 8, 'little') + names
+        if self.hooks is not None:
+            self._fire('on_snapshot', data)
+        return data
+    
+    def restore(self, data):
+        """
+        Replace this game's state with a snapshot taken by snapshot().
+        
+        Args:
+            data (bytes): Snapshot to load
+            
+        Returns:
+            ShellDashGame: This game, so ShellDashGame().restore(data) works
+            
+        The game takes on the snapshot's rules. Version 1 snapshots resume with
+        the same board and scores, but deal different boards afterwards than
+        the game they came from; versions 1 and 2 are played by the standard
+        rules with the snapshot's deck.
+        
+        Raises:
+            ValueError: If the data is truncated, from an unknown format version
+                        or holds invalid rules
+        """
+        if not data:
+            raise ValueError("Truncated snapshot: no data")
+        head = SNAPSHOT_HEADS.get(data[0])
+        if head is None:
+            raise ValueError(f"Unsupported snapshot version {data[0]}")
+        try:
+            (version, flags, rows, cols, current_row, jellyfish_col, shells_1, shells_2,
+             flip_flops_1, flip_flops_2, shells_gained, flip_flops_gained, flip_flops_used,
+             sun_expansions, wave_retries, reveals, *rest) = head.unpack_from(data)
+        except struct.error as error:
+            raise ValueError(f"Truncated snapshot: {error}") from None
+        if version == 1:
+            rest.append(0)  # Turn index
+        if version < 3:
+            rest.extend((STANDARD_RULES.rows, STANDARD_RULES.max_rows, STANDARD_RULES.sun_rows,
+                         STANDARD_RULES.win_shells))
+        card_counts, (seed, turn_index, start_rows, max_rows, sun_rows, win_shells) = \
+            rest[:len(CARD_NAMES)], rest[len(CARD_NAMES):]
+        try:
+            rules = RuleSet(card_counts, start_rows, cols, max_rows, sun_rows, win_shells)
+        except ValueError as error:
+            raise ValueError(f"Snapshot has invalid rules: {error}") from None
+        
+        offset = head.size
+        cells = rows * cols
+        packed = data[offset:offset + (cells + 1) // 2]
+        offset += (cells + 1) // 2
+        revealed = int.from_bytes(data[offset:offset + (cells + 7) // 8], 'little')
+        offset += (cells + 7) // 8
+        names = []
+        for i in range(2):
+            length = data[offset] if offset < len(data) else 0
+            if offset + 1 + length > len(data):
+                raise ValueError("Truncated snapshot: board or names cut short")
+            name = bytes(data[offset + 1:offset + 1 + length]).decode(errors='ignore')
+            names.append(name or f"Player {i + 1}")
+            offset += 1 + length
+        
+        codes = bytearray(cells)
+        for i, byte in enumerate(packed):
+            codes[2 * i] = byte & 15
+            if 2 * i + 1 < cells:
+                codes[2 * i + 1] = byte >> 4
+        board = Board(codes, cols)
+        row_mask = (1 << cols) - 1
+        board.revealed[:] = bytes((revealed >> (row * cols)) & row_mask for row in range(rows))
+        
+        self.rules = rules
+        self.card_counts = list(rules.card_counts)
+        self.seed, self.turn_index = seed, turn_index
+        self.rng.seed(self.seed)
+        self.deck_rng.seed(self.seed)
+        self.board = board
+        self.rows = rows
+        self.cols = cols
+        self.current_player = 2 if flags & SNAPSHOT_PLAYER_2 else 1
+        self.shell_count = [shells_1, shells_2]
+        self.flip_flop_count = [flip_flops_1, flip_flops_2]
+        self.player_names = names
+        self.current_row = current_row
+        self.awaiting_flip_flop = bool(flags & SNAPSHOT_AWAITING)
+        self.jellyfish_col = None if jellyfish_col == 255 else jellyfish_col
+        self.turn_over = bool(flags & SNAPSHOT_TURN_OVER)
+        
+        tally = TurnResult(self.current_player)
+        tally.shells_gained = shells_gained
+        tally.flip_flops_gained = flip_flops_gained
+        tally.flip_flops_used = flip_flops_used
+        tally.sun_expansions = sun_expansions
+        tally.wave_retries = wave_retries
+        tally.reveals = reveals
+        tally.end_row = current_row
+        tally.reached_end = bool(flags & SNAPSHOT_REACHED_END)
+        self.turn_result = tally
+        return self
     
     def play_turn(self):
         """
@@ -249,31 +1675,66 @@ class ShellDashGame:
         - Jellyfish: End turn (unless Flip-Flop is used)
         - Sun: Expand board and advance
         - Shell: Collect point and advance
+        
+        This is the terminal front end: the rules themselves live in reveal(),
+        use_flip_flop() and end_turn(), and this method only handles input and output.
+        With self.redraw set, the board is redrawn in place at the top of the
+        screen, with the turn header above it and the messages of the last
+        pick below it, instead of scrolling a new board out for every pick.
+        
+        Returns:
+            TurnResult: Tally of the turn that was just played
+            
+        Raises:
+            ValueError: If a bot's policy picks a column that is out of range or already revealed
         """
         # Display current player and their status with colored name and clear demarcation
         current_name = self.player_names[self.current_player-1]
         player_color = self.player_colors[self.current_player]
         
         # Clear turn demarcation
-        print("\n" + "="*60)
-        print(f"🎯 {player_color}{current_name}'s Turn{self.reset_color} 🎯")
-        print("="*60)
-        print(f"Shells collected: {self.shell_count[self.current_player-1]}/3")
+        header = ["", "="*60, f"🎯 {player_color}{current_name}'s Turn{self.reset_color} 🎯", "="*60,
+                  f"Shells collected: {self.shell_count[self.current_player-1]}/{self.rules.win_shells}"]
         
         # Show available Flip-Flop cards if player has any
         if self.flip_flop_count[self.current_player-1] > 0:
-            print(f"You have {self.flip_flop_count[self.current_player-1]} Flip-Flop card(s)!")
+            header.append(f"You have {self.flip_flop_count[self.current_player-1]} Flip-Flop card(s)!")
+        
+        # Scrolling output prints the header once; redraw mode keeps it in every frame,
+        # along with the messages of the last pick, which the next frame would otherwise erase
+        redraw = self.redraw
+        notes = []
+        if redraw:
+            def say(text):
+                print(text)
+                notes.extend(text.split("\n"))
+        else:
+            print("\n".join(header))
+            header = ()
+            say = print
         
-        # Start player's journey from row 0
-        current_row = 0
+        # Bot policy for this seat, if the seat is not played by a human
+        policy = self.players[self.current_player - 1]
         
         # Continue until player reaches the end or encounters an obstacle
-        while current_row < self.rows:
+        while not self.turn_over:
             # Show the current board state with current row highlighted
-            self.display_board(current_row)
+            self.display_board(self.current_row, clear_screen=redraw, header=header, footer=notes)
+            notes.clear()
             
-            # Prompt player for card selection in current row (same line input)
-            choice_input = input(f"Choose a card from row {current_row + 1} (A-{chr(64 + self.cols)}, Q to quit): ").upper().strip()
+            if policy is not None:
+                # Bots pick through their policy instead of the keyboard. A bad pick
+                # would be asked again forever, so it is the policy's error instead
+                column = policy.choose_column(self)
+                if not (isinstance(column, int) and 0 <= column < self.cols) or \
+                        self.board.is_revealed(self.current_row, column):
+                    raise ValueError(f"Policy {policy.name!r} chose column {column!r}, which is not a hidden "
+                                     f"card of row {self.current_row + 1}")
+                choice_input = chr(65 + column)
+                say(f"{current_name} chooses {choice_input}")
+            else:
+                # Prompt player for card selection in current row (same line input)
+                choice_input = input(f"Choose a card from row {self.current_row + 1} (A-{chr(64 + self.cols)}, Q to quit): ").upper().strip()
             
             try:
                 # Check for quit command
@@ -283,7 +1744,7 @@ class ShellDashGame:
                 
                 # Validate input format (single letter within valid range)
                 if len(choice_input) != 1 or choice_input < 'A' or choice_input > chr(64 + self.cols):
-                    print("Invalid choice!")
+                    say("Invalid choice!")
                     continue
                 
                 # Convert letter to column index (A=0, B=1, C=2)
@@ -291,124 +1752,66 @@ class ShellDashGame:
                 
                 # Double-check column bounds
                 if choice < 0 or choice >= self.cols:
-                    print("Invalid choice!")
+                    say("Invalid choice!")
                     continue
                     
                 # Check if card has already been revealed
-                if self.board[current_row][choice]['revealed']:
-                    print("Card already revealed! Choose another.")
+                if self.board.is_revealed(self.current_row, choice):
+                    say("Card already revealed! Choose another.")
                     continue
                 
                 # Reveal the selected card and show it to the player
-                card = self.board[current_row][choice]['card']
-                self.board[current_row][choice]['revealed'] = True
-                color = self.card_colors.get(card, '')
-                icon = self.card_icons.get(card, '?')
-                print(f"\nYou revealed: {color}{icon} {card}{self.reset_color}")
-                
-                # Process the revealed card according to game rules
-                # Each card type has specific effects on player progression
-                
-                if card == 'Sand':
-                    # Sand cards provide safe passage to the next row
-                    print("Clear path! Advance to next row.")
-                    current_row += 1
-                
-                elif card == 'Wave':
-                    # Wave cards force the player to select another card in the same row
-                    # This creates a risk/reward dynamic as other cards might be worse
-                    print("Wave! Must choose another card in this row.")
-                    
-                    # Check if all cards in this row are revealed and all are waves
-                    all_revealed = all(cell['revealed'] for cell in self.board[current_row])
-                    if all_revealed:
-                        all_waves = all(cell['card'] == 'Wave' for cell in self.board[current_row])
-                        if all_waves:
-                            print("All cards in this row are waves! Turn ends.")
-                            break  # End turn
-                    
-                    continue  # Stay in the same row, don't advance
+                result = self.reveal(choice)
+                color = self.card_colors.get(result.card, '')
+                icon = self.card_icons.get(result.card, '?')
+                say(f"\nYou revealed: {color}{icon} {result.card}{self.reset_color}")
                 
-                elif card == 'Flip-Flop':
-                    # Flip-Flop cards are protective items that can counter Jellyfish
-                    # Players can collect multiple Flip-Flops for future use
-                    print("Flip-Flop found! This will help with Jellyfish.")
-                    self.flip_flop_count[self.current_player-1] += 1
-                    current_row += 1  # Advance after collecting the item
-                
-                elif card == 'Jellyfish':
-                    # Jellyfish are obstacles that end the turn unless countered
-                    # Players can use Flip-Flop cards to safely pass them
-                    if self.flip_flop_count[self.current_player-1] > 0:
-                        # Player has Flip-Flop protection available
-                        print(f"Jellyfish! You have {self.flip_flop_count[self.current_player-1]} Flip-Flop(s).")
-                        choice = input("Use a Flip-Flop to pass? (y/n): ").lower().strip()
-                        
-                        if choice == 'y':
-                            # Consume one Flip-Flop to safely pass the Jellyfish
-                            print("Used Flip-Flop to pass Jellyfish!")
-                            self.flip_flop_count[self.current_player-1] -= 1
-                            current_row += 1  # Successfully advance
-                        else:
-                            # Player chooses not to use protection
-                            print("Jellyfish sting! Turn ends.")
-                            break  # End turn immediately
+                # Jellyfish with Flip-Flops in hand needs the player's decision
+                if result.effect == 'jellyfish':
+                    say(f"Jellyfish! You have {self.flip_flop_count[self.current_player-1]} Flip-Flop(s).")
+                    if policy is not None:
+                        use = 'y' if policy.use_flip_flop(self) else 'n'
                     else:
-                        # No protection available - turn ends
-                        print("Jellyfish sting! Turn ends.")
-                        break
+                        use = input("Use a Flip-Flop to pass? (y/n): ").lower().strip()
+                    result = self.use_flip_flop(use == 'y')
                 
-                elif card == 'Sun':
-                    # Sun cards expand the game board, making it longer but adding more opportunities
-                    # Expansion is limited to prevent infinite games
-                    if self.rows < 6:  # Maximum of 6 rows to keep game manageable
-                        self.rows += 3  # Add 3 new rows
-                        print(f"Sun card! Added 3 more rows. Total rows: {self.rows}")
-                        
-                        # Generate new rows with fresh cards from a new deck
-                        deck = self.create_deck()
-                        for _ in range(3):  # Create 3 new rows
-                            new_row = []
-                            for col in range(self.cols):  # Fill each column
-                                if deck:
-                                    # Use cards from the fresh deck
-                                    new_row.append({'card': deck.pop(), 'revealed': False})
-                                else:
-                                    # Fallback if deck is somehow empty
-                                    new_row.append({'card': 'Sand', 'revealed': False})
-                            self.board.append(new_row)  # Add new row to board
+                # Describe the effect the engine applied
+                if result.effect == 'sand':
+                    say("Clear path! Advance to next row.")
+                elif result.effect == 'wave':
+                    say("Wave! Must choose another card in this row.")
+                elif result.effect == 'wave_end':
+                    say("Wave! Must choose another card in this row.")
+                    say("All cards in this row are waves! Turn ends.")
+                elif result.effect == 'flip_flop':
+                    say("Flip-Flop found! This will help with Jellyfish.")
+                elif result.effect == 'flip_flop_used':
+                    say("Used Flip-Flop to pass Jellyfish!")
+                elif result.effect == 'sting':
+                    say("Jellyfish sting! Turn ends.")
+                elif result.effect == 'sun':
                     # Note: If already at max rows, Sun card still allows advancement
-                    current_row += 1
-                
-                elif card == 'Shell':
-                    # Shell cards are the main objective - collect 3 to win
-                    print("Shell collected!")
-                    self.shell_count[self.current_player-1] += 1
-                    current_row += 1  # Advance after collecting
+                    if result.expanded:
+                        sun_rows = self.rules.sun_rows
+                        say(f"Sun card! Added {sun_rows} more row{'s' if sun_rows != 1 else ''}. "
+                            f"Total rows: {self.rows}")
+                elif result.effect == 'shell':
+                    say("Shell collected!")
                     
             except (ValueError, IndexError):
                 # Handle any unexpected input errors gracefully
-                print("Please enter a valid letter!")
+                say("Please enter a valid letter!")
                 continue
         
         # Check if player successfully traversed all rows
-        if current_row >= self.rows:
-            current_name = self.player_names[self.current_player-1]
-            player_color = self.player_colors[self.current_player]
-            print(f"{player_color}{current_name}{self.reset_color} reached the end!")
+        if self.turn_result.reached_end:
+            say(f"{player_color}{current_name}{self.reset_color} reached the end!")
         
         # Display final board state so player can see their complete path
-        self.display_board()
-        
-        # Player status is now shown alongside the board
-        
-        # Prepare fresh board for the next player's turn
-        # Each player gets a completely new, randomly shuffled board
-        self.setup_board()
-        
-        # Alternate between Player 1 and Player 2
-        self.current_player = 2 if self.current_player == 1 else 1
+        self.display_board(clear_screen=redraw, header=header, footer=notes)
         
+        # Prepare fresh board for the next player's turn and switch players
+        return self.end_turn()
     
     def show_player_status(self):
         """
@@ -437,7 +1840,7 @@ class ShellDashGame:
             shell_color = self.card_colors['Shell'] if shells > 0 else ''
             
             # Display player stats in a clean format with colored name
-            print(f"{player_color}{player_name}{self.reset_color}: {shell_color}Shells: {shells}/3{self.reset_color} | Flip-Flop: {flip_flop_count}")
+            print(f"{player_color}{player_name}{self.reset_color}: {shell_color}Shells: {shells}/{self.rules.win_shells}{self.reset_color} | Flip-Flop: {flip_flop_count}")
         
         # Close the status section
         print("="*40)
@@ -446,16 +1849,17 @@ class ShellDashGame:
         """
         Check if any player has reached the win condition.
         
-        The game is won by collecting 3 Shell cards. This function
-        scans both players' shell counts to determine if there's a winner.
+        The game is won by collecting 3 Shell cards (rules.win_shells). This
+        function scans both players' shell counts to determine if there's a winner.
         
         Returns:
             int or None: Player number (1 or 2) if they have 3+ shells,
                         None if no winner yet
         """
         # Check each player's shell count for win condition
+        win_shells = self.rules.win_shells
         for i, shells in enumerate(self.shell_count):
-            if shells >= 3:  # Win condition: 3 or more shells
+            if shells >= win_shells:  # Win condition: 3 or more shells
                 return i + 1  # Return player number (1-indexed)
         
         return None  # No winner yet
@@ -472,27 +1876,36 @@ class ShellDashGame:
         5. Declare final winner or draw
         
         The game continues until:
-        - A player collects 3 shells (automatic win)
+        - A player collects rules.win_shells shells (automatic win)
         - Players choose to stop (winner determined by shell count)
         """
-        # Clear screen and display welcome message with detailed rules explanation
-        import os
-        os.system('clear' if os.name == 'posix' else 'cls')
+        # Cache the terminal width between resizes, then clear screen and
+        # display welcome message with detailed rules explanation
+        TerminalRenderer.watch_resize()
+        self.renderer.clear()
+        rules = self.rules
+        letters = [chr(65 + col) for col in range(self.cols)]
+        choices = letters[0] if len(letters) == 1 else f"{', '.join(letters[:-1])}, or {letters[-1]}"
         print("Welcome to \033[94mShell Dash - Card Game\033[0m!")
         print("\n\033[1mGOAL & RULES:\033[0m")
-        print("• Collect 3 \033[92m🐚 Shell\033[0m cards to win!")
-        print("• Navigate row by row, choosing cards A, B, or C")
+        print(f"• Collect {rules.win_shells} \033[92m🐚 Shell\033[0m card{'s' if rules.win_shells != 1 else ''} to win!")
+        print(f"• Navigate row by row, choosing cards {choices}")
         print("• \033[93m🏖️ Sand\033[0m: Safe passage to next row")
         print("• \033[94m🌊 Wave\033[0m: Must choose another card in same row")
         print("• \033[95m🩴 Flip-Flop\033[0m: Protection against Jellyfish")
         print("• \033[91m🪼 Jellyfish\033[0m: Ends turn (unless you use Flip-Flop)")
-        print("• \033[33m☀️ Sun\033[0m: Expands the board with 3 more rows")
+        print(f"• \033[33m☀️ Sun\033[0m: Expands the board with {rules.sun_rows} more "
+              f"row{'s' if rules.sun_rows != 1 else ''}")
         print("• \033[92m🐚 Shell\033[0m: Collect and advance - your winning objective!")
         
         # Collect player names
         print("\n\033[1mPLAYER SETUP:\033[0m")
-        self.player_names[0] = input("Enter name for Player 1: ").strip() or "Player 1"
-        self.player_names[1] = input("Enter name for Player 2: ").strip() or "Player 2"
+        for i in range(2):
+            if self.players[i] is not None:
+                # Bot seats are named after their policy
+                self.player_names[i] = f"{self.players[i].name.title()} Bot"
+            else:
+                self.player_names[i] = input(f"Enter name for Player {i + 1}: ").strip() or f"Player {i + 1}"
         p1_color = self.player_colors[1]
         p2_color = self.player_colors[2]
         print(f"\nGreat! {p1_color}{self.player_names[0]}{self.reset_color} vs {p2_color}{self.player_names[1]}{self.reset_color} - Let's begin!")
@@ -508,22 +1921,4887 @@ class ShellDashGame:
                 # Immediate victory - player reached 3 shells
                 winner_name = self.player_names[winner-1]
                 winner_color = self.player_colors[winner]
-                print(f"\n🎉 {winner_color}{winner_name}{self.reset_color} wins with 3 shells! 🎉")
+                print(f"\n🎉 {winner_color}{winner_name}{self.reset_color} wins with {self.rules.win_shells} shells! 🎉")
                 break
             
             # Automatically continue to next turn without asking
 
-# Game entry point - only runs when script is executed directly
-if __name__ == "__main__":
+
+class EventLog:
     """
-    Initialize and start a new Shell Dash game.
+    Append-only binary log of game events in fixed-width records.
     
-    This block only executes when the script is run directly,
-    not when imported as a module. Creates a game instance
-    and starts the main game loop.
+    The file starts with an EVENT_LOG_HEADER (magic, format version, record
+    size) followed by EVENT_RECORD records: game id (u32), then kind, player,
+    row, col, a and b (u8 each). What a and b hold depends on the kind:
+    
+        EVENT_REVEAL     a = card code, b = effect code (index into EFFECTS)
+        EVENT_FLIP_FLOP  a = 1 if a Flip-Flop was spent, b = effect code
+        EVENT_SUN        a = rows after the expansion
+        EVENT_TURN_END   a = shells, b = Flip-Flops held after the turn,
+                         col = winner (0 if none), row = row the turn ended on
+        EVENT_SEED       player = 0 for the low and 1 for the high 32 bits of
+                         the game's seed; row, col, a, b = those 4 bytes,
+                         least significant first
+    
+    A game's two EVENT_SEED records mark its start, so that the game can be
+    replayed and checked later (see replays_from_events). Games write to a
+    log through their event_log attribute, tagging records with their
+    game_id, so one log can interleave many games. Records are
+    packed into a buffer and written in large blocks. Reopening an existing
+    log appends to it, first cutting off any record torn by a crash so the
+    rest stays aligned.
     """
-    # Create a new game instance with default settings
-    game = ShellDashGame()
     
-    # Begin the interactive game experience
-    game.play()
+    def __init__(self, path, buffer_size=1 << 16):
+        """
+        Args:
+            path (str): Log file to create or append to
+            buffer_size (int): Bytes of records buffered between writes
+            
+        Raises:
+            ValueError: If the file exists but is not an event log
+        """
+        self.file = open(path, 'a+b')
+        size = self.file.tell()
+        if size == 0:
+            self.file.write(EVENT_LOG_HEADER.pack(EVENT_LOG_MAGIC, EVENT_LOG_VERSION, EVENT_RECORD.size))
+        else:
+            self.file.seek(0)
+            _check_event_log_header(self.file.read(EVENT_LOG_HEADER.size), path)
+            torn = (size - EVENT_LOG_HEADER.size) % EVENT_RECORD.size
+            if torn:
+                self.file.truncate(size - torn)
+        
+        self.buffer = bytearray(max(buffer_size, EVENT_RECORD.size) // EVENT_RECORD.size * EVENT_RECORD.size)
+        self.used = 0  # Bytes of the buffer holding records not yet written
+    
+    def record(self, game, kind, player, row, col, a=0, b=0):
+        """Append one record (see the class docstring for the fields)."""
+        EVENT_RECORD.pack_into(self.buffer, self.used, game, kind, player, row, col, a, b)
+        self.used += EVENT_RECORD.size
+        if self.used == len(self.buffer):
+            self.flush()
+    
+    def record_seed(self, game, seed):
+        """
+        Record the seed a game is dealt from as two EVENT_SEED records.
+        
+        Seeds outside the 64-bit range can't be stored and are skipped, which
+        leaves that game out of replay checks.
+        """
+        if 0 <= seed < 1 << 64:
+            for half in range(2):
+                self.record(game, EVENT_SEED, half, *(seed >> (32 * half)).to_bytes(8, 'little')[:4])
+    
+    def attach(self, game, game_id):
+        """
+        Start logging a game's events under game_id.
+        
+        Attach a game before its first move so the log can replay it; games
+        reused through reset() record their new seed automatically.
+        
+        Args:
+            game (ShellDashGame): Game whose events to record
+            game_id (int): Id written with each of the game's records
+        """
+        game.event_log = self
+        game.game_id = game_id
+        self.record_seed(game_id, game.seed)
+    
+    def flush(self):
+        """Write buffered records to the file."""
+        if self.used:
+            self.file.write(memoryview(self.buffer)[:self.used])
+            self.used = 0
+        self.file.flush()
+    
+    def close(self):
+        """Write any buffered records and close the file."""
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _check_event_log_header(header, path):
+    if len(header) < EVENT_LOG_HEADER.size:
+        raise ValueError(f"{path} is not a Shell Dash event log")
+    magic, version, record_size = EVENT_LOG_HEADER.unpack(header)
+    if magic != EVENT_LOG_MAGIC:
+        raise ValueError(f"{path} is not a Shell Dash event log")
+    if version != EVENT_LOG_VERSION or record_size != EVENT_RECORD.size:
+        raise ValueError(f"{path} uses unsupported event log version {version}")
+
+
+def read_events(path, chunk_records=1 << 16):
+    """
+    Stream the records of an event log without loading the whole file.
+    
+    The file is read in chunks of chunk_records records, so memory stays
+    constant however large the log is. A torn record at the end (from a
+    writer that crashed, or one still writing) is skipped.
+    
+    Args:
+        path (str): Event log written by EventLog
+        chunk_records (int): Records read from disk at a time
+        
+    Yields:
+        EventRecord: Each record, in the order it was written
+        
+    Raises:
+        ValueError: If the file is not an event log
+    """
+    size = EVENT_RECORD.size
+    make = EventRecord._make
+    with open(path, 'rb') as f:
+        _check_event_log_header(f.read(EVENT_LOG_HEADER.size), path)
+        while True:
+            chunk = f.read(size * chunk_records)
+            if not chunk:
+                break
+            usable = len(chunk) - len(chunk) % size
+            yield from map(make, EVENT_RECORD.iter_unpack(memoryview(chunk)[:usable]))
+
+
+# A recorded game whose replay disagreed with its record (see verify_replays)
+ReplayMismatch = namedtuple('ReplayMismatch', [
+    'index',     # Position of the game in the checked sequence
+    'seed',      # Seed the game was dealt from
+    'moves',     # The game's recorded moves
+    'expected',  # Recorded (shells, winner)
+    'actual',    # Replayed (shells, winner), or why the replay failed
+])
+
+
+def replay_game(seed, moves, game=None):
+    """
+    Re-execute a recorded game headlessly from its seed and moves.
+    
+    Moves are a string with one character per move: a column letter (A-C)
+    for each reveal and Y or N for each Flip-Flop decision. Turns end when
+    the engine says so, as in play, so a seed and its moves always
+    reproduce the same game.
+    
+    Args:
+        seed (int): Seed the game was dealt from (ShellDashGame.seed)
+        moves (str): The game's moves in order
+        game (ShellDashGame, optional): Game object to reuse for the replay
+        
+    Returns:
+        tuple: (shell counts per player as a tuple, winner or None)
+        
+    Raises:
+        ValueError: If a move is not legal at the point it is made
+    """
+    if game is None:
+        game = ShellDashGame(seed)
+    else:
+        game.reset(seed)
+    
+    winner = None
+    for number, move in enumerate(moves, 1):
+        try:
+            if winner:
+                raise ValueError(f"Player {winner} has already won")
+            if move == 'Y' or move == 'N':
+                game.use_flip_flop(move == 'Y')
+            else:
+                game.reveal(ord(move) - ord('A'))
+        except ValueError as error:
+            raise ValueError(f"Move {number} ({move}): {error}") from None
+        if game.turn_over:
+            winner = game.end_turn().winner
+    return tuple(game.shell_count), winner
+
+
+def replays_from_events(records):
+    """
+    Collect replayable games from event log records.
+    
+    Follows each game id from its EVENT_SEED records to the turn end that
+    declared a winner, rebuilding the game's moves and final shell counts.
+    Games logged without a seed and games that never finished are skipped.
+    A new seed for a game id that is still open starts that id over, as
+    happens when several server runs append to one log.
+    
+    Args:
+        records (iterable): EventRecords, e.g. from read_events()
+        
+    Yields:
+        tuple: (seed, moves, shells, winner) for each finished game, in the
+               order the games finished
+    """
+    games = {}  # Game id -> [seed, moves, shells]
+    for game, kind, player, row, col, a, b in records:
+        if kind == EVENT_SEED:
+            half = row | col << 8 | a << 16 | b << 24
+            if player == 0:
+                games[game] = [half, [], [0, 0]]
+            elif game in games:
+                games[game][0] |= half << 32
+            continue
+        replay = games.get(game)
+        if replay is None:
+            continue
+        if kind == EVENT_REVEAL:
+            replay[1].append(chr(ord('A') + col))
+        elif kind == EVENT_FLIP_FLOP:
+            replay[1].append('Y' if a else 'N')
+        elif kind == EVENT_TURN_END:
+            replay[2][player - 1] = a
+            if col:
+                del games[game]
+                yield replay[0], ''.join(replay[1]), tuple(replay[2]), col
+
+
+class ReplayReport:
+    """
+    Result of checking recorded games against fresh replays of them.
+    
+    Attributes:
+        checked (int): Number of games replayed
+        mismatches (list): ReplayMismatch for every game whose replay
+                           disagreed with its record, in game order
+        elapsed (float): Wall-clock seconds spent checking
+    """
+    
+    def __init__(self):
+        self.checked = 0
+        self.mismatches = []
+        self.elapsed = 0.0
+    
+    def merge(self, other):
+        """Add the results of another (later) batch of games into this report."""
+        self.checked += other.checked
+        self.mismatches.extend(other.mismatches)
+    
+    def report(self, limit=20):
+        """
+        Format the check as a human-readable summary.
+        
+        Args:
+            limit (int): Most mismatches to list individually
+            
+        Returns:
+            str: Multi-line report of games checked and any mismatches
+        """
+        lines = [
+            f"Replays checked:      {self.checked}",
+            f"Mismatches:           {len(self.mismatches)}",
+        ]
+        if self.elapsed > 0:
+            lines.append(f"Throughput:           {self.checked / self.elapsed:.1f} games/sec")
+        for mismatch in self.mismatches[:limit]:
+            lines.append(f"  game {mismatch.index} (seed {mismatch.seed}): "
+                         f"recorded {mismatch.expected}, replayed {mismatch.actual}")
+        if len(self.mismatches) > limit:
+            lines.append(f"  ... and {len(self.mismatches) - limit} more")
+        return "\n".join(lines)
+
+
+def verify_batch(start, replays):
+    """
+    Replay a batch of recorded games and compare each with its record.
+    
+    Args:
+        start (int): Index of the first game of the batch in the whole check
+        replays (list): (seed, moves, shells, winner) tuples
+        
+    Returns:
+        ReplayReport: Results for just this batch
+    """
+    report = ReplayReport()
+    game = ShellDashGame()  # Reused (and reseeded) for every replay
+    for index, (seed, moves, shells, winner) in enumerate(replays, start):
+        try:
+            actual = replay_game(seed, moves, game)
+        except ValueError as error:
+            actual = str(error)
+        expected = (tuple(shells), winner)
+        if actual != expected:
+            report.mismatches.append(ReplayMismatch(index, seed, moves, expected, actual))
+    report.checked = len(replays)
+    return report
+
+
+def verify_replays(replays, workers=1, batch_size=10000):
+    """
+    Check that recorded games replay to their recorded outcomes.
+    
+    Each game is re-executed from its seed and moves and its final shell
+    counts and winner compared with the record. Games are read lazily in
+    batches and at most two batches per worker are in flight, so millions
+    of games can be streamed from a log in constant memory.
+    
+    Args:
+        replays (iterable): (seed, moves, shells, winner) tuples, such as
+                            those from replays_from_events()
+        workers (int): Number of worker processes (0 means one per CPU)
+        batch_size (int): Games sent to a worker at a time
+        
+    Returns:
+        ReplayReport: Games checked and every mismatch, in input order
+    """
+    import itertools
+    import os
+    import time
+    
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    replays = iter(replays)
+    
+    def batches():
+        start = 0
+        while True:
+            batch = list(itertools.islice(replays, batch_size))
+            if not batch:
+                return
+            yield start, batch
+            start += len(batch)
+    
+    report = ReplayReport()
+    began = time.perf_counter()
+    if workers == 1:
+        for start, batch in batches():
+            report.merge(verify_batch(start, batch))
+    else:
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+        
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for start, batch in batches():
+                pending.append(pool.submit(verify_batch, start, batch))
+                if len(pending) >= 2 * workers:
+                    report.merge(pending.popleft().result())
+            while pending:
+                report.merge(pending.popleft().result())
+    report.elapsed = time.perf_counter() - began
+    return report
+
+
+class Policy:
+    """
+    Interface for bots that can take either seat of a ShellDashGame.
+    
+    A policy makes the two decisions a human makes in play_turn: which hidden
+    card to reveal, and whether to spend a Flip-Flop on a Jellyfish. Both
+    receive the live game and must not modify it. Subclasses are constructed
+    with an optional seed so simulations and tournaments can make any
+    randomized policy reproducible.
+    """
+    
+    name = 'policy'  # Short name used in reports and on the command line
+    # True or False if the policy always makes that Jellyfish decision, None
+    # if it depends on the game; fixed decisions can be tabulated (TurnTable)
+    fixed_flip_flop_decision = None
+    
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)  # Private RNG so bot choices don't disturb the deck
+    
+    def reseed(self, seed):
+        """Restart the policy's random stream, e.g. when it is reused for a new game."""
+        self.rng.seed(seed)
+    
+    @classmethod
+    def prepare(cls, rules=None):
+        """
+        Do any slow one-time setup the policy needs for a set of rules.
+        
+        Servers call this before accepting clients, so no game waits on it
+        mid-move. Most policies need nothing.
+        
+        Args:
+            rules (RuleSet, optional): Rules the policy will play by; defaults to STANDARD_RULES
+        """
+    
+    def choose_column(self, game):
+        """
+        Pick a card to reveal in the current row.
+        
+        Args:
+            game (ShellDashGame): Game whose current player this policy controls
+            
+        Returns:
+            int: Column index of a hidden card in game.current_row
+        """
+        raise NotImplementedError
+    
+    def use_flip_flop(self, game):
+        """
+        Decide whether to spend a Flip-Flop on the Jellyfish just revealed.
+        
+        Args:
+            game (ShellDashGame): Game awaiting the decision (game.awaiting_flip_flop is True)
+            
+        Returns:
+            bool: True to spend a Flip-Flop and advance, False to end the turn
+        """
+        raise NotImplementedError
+
+
+class LeftmostPolicy(Policy):
+    """
+    Bot policy that always reveals the leftmost hidden card in the current
+    row and always spends a Flip-Flop to pass a Jellyfish.
+    """
+    
+    name = 'leftmost'
+    fixed_flip_flop_decision = True
+    
+    def choose_column(self, game):
+        """Return the index of the leftmost hidden card in the current row."""
+        mask = game.board.revealed[game.current_row]
+        return next(j for j in range(game.cols) if not mask >> j & 1)
+    
+    def use_flip_flop(self, game):
+        """Always pass Jellyfish when a Flip-Flop is available."""
+        return True
+
+
+class RandomPolicy(Policy):
+    """
+    Bot policy that reveals a uniformly random hidden card in the current row
+    and always spends a Flip-Flop to pass a Jellyfish.
+    """
+    
+    name = 'random'
+    fixed_flip_flop_decision = True
+    
+    def choose_column(self, game):
+        """Return the index of a random hidden card in the current row."""
+        mask = game.board.revealed[game.current_row]
+        return self.rng.choice([j for j in range(game.cols) if not mask >> j & 1])
+    
+    def use_flip_flop(self, game):
+        """Always pass Jellyfish when a Flip-Flop is available."""
+        return True
+
+
+def run_turn(game, policy=None):
+    """
+    Play the current player's whole turn headlessly using a bot policy.
+    
+    Args:
+        game (ShellDashGame): Game whose current turn should be played
+        policy (Policy, optional): Policy to play with; defaults to the policy
+                                   sitting in the current player's seat
+        
+    Returns:
+        TurnResult: Tally of the turn that was just played
+    """
+    if policy is None:
+        policy = game.players[game.current_player - 1]
+    while not game.turn_over:
+        if game.awaiting_flip_flop:
+            game.use_flip_flop(policy.use_flip_flop(game))
+        else:
+            game.reveal(policy.choose_column(game))
+    return game.end_turn()
+
+
+def run_game(game, policies=None, stats=None):
+    """
+    Play a game to completion headlessly, one policy per seat.
+    
+    Args:
+        game (ShellDashGame): Freshly created (or reset) game to play out
+        policies (list, optional): Two policies, for Player 1 and Player 2;
+                                   defaults to the game's seat policies
+        stats (SimulationStats, optional): Collector that records every turn and the result
+        
+    Returns:
+        int: The winning player number (1 or 2)
+    """
+    if policies is None:
+        policies = game.players
+    turns = 0
+    while True:
+        result = run_turn(game, policies[game.current_player - 1])
+        turns += 1
+        if stats is not None:
+            stats.record_turn(result)
+        if result.winner:
+            if stats is not None:
+                stats.record_game(result.winner, turns)
+            return result.winner
+
+
+# Phases timed by GameProfiler: phase name -> ShellDashGame method. Some nest:
+# 'deal' runs inside 'end_turn', 'sun' inside 'reveal', 'render' inside 'display'.
+PROFILE_PHASES = (
+    ('deal', 'setup_board'),
+    ('sun', 'expand_board'),
+    ('reveal', 'reveal'),
+    ('flip_flop', 'use_flip_flop'),
+    ('end_turn', 'end_turn'),
+    ('render', 'render_board_lines'),
+    ('display', 'display_board'),
+)
+
+
+class GameProfiler:
+    """
+    Per-phase timings and event counters for games, gathered while they run.
+    
+    attach() times the game's main phases (see PROFILE_PHASES) and its bots'
+    decisions ('bot') by wrapping those methods on that game and its seat
+    policies only, and counts events through the game's hooks. Games that
+    are not attached pay nothing. A profiler can follow any number of games,
+    and profilers from different processes merge exactly.
+    
+    Attributes:
+        phases (dict): Phase name -> [calls, total ns, max ns]
+        counters (dict): Event name -> count
+    """
+    
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+    
+    def attach(self, game):
+        """
+        Start profiling a game.
+        
+        Args:
+            game (ShellDashGame): Game to time and count events of
+        """
+        if getattr(game.reveal, 'profiler', None) is self:
+            return  # Already attached
+        for phase, method in PROFILE_PHASES:
+            self._time(game, method, phase)
+        for policy in game.players:
+            if policy is not None:
+                self._time(policy, 'choose_column', 'bot')
+                self._time(policy, 'use_flip_flop', 'bot')
+        for name in HOOK_NAMES:
+            game.add_hook(name, getattr(self, '_' + name))
+    
+    def _time(self, target, method, phase):
+        import time
+        
+        original = getattr(target, method)
+        if getattr(original, 'profiler', None) is self:
+            return  # Already timed, e.g. a policy shared between games
+        stats = self.phases.setdefault(phase, [0, 0, 0])
+        clock = time.perf_counter_ns
+        
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                stats[0] += 1
+                stats[1] += elapsed
+                if elapsed > stats[2]:
+                    stats[2] = elapsed
+        
+        timed.profiler = self
+        setattr(target, method, timed)
+    
+    def count(self, name, amount=1):
+        """Add to one of the counters."""
+        self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def _on_reveal(self, game, result):
+        self.count('reveals')
+        if result.effect in ('wave', 'wave_end'):
+            self.count('wave_retries')
+    
+    def _on_flip_flop(self, game, result):
+        self.count('flip_flop_decisions')
+        if result.effect == 'flip_flop_used':
+            self.count('flip_flops_used')
+    
+    def _on_sun_expand(self, game, rows):
+        self.count('sun_expansions')
+    
+    def _on_turn_end(self, game, result):
+        self.count('turns')
+        if result.winner:
+            self.count('games')
+    
+    def _on_deal(self, game, deal):
+        self.count('deals')
+    
+    def _on_render(self, game, lines):
+        self.count('renders')
+    
+    def _on_snapshot(self, game, data):
+        self.count('snapshots')
+    
+    def merge(self, other):
+        """
+        Fold another profiler (e.g. from a worker process) into this one.
+        
+        Args:
+            other (GameProfiler): Profile to add to this one
+        """
+        for phase, (calls, total, longest) in other.phases.items():
+            stats = self.phases.setdefault(phase, [0, 0, 0])
+            stats[0] += calls
+            stats[1] += total
+            stats[2] = max(stats[2], longest)
+        for name, count in other.counters.items():
+            self.count(name, count)
+    
+    def to_dict(self):
+        """
+        Describe the profile as plain data, e.g. for JSON.
+        
+        Returns:
+            dict: 'phases' (calls, total_ms, mean_us and max_us per phase) and 'counters'
+        """
+        return {
+            'phases': {phase: {'calls': calls,
+                               'total_ms': total / 1e6,
+                               'mean_us': total / calls / 1e3 if calls else 0.0,
+                               'max_us': longest / 1e3}
+                       for phase, (calls, total, longest) in self.phases.items()},
+            'counters': dict(self.counters),
+        }
+    
+    def report(self):
+        """
+        Format the profile as a human-readable summary.
+        
+        Returns:
+            str: Table of phase timings followed by the event counters
+        """
+        lines = [f"{'phase':<10} {'calls':>10} {'total ms':>11} {'mean us':>9} {'max us':>9}"]
+        for phase, stats in self.to_dict()['phases'].items():
+            lines.append(f"{phase:<10} {stats['calls']:>10} {stats['total_ms']:>11.1f} "
+                         f"{stats['mean_us']:>9.1f} {stats['max_us']:>9.1f}")
+        counters = self.counters
+        turns = counters.get('turns', 0)
+        for name in sorted(counters):
+            line = f"{name + ':':<21} {counters[name]}"
+            if turns and name in ('reveals', 'wave_retries', 'deals', 'renders'):
+                line += f" ({counters[name] / turns:.2f} per turn)"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+class RunningStats:
+    """
+    Count, mean, variance, minimum and maximum of a stream of numbers, in constant memory.
+    
+    Keeps the count, sum and sum of squares. For integer values these are
+    Python integers, so merging is exact and order-independent, and the
+    variance is computed exactly before the final division.
+    """
+    
+    __slots__ = ('count', 'total', 'squares', 'min', 'max')
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.squares = 0
+        self.min = None
+        self.max = None
+    
+    def add(self, value, count=1):
+        """Record value, count times."""
+        self.count += count
+        self.total += value * count
+        self.squares += value * value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+    
+    def merge(self, other):
+        """Add another RunningStats (e.g. from a worker process) into this one."""
+        self.count += other.count
+        self.total += other.total
+        self.squares += other.squares
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+    
+    def mean(self):
+        """Mean of the values, or 0.0 if there are none."""
+        return self.total / self.count if self.count else 0.0
+    
+    def variance(self):
+        """Sample variance of the values, or 0.0 with fewer than two."""
+        if self.count < 2:
+            return 0.0
+        return (self.count * self.squares - self.total * self.total) / (self.count * (self.count - 1))
+    
+    def stdev(self):
+        """Sample standard deviation of the values."""
+        return max(0.0, self.variance()) ** 0.5
+
+
+class FixedHistogram:
+    """
+    Counts of a stream of numbers over fixed buckets.
+    
+    Bucket i counts values up to bounds[i] (and above bounds[i - 1]); a last
+    bucket counts everything above the highest bound. Counts are integers,
+    so histograms with the same bounds merge exactly.
+    """
+    
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+    
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # The last bucket is +Inf
+        self.sum = 0
+        self.count = 0
+    
+    def observe(self, value, count=1):
+        """Record value, count times."""
+        import bisect
+        
+        self.counts[bisect.bisect_left(self.bounds, value)] += count
+        self.sum += value * count
+        self.count += count
+    
+    def merge(self, other):
+        """
+        Add another histogram's counts into this one.
+        
+        Raises:
+            ValueError: If the histograms have different buckets
+        """
+        if other.bounds != self.bounds:
+            raise ValueError("Cannot merge histograms with different buckets")
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.sum += other.sum
+        self.count += other.count
+
+
+class QuantileSketch:
+    """
+    Approximate quantiles of a stream of positive numbers, in bounded memory.
+    
+    Values are counted in logarithmic buckets (as in DDSketch): bucket i
+    holds values in (gamma**(i-1), gamma**i] with gamma = (1 + a) / (1 - a),
+    so every quantile is returned within relative error a of a true value.
+    The buckets needed grow only with the log of the range of values (a few
+    hundred for values from 1 to 10**6 at 1% accuracy), and merging two
+    sketches just adds their integer counts, so merges are exact.
+    Values of zero or less share a single bucket and are reported as 0.
+    """
+    
+    def __init__(self, relative_accuracy=0.01):
+        """
+        Args:
+            relative_accuracy (float): Largest relative error of a quantile
+        """
+        import math
+        
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}  # Bucket index -> count
+        self.zeros = 0     # Count of values <= 0
+        self.count = 0
+    
+    def add(self, value, count=1):
+        """Record value, count times."""
+        import math
+        
+        self.count += count
+        if value <= 0:
+            self.zeros += count
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+    
+    def merge(self, other):
+        """
+        Add another sketch's counts into this one.
+        
+        Raises:
+            ValueError: If the sketches have different accuracies
+        """
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracies")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+    
+    def quantile(self, q):
+        """
+        Approximate q-quantile of the values seen.
+        
+        Args:
+            q (float): Quantile between 0 and 1 (0.5 for the median)
+            
+        Returns:
+            float: A value within the relative accuracy of the true quantile,
+            or None if no values were seen
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Midpoint (in relative terms) of the bucket's range
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+# Upper bounds of the game length buckets of SimulationStats, in turns
+GAME_LENGTH_BUCKETS = (5, 10, 15, 20, 30, 50)
+
+# Upper bounds of the fixed histogram buckets: move latency in seconds and
+# snapshot sizes in bytes
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+SNAPSHOT_SIZE_BUCKETS = (40, 48, 64, 96, 128, 256, 512)
+METRICS_SHARD_GAMES = 500  # Games per simulation shard when collecting metrics
+
+
+class CounterMetric:
+    """A count that only goes up. Update value directly (metric.value += n)."""
+    
+    kind = 'counter'
+    __slots__ = ('name', 'help', 'value')
+    
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+    
+    def merge(self, other):
+        self.value += other.value
+    
+    def samples(self):
+        yield self.name, self.value
+
+
+class GaugeMetric:
+    """A value that goes up and down, or is read from function() when it has one."""
+    
+    kind = 'gauge'
+    __slots__ = ('name', 'help', 'value', 'function')
+    
+    def __init__(self, name, help, function=None):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.function = function
+    
+    def merge(self, other):
+        self.value += other.value
+    
+    def get(self):
+        """Current value of the gauge."""
+        return self.function() if self.function is not None else self.value
+    
+    def samples(self):
+        yield self.name, self.get()
+
+
+class HistogramMetric(FixedHistogram):
+    """
+    Distribution of observed values over fixed buckets, as a metric.
+    
+    Buckets are fixed when the histogram is created, so observing costs a
+    binary search and two additions, and histograms merge exactly.
+    """
+    
+    kind = 'histogram'
+    __slots__ = ('name', 'help')
+    
+    def __init__(self, name, help, bounds):
+        super().__init__(bounds)
+        self.name = name
+        self.help = help
+    
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.bounds + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{self.name}_bucket{{le="{bound}"}}', cumulative
+        yield self.name + '_sum', self.sum
+        yield self.name + '_count', self.count
+
+
+class MetricsRegistry:
+    """
+    In-process registry of counters, gauges and histograms.
+    
+    Updates are plain attribute arithmetic without locks: the server updates
+    its registry from its single event loop thread, and every simulation
+    worker process fills its own registry, which the parent merges when the
+    worker's games are done. Merges are exact.
+    """
+    
+    def __init__(self):
+        self.metrics = {}  # Metric name -> metric, in registration order
+    
+    def _register(self, metric):
+        existing = self.metrics.setdefault(metric.name, metric)
+        if type(existing) is not type(metric):
+            raise ValueError(f"Metric {metric.name} is already registered as a {existing.kind}")
+        return existing
+    
+    def counter(self, name, help):
+        """Return the counter called name, creating it if needed."""
+        return self._register(CounterMetric(name, help))
+    
+    def gauge(self, name, help, function=None):
+        """Return the gauge called name, creating it if needed."""
+        return self._register(GaugeMetric(name, help, function))
+    
+    def histogram(self, name, help, bounds):
+        """Return the histogram called name, creating it with bucket bounds if needed."""
+        return self._register(HistogramMetric(name, help, bounds))
+    
+    def merge(self, other):
+        """Add another registry's metrics (e.g. from a worker process) into this one."""
+        for name, metric in other.metrics.items():
+            if name in self.metrics:
+                self.metrics[name].merge(metric)
+            else:
+                self.metrics[name] = metric
+    
+    def render(self):
+        """
+        Format every metric in the Prometheus text exposition format.
+        
+        Returns:
+            str: HELP, TYPE and sample lines for each metric
+        """
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, value in metric.samples():
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+    
+    def serve(self, host='127.0.0.1', port=0):
+        """
+        Serve GET /metrics over HTTP from a daemon thread.
+        
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on (0 picks a free one)
+            
+        Returns:
+            http.server.ThreadingHTTPServer: The running server; its
+            server_address holds the port, and shutdown() stops it
+        """
+        import http.server
+        import threading
+        
+        registry = self
+        
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass  # Scrapes are too frequent to log
+        
+        server = http.server.ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        return server
+
+
+class GameMetrics:
+    """
+    The standard Shell Dash metrics, in a MetricsRegistry.
+    
+    attach() counts a game's moves, deals, turns, finished games and
+    snapshot sizes through its hooks. The server also records active games
+    and move latency. summary() gives a one-line digest for batch runs,
+    including rates since the previous summary.
+    """
+    
+    def __init__(self, registry=None):
+        """
+        Args:
+            registry (MetricsRegistry, optional): Registry to add the metrics
+                                                  to; defaults to a new one
+        """
+        import time
+        
+        self.registry = registry if registry is not None else MetricsRegistry()
+        add = self.registry
+        self.active_games = add.gauge('shelldash_active_games', "Games in progress")
+        self.games = add.counter('shelldash_games_finished_total', "Games played to a win")
+        self.turns = add.counter('shelldash_turns_total', "Turns played")
+        self.moves = add.counter('shelldash_moves_total', "Moves played: reveals and Flip-Flop decisions")
+        self.deals = add.counter('shelldash_board_deals_total', "Boards and Sun rows dealt")
+        self.move_latency = add.histogram('shelldash_move_latency_seconds',
+                                          "Time the server took to apply a player's move and reply",
+                                          LATENCY_BUCKETS)
+        self.snapshot_bytes = add.histogram('shelldash_snapshot_bytes', "Size of game snapshots taken",
+                                            SNAPSHOT_SIZE_BUCKETS)
+        self.clock = time.perf_counter
+        self._last = None  # (time, games, moves) at the previous summary
+    
+    def attach(self, game):
+        """
+        Count a game's events.
+        
+        Args:
+            game (ShellDashGame): Game to observe
+        """
+        game.add_hook('on_reveal', self._on_move)
+        game.add_hook('on_flip_flop', self._on_move)
+        game.add_hook('on_turn_end', self._on_turn_end)
+        game.add_hook('on_deal', self._on_deal)
+        game.add_hook('on_snapshot', self._on_snapshot)
+    
+    def _on_move(self, game, result):
+        self.moves.value += 1
+    
+    def _on_turn_end(self, game, result):
+        self.turns.value += 1
+        if result.winner:
+            self.games.value += 1
+    
+    def _on_deal(self, game, deal):
+        self.deals.value += 1
+    
+    def _on_snapshot(self, game, data):
+        self.snapshot_bytes.observe(len(data))
+    
+    def merge(self, other):
+        """Add another GameMetrics (e.g. from a worker process) into this one."""
+        self.registry.merge(other.registry)
+    
+    def summary(self):
+        """
+        One line digest of the metrics, with rates since the last call.
+        
+        Returns:
+            str: Games, moves, deals, active games and mean move latency
+        """
+        now = self.clock()
+        games, moves = self.games.value, self.moves.value
+        last_time, last_games, last_moves = self._last or (now, games, moves)
+        self._last = (now, games, moves)
+        elapsed = now - last_time
+        line = f"games {games:,}"
+        if elapsed > 0:
+            line += f" ({(games - last_games) / elapsed:,.0f}/s)"
+        line += f"  moves {moves:,}"
+        if elapsed > 0:
+            line += f" ({(moves - last_moves) / elapsed:,.0f}/s)"
+        line += f"  deals {self.deals.value:,}  active {self.active_games.get():,}"
+        latency = self.move_latency
+        if latency.count:
+            line += f"  move latency {latency.sum / latency.count * 1e6:,.0f}us avg"
+        return line
+    
+    def report_every(self, interval, stream=None):
+        """
+        Print summary() to stream (default stderr) every interval seconds from a daemon thread.
+        
+        Returns:
+            threading.Event: Set it to stop reporting
+        """
+        import threading
+        
+        stop = threading.Event()
+        self.summary()  # Start the rate window now
+        
+        def run():
+            while not stop.wait(interval):
+                print(self.summary(), file=stream or sys.stderr, flush=True)
+        
+        threading.Thread(target=run, name='metrics-report', daemon=True).start()
+        return stop
+
+
+class SimulationStats:
+    """
+    Aggregate statistics over many headlessly simulated games.
+    
+    Tracks wins per seat, turns per game, per-turn shell and Flip-Flop
+    distributions and how often Sun cards expand the board.
+    
+    Memory stays constant however many games are recorded: game lengths go
+    into a RunningStats, a FixedHistogram and a QuantileSketch rather than
+    a list, and every total merges exactly across workers.
+    """
+    
+    def __init__(self):
+        self.games = 0                  # Games completed
+        self.wins = [0, 0]              # Wins for Player 1 and Player 2
+        self.turns = 0                  # Turns played across all games
+        # Turns per game: mean and variance, bucket counts and quantiles
+        self.game_length = RunningStats()
+        self.game_length_buckets = FixedHistogram(GAME_LENGTH_BUCKETS)
+        self.game_length_sketch = QuantileSketch()
+        self.shells_per_turn = {}       # shells gained in a turn -> number of turns
+        self.flip_flops_per_turn = {}   # Flip-Flops gained in a turn -> number of turns
+        self.flip_flops_used = 0        # Flip-Flops spent on Jellyfish
+        self.sun_expansions = 0         # Turns in which the board was expanded
+        self.reached_end = 0            # Turns in which the player traversed every row
+        self.elapsed = 0.0              # Wall-clock seconds spent simulating
+        self.seed = None                # Base seed of the run, if seeded
+        self.profile = None             # GameProfiler of the games, if profiled
+        self.metrics = None             # GameMetrics of the games, if collected
+        self.records = None             # GameRecords of the games, if recorded (never merged)
+    
+    def record_turn(self, result):
+        """Add one finished TurnResult to the totals."""
+        self.shells_per_turn[result.shells_gained] = self.shells_per_turn.get(result.shells_gained, 0) + 1
+        self.flip_flops_per_turn[result.flip_flops_gained] = self.flip_flops_per_turn.get(result.flip_flops_gained, 0) + 1
+        self.flip_flops_used += result.flip_flops_used
+        self.sun_expansions += result.sun_expansions
+        self.reached_end += result.reached_end
+    
+    def record_outcome(self, outcome, rows, count=1):
+        """
+        Add turns sampled from a TurnTable to the totals, like record_turn().
+        
+        Args:
+            outcome (TurnOutcome): What the turns gained and spent
+            rows (int): Board rows at the end of the turns
+            count (int): Number of turns with this outcome
+        """
+        self.shells_per_turn[outcome.shells] = self.shells_per_turn.get(outcome.shells, 0) + count
+        self.flip_flops_per_turn[outcome.flip_flops_gained] = (
+            self.flip_flops_per_turn.get(outcome.flip_flops_gained, 0) + count)
+        self.flip_flops_used += outcome.flip_flops_spent * count
+        self.sun_expansions += outcome.sun_expansions * count
+        self.reached_end += (outcome.end_row == rows) * count
+    
+    def record_game(self, winner, turns):
+        """Add one finished game to the totals."""
+        self.games += 1
+        self.wins[winner - 1] += 1
+        self.turns += turns
+        self.game_length.add(turns)
+        self.game_length_buckets.observe(turns)
+        self.game_length_sketch.add(turns)
+    
+    def merge(self, other):
+        """
+        Fold another SimulationStats (e.g. from a worker process) into this one.
+        
+        All counters are integers, so merging is exact and order-independent.
+        
+        Args:
+            other (SimulationStats): Statistics to add to this collector
+        """
+        self.games += other.games
+        self.wins[0] += other.wins[0]
+        self.wins[1] += other.wins[1]
+        self.turns += other.turns
+        self.game_length.merge(other.game_length)
+        self.game_length_buckets.merge(other.game_length_buckets)
+        self.game_length_sketch.merge(other.game_length_sketch)
+        for key, count in other.shells_per_turn.items():
+            self.shells_per_turn[key] = self.shells_per_turn.get(key, 0) + count
+        for key, count in other.flip_flops_per_turn.items():
+            self.flip_flops_per_turn[key] = self.flip_flops_per_turn.get(key, 0) + count
+        self.flip_flops_used += other.flip_flops_used
+        self.sun_expansions += other.sun_expansions
+        self.reached_end += other.reached_end
+        if other.profile is not None:
+            if self.profile is None:
+                self.profile = GameProfiler()
+            self.profile.merge(other.profile)
+        if other.metrics is not None:
+            if self.metrics is None:
+                self.metrics = GameMetrics()
+            self.metrics.merge(other.metrics)
+    
+    def to_dict(self):
+        """
+        Describe the statistics as plain data, e.g. for JSON.
+        
+        Everything from_dict() needs to rebuild them exactly is included,
+        except the profile and metrics.
+        
+        Returns:
+            dict: Counters, game-length summaries and per-turn distributions
+        """
+        length = self.game_length
+        sketch = self.game_length_sketch
+        buckets = self.game_length_buckets
+        return {
+            'games': self.games,
+            'wins': list(self.wins),
+            'turns': self.turns,
+            'game_length': {'count': length.count, 'total': length.total, 'squares': length.squares,
+                            'min': length.min, 'max': length.max},
+            'game_length_buckets': {'bounds': list(buckets.bounds), 'counts': list(buckets.counts),
+                                    'sum': buckets.sum, 'count': buckets.count},
+            'game_length_sketch': {'relative_accuracy': sketch.relative_accuracy,
+                                   'buckets': sorted(sketch.buckets.items()),
+                                   'zeros': sketch.zeros, 'count': sketch.count},
+            'shells_per_turn': sorted(self.shells_per_turn.items()),
+            'flip_flops_per_turn': sorted(self.flip_flops_per_turn.items()),
+            'flip_flops_used': self.flip_flops_used,
+            'sun_expansions': self.sun_expansions,
+            'reached_end': self.reached_end,
+            'elapsed': self.elapsed,
+            'seed': self.seed,
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild statistics described by to_dict().
+        
+        Args:
+            data (dict): Output of to_dict(), possibly via a JSON round trip
+            
+        Returns:
+            SimulationStats: Statistics equal to the described ones
+        """
+        stats = cls()
+        stats.games = data['games']
+        stats.wins = list(data['wins'])
+        stats.turns = data['turns']
+        for field, value in data['game_length'].items():
+            setattr(stats.game_length, field, value)
+        buckets = data['game_length_buckets']
+        stats.game_length_buckets = FixedHistogram(buckets['bounds'])
+        stats.game_length_buckets.counts = list(buckets['counts'])
+        stats.game_length_buckets.sum = buckets['sum']
+        stats.game_length_buckets.count = buckets['count']
+        sketch = data['game_length_sketch']
+        stats.game_length_sketch = QuantileSketch(sketch['relative_accuracy'])
+        stats.game_length_sketch.buckets = {index: count for index, count in sketch['buckets']}
+        stats.game_length_sketch.zeros = sketch['zeros']
+        stats.game_length_sketch.count = sketch['count']
+        stats.shells_per_turn = {key: count for key, count in data['shells_per_turn']}
+        stats.flip_flops_per_turn = {key: count for key, count in data['flip_flops_per_turn']}
+        stats.flip_flops_used = data['flip_flops_used']
+        stats.sun_expansions = data['sun_expansions']
+        stats.reached_end = data['reached_end']
+        stats.elapsed = data['elapsed']
+        stats.seed = data['seed']
+        return stats
+    
+    def report(self):
+        """
+        Format the collected statistics as a human-readable summary.
+        
+        Returns:
+            str: Multi-line report of win rates, turn counts, distributions and throughput
+        """
+        games = self.games or 1
+        turns = self.turns or 1
+        lines = [
+            f"Games simulated:      {self.games}",
+            f"Player 1 win rate:    {self.wins[0] / games:.4f}",
+            f"Player 2 win rate:    {self.wins[1] / games:.4f}",
+            f"Average turns/game:   {self.turns / games:.3f}",
+        ]
+        length = self.game_length
+        if length.count:
+            sketch = self.game_length_sketch
+            lines.append(f"Turns/game spread:    sd {length.stdev():.3f}, min {length.min}, max {length.max}, "
+                         f"p50 {sketch.quantile(0.5):.1f}, p90 {sketch.quantile(0.9):.1f}, "
+                         f"p99 {sketch.quantile(0.99):.1f}")
+            buckets = self.game_length_buckets
+            labels = [f"<={bound}" for bound in buckets.bounds] + [f">{buckets.bounds[-1]}"]
+            lines.append("Turns/game buckets:   " + ", ".join(
+                f"{label}: {count / length.count:.4f}" for label, count in zip(labels, buckets.counts)))
+        lines += [
+            f"Sun expansion rate:   {self.sun_expansions / turns:.4f} per turn",
+            f"Reached end rate:     {self.reached_end / turns:.4f} per turn",
+            f"Flip-Flops used:      {self.flip_flops_used / turns:.4f} per turn",
+            "Shells per turn:      " + ", ".join(
+                f"{k}: {v / turns:.4f}" for k, v in sorted(self.shells_per_turn.items())),
+            "Flip-Flops per turn:  " + ", ".join(
+                f"{k}: {v / turns:.4f}" for k, v in sorted(self.flip_flops_per_turn.items())),
+        ]
+        if self.seed is not None:
+            lines.append(f"Seed:                 {self.seed}")
+        if self.elapsed > 0:
+            lines.append(f"Throughput:           {self.games / self.elapsed:.1f} games/sec")
+        return "\n".join(lines)
+
+
+def derive_seed(*parts):
+    """
+    Derive an independent 64-bit seed from a base seed and stream indices.
+    
+    Hash-based derivation gives every (seed, game, seat) its own stream, so a
+    game's outcome depends only on its index and never on which worker ran it.
+    
+    Args:
+        *parts (int): Base seed followed by any stream indices
+        
+    Returns:
+        int: 64-bit seed
+    """
+    import hashlib
+    
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def simulate_range(seed, start, stop, policy='leftmost', profile=False, metrics=False, rules=None,
+                   records=False):
+    """
+    Simulate games start..stop-1 of a seeded run.
+    
+    Game i is always played with the same deck and policy seeds, so any
+    partition of a run into ranges produces identical merged statistics.
+    
+    Args:
+        seed (int): Base seed of the whole run
+        start (int): Index of the first game to play
+        stop (int): Index one past the last game to play
+        policy (str): Name of a policy in POLICIES
+        profile (bool): Also time the games' phases into stats.profile
+        metrics (bool): Also count the games' events into stats.metrics
+        rules (RuleSet, optional): Rules to play by; defaults to STANDARD_RULES
+        records (bool): Also record every game's row into stats.records
+        
+    Returns:
+        SimulationStats: Statistics for just this range of games
+    """
+    policy_class = POLICIES[policy]
+    stats = SimulationStats()
+    policies = [policy_class(), policy_class()]
+    game = ShellDashGame(players=policies, rules=rules)  # Reused (and reseeded) for every game
+    if profile:
+        stats.profile = GameProfiler()
+        stats.profile.attach(game)
+    if metrics:
+        stats.metrics = GameMetrics()
+        stats.metrics.attach(game)
+    if records:
+        stats.records = GameRecords()
+        stats.records.attach(game)
+    for index in range(start, stop):
+        game.reset(derive_seed(seed, index))
+        policies[0].reseed(derive_seed(seed, index, 1))
+        policies[1].reseed(derive_seed(seed, index, 2))
+        run_game(game, stats=stats)
+    return stats
+
+
+def _simulate_range_args(args):
+    """Unpack a (seed, start, stop, policy, profile, metrics, rules, records) tuple for process pool workers."""
+    return simulate_range(*args)
+
+
+# Games per batch in the NumPy backend. Batches are the unit of seeding, so
+# this is fixed rather than derived from the worker count.
+VECTOR_BATCH_SIZE = 65536
+
+
+def _draw_cards_np(np, rng, deck, num_boards, num_cards):
+    """
+    Deal num_cards cards from a fresh deck for each of num_boards boards at once.
+    
+    Runs the first num_cards steps of a Fisher-Yates shuffle on every deck in
+    parallel, which gives exactly the same distribution as shuffling the full
+    deck and dealing from it, without paying for the untouched tail.
+    
+    Args:
+        np: The numpy module
+        rng (numpy.random.Generator): Source of randomness
+        deck (numpy.ndarray): Card codes of one full deck
+        num_boards (int): Number of independent decks to deal from
+        num_cards (int): Cards to deal from each deck
+        
+    Returns:
+        numpy.ndarray: (num_boards, num_cards) array of card codes
+    """
+    size = deck.size
+    dealt = np.zeros((num_boards, num_cards), dtype=np.int8)  # Code 0 (Sand) is the fallback
+    if num_boards == 0 or size == 0:
+        return dealt
+    decks = np.broadcast_to(deck, (num_boards, size)).copy()
+    boards = np.arange(num_boards)
+    for i in range(min(num_cards, size)):
+        swap = rng.integers(i, size, num_boards)
+        picked = decks[boards, swap]
+        decks[boards, swap] = decks[:, i]
+        dealt[:, i] = picked
+    return dealt
+
+
+def simulate_batch(seed, batch_index, num_games, policy='leftmost', rules=None):
+    """
+    Simulate a batch of games in lockstep with NumPy vector operations.
+    
+    Boards for every game in the batch are dealt as one integer array and
+    each step of a turn (column choice, Wave retries, Jellyfish and
+    Flip-Flop checks, Sun expansion) is resolved for all games at once.
+    The rules match reveal()/use_flip_flop() exactly; only the random
+    streams differ from the pure-Python backend.
+    
+    Args:
+        seed (int): Base seed of the whole run
+        batch_index (int): Index of this batch within the run
+        num_games (int): Number of games in this batch
+        policy (str): 'leftmost' or 'random' (both always use Flip-Flops)
+        rules (RuleSet, optional): Rules to play by; defaults to STANDARD_RULES
+        
+    Returns:
+        SimulationStats: Statistics for the games in this batch
+        
+    Raises:
+        ImportError: If NumPy is not installed
+        ValueError: If the policy has no vectorized implementation
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("The numpy backend requires NumPy (pip install numpy)") from None
+    
+    if policy not in ('leftmost', 'random'):
+        raise ValueError(f"Policy {policy!r} has no vectorized implementation")
+    
+    # Rules come from a template game so both backends share one source of truth
+    template = ShellDashGame(seed=0, rules=rules)
+    rules = template.rules
+    deck = np.repeat(np.arange(len(CARD_NAMES), dtype=np.int8), template.card_counts)
+    cols = template.cols
+    base_rows = template.rows
+    sun_rows = rules.sun_rows
+    sun_cards = sun_rows * cols
+    
+    # Rows a board can grow to; every Sun expansion adds rows from a new deck.
+    # Like the turn engine, an expanded board stays expanded for later turns.
+    row_sizes = rules.row_sizes()
+    max_rows = row_sizes[-1]
+    sun_block_cards = max(len(row_sizes) - 1, 1) * sun_cards  # Every Sun row a turn can add
+    
+    # Lookup tables over a row's revealed-column bitmask
+    full_mask = (1 << cols) - 1
+    hidden = [[j for j in range(cols) if not mask & (1 << j)] for mask in range(full_mask + 1)]
+    leftmost_hidden = np.array([h[0] if h else 0 for h in hidden], dtype=np.int64)
+    hidden_count = np.array([len(h) for h in hidden], dtype=np.int64)
+    nth_hidden = np.array([h + [0] * (cols - len(h)) for h in hidden], dtype=np.int64)
+    
+    rng = np.random.default_rng([seed, batch_index])
+    stats = SimulationStats()
+    
+    shells = np.zeros((num_games, 2), dtype=np.int64)
+    flip_flops = np.zeros((num_games, 2), dtype=np.int64)
+    player = np.zeros(num_games, dtype=np.int64)  # 0 = Player 1, 1 = Player 2
+    game_rows = np.full(num_games, base_rows, dtype=np.int64)
+    turns = np.zeros(num_games, dtype=np.int64)
+    winners = np.zeros(num_games, dtype=np.int64)
+    shells_hist = np.zeros(max_rows + 1, dtype=np.int64)
+    flip_flops_hist = np.zeros(max_rows + 1, dtype=np.int64)
+    games = np.arange(num_games)  # Games that have not been won yet
+    
+    while games.size:
+        k = games.size
+        
+        # Deal every active game a fresh board from one deck. Rows past a
+        # board's current size are only reachable after a Sun expansion, which
+        # overwrites them with cards from a new deck below.
+        rows = game_rows[games]
+        board = np.zeros((k, max_rows, cols), dtype=np.int8)
+        for size in np.unique(rows):
+            sized = np.flatnonzero(rows == size)
+            board[sized, :size] = _draw_cards_np(np, rng, deck, sized.size, size * cols).reshape(-1, size, cols)
+        
+        sun_block = np.zeros((k, sun_block_cards), dtype=np.int8)
+        seat = player[games]
+        held = flip_flops[games, seat]
+        gained_shells = np.zeros(k, dtype=np.int64)
+        gained_flip_flops = np.zeros(k, dtype=np.int64)
+        used_flip_flops = np.zeros(k, dtype=np.int64)
+        expanded = np.zeros(k, dtype=np.int64)
+        reached_end = np.zeros(k, dtype=bool)
+        row = np.zeros(k, dtype=np.int64)
+        mask = np.zeros(k, dtype=np.int64)
+        live = np.arange(k)  # Turns still in progress
+        
+        while live.size:
+            live_mask = mask[live]
+            if policy == 'leftmost':
+                col = leftmost_hidden[live_mask]
+            else:
+                pick = (rng.random(live.size) * hidden_count[live_mask]).astype(np.int64)
+                col = nth_hidden[live_mask, pick]
+            card = board[live, row[live], col]
+            live_mask |= 1 << col
+            mask[live] = live_mask
+            
+            # Flip-Flops collected earlier in the turn can be spent on later Jellyfish
+            is_flip_flop = card == FLIP_FLOP
+            held[live[is_flip_flop]] += 1
+            gained_flip_flops[live[is_flip_flop]] += 1
+            
+            is_jellyfish = card == JELLYFISH
+            protected = is_jellyfish & (held[live] > 0)
+            held[live[protected]] -= 1
+            used_flip_flops[live[protected]] += 1
+            
+            is_sun = card == SUN
+            grows = live[is_sun & (rows[live] < rules.max_rows)]
+            if grows.size:
+                # A turn's first Sun deals its whole Sun block from a new deck; later Suns continue it
+                first = grows[expanded[grows] == 0]
+                sun_block[first] = _draw_cards_np(np, rng, deck, first.size, sun_block_cards)
+                dealt = (expanded[grows] * sun_cards)[:, None] + np.arange(sun_cards)
+                extension = sun_block[grows[:, None], dealt].reshape(-1, sun_rows, cols)
+                for i in range(sun_rows):
+                    board[grows, rows[grows] + i] = extension[:, i]
+                rows[grows] += sun_rows
+                expanded[grows] += 1
+            
+            is_shell = card == SHELL
+            gained_shells[live[is_shell]] += 1
+            
+            advance = (card == SAND) | is_flip_flop | protected | is_sun | is_shell
+            row[live[advance]] += 1
+            mask[live[advance]] = 0
+            finished = advance & (row[live] >= rows[live])
+            reached_end[live[finished]] = True
+            
+            ended = finished | (is_jellyfish & ~protected) | ((card == WAVE) & (live_mask == full_mask))
+            live = live[~ended]
+        
+        # Fold the turn results back into the game state and statistics
+        shells[games, seat] += gained_shells
+        flip_flops[games, seat] = held
+        game_rows[games] = rows
+        turns[games] += 1
+        shells_hist += np.bincount(gained_shells, minlength=shells_hist.size)[:shells_hist.size]
+        flip_flops_hist += np.bincount(gained_flip_flops, minlength=flip_flops_hist.size)[:flip_flops_hist.size]
+        stats.flip_flops_used += int(used_flip_flops.sum())
+        stats.sun_expansions += int(expanded.sum())
+        stats.reached_end += int(reached_end.sum())
+        
+        won = shells[games, seat] >= rules.win_shells
+        winners[games[won]] = seat[won] + 1
+        player[games] = 1 - seat
+        games = games[~won]
+    
+    stats.games = num_games
+    stats.wins = [int((winners == 1).sum()), int((winners == 2).sum())]
+    stats.turns = int(turns.sum())
+    for length, count in zip(*np.unique(turns, return_counts=True)):
+        length, count = int(length), int(count)
+        stats.game_length.add(length, count)
+        stats.game_length_buckets.observe(length, count)
+        stats.game_length_sketch.add(length, count)
+    stats.shells_per_turn = {i: int(c) for i, c in enumerate(shells_hist) if c}
+    stats.flip_flops_per_turn = {i: int(c) for i, c in enumerate(flip_flops_hist) if c}
+    return stats
+
+
+def _simulate_batch_args(args):
+    """Unpack a (seed, batch_index, num_games, policy, rules) tuple for process pool workers."""
+    return simulate_batch(*args)
+
+
+def simulate(num_games, policy='leftmost', seed=None, workers=1, backend='python', profile=False,
+             metrics=None, rules=None, store=None):
+    """
+    Simulate many games headlessly with the same policy in both seats.
+    
+    Games are sharded across a process pool when workers > 1 and there is
+    more than one shard; otherwise they run in this process. Each game
+    (or, with the numpy backend, each fixed-size batch) gets its own RNG
+    derived from the seed and its index, so a given seed produces identical
+    aggregate results for any number of workers. Statistics are aggregated
+    in constant memory, so a run's length is limited only by time.
+    
+    Args:
+        num_games (int): Number of complete games to play
+        policy (str): Name of a policy in POLICIES
+        seed (int, optional): Base seed for the run; None picks a random one
+        workers (int): Number of worker processes (0 means one per CPU)
+        backend (str): 'python' to play each game through the turn engine,
+                       'numpy' to resolve batches of games with vector operations
+        profile (bool): Time the games' phases into the result's profile
+                        (python backend only)
+        metrics (GameMetrics, optional): Metrics to count the games into. Every
+                                         shard counts into its own copy, which is
+                                         merged in as soon as the shard finishes,
+                                         so the totals grow while the run goes on
+        rules (RuleSet, optional): Rules to play by; defaults to STANDARD_RULES
+        store (GameStore, optional): Store to append a row per game to, in game
+                                     order (python backend only); it is flushed
+                                     when the run ends
+        
+    Returns:
+        SimulationStats: Aggregated results, including elapsed time
+        
+    Raises:
+        ValueError: For an unknown policy or backend, or profiling or storing
+                    games of the numpy backend
+    """
+    import os
+    import time
+    
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy: {policy}")
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    
+    if backend == 'numpy':
+        if profile:
+            raise ValueError("Profiling needs the python backend")
+        if store is not None:
+            raise ValueError("Storing games needs the python backend")
+        # Fixed-size batches, each seeded by its index
+        run_shard = _simulate_batch_args
+        shard_count = -(-num_games // VECTOR_BATCH_SIZE)
+        shards = ((seed, b, min(VECTOR_BATCH_SIZE, num_games - start), policy, rules)
+                  for b, start in enumerate(range(0, num_games, VECTOR_BATCH_SIZE)))
+    elif backend == 'python':
+        # Several shards per worker keeps the pool busy when shards finish unevenly
+        run_shard = _simulate_range_args
+        shard_count = max(1, min(num_games, workers * 4))
+        if metrics is not None:
+            # Smaller shards so the metrics keep moving during a long run
+            shard_count = max(shard_count, min(num_games, num_games // METRICS_SHARD_GAMES))
+        if store is not None:
+            # Bounded shards, so workers never buffer too many records
+            shard_count = max(shard_count, -(-num_games // GAME_STORE_SHARD_GAMES))
+        shards = ((seed, num_games * i // shard_count, num_games * (i + 1) // shard_count, policy,
+                   profile, metrics is not None, rules, store is not None) for i in range(shard_count))
+    else:
+        raise ValueError(f"Unknown backend: {backend}")
+    
+    stats = SimulationStats()
+    stats.metrics = metrics
+    start = time.perf_counter()
+    
+    def merge(shard_stats):
+        stats.merge(shard_stats)
+        if store is not None:
+            store.append(shard_stats.records)  # Shards finish in order, so games stay in order
+        if metrics is not None and shard_stats.metrics is None:
+            # The numpy backend has no hooks; count what its statistics know
+            metrics.games.value += shard_stats.games
+            metrics.turns.value += shard_stats.turns
+    
+    # Spare workers would only cost a process start each
+    workers = min(workers, shard_count)
+    if workers <= 1:
+        for shard in shards:
+            merge(run_shard(shard))
+    else:
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+        
+        # Shards are generated lazily and at most two per worker are in
+        # flight, so even a billion-game run holds a bounded number of them
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for shard in shards:
+                pending.append(pool.submit(run_shard, shard))
+                if len(pending) >= 2 * workers:
+                    merge(pending.popleft().result())
+            while pending:
+                merge(pending.popleft().result())
+    
+    if store is not None:
+        store.flush()
+    stats.seed = seed
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+class GameRecords:
+    """
+    Per-game records buffered in memory, column by column, for a GameStore.
+    
+    Attach games and every finished game adds one row of GAME_STORE_COLUMNS.
+    Columns are compact arrays, so a simulation worker can buffer thousands
+    of games cheaply and hand them to the process that owns the store.
+    NumPy is not needed to record, only to store.
+    """
+    
+    def __init__(self):
+        from array import array
+        
+        self.columns = {name: array(typecode) for name, _, typecode in GAME_STORE_COLUMNS}
+        self._tallies = {}  # id(game) -> [Flip-Flops used, Sun expansions] of the game in progress
+    
+    def __len__(self):
+        return len(self.columns['seed'])
+    
+    def attach(self, game):
+        """
+        Record a game, and any game it is reset into, once it is won.
+        
+        Args:
+            game (ShellDashGame): Game to record
+        """
+        game.add_hook('on_turn_end', self._on_turn_end)
+    
+    def _on_turn_end(self, game, result):
+        tally = self._tallies.get(id(game))
+        if tally is None or game.turn_index == 1:  # The first turn of a (new) game
+            tally = self._tallies[id(game)] = [0, 0]
+        tally[0] += result.flip_flops_used
+        tally[1] += result.sun_expansions
+        if result.winner:
+            del self._tallies[id(game)]
+            # Games deal from the seed's low 64 bits (see CounterRandom), so that is what replays need
+            self.add(game.seed & MASK64, result.winner, game.turn_index, game.shell_count[0], game.shell_count[1],
+                     tally[0], tally[1], game.rows)
+    
+    def add(self, seed, winner, turns, shells_1, shells_2, flip_flops_used, sun_expansions, rows):
+        """Add one game's row, with values in GAME_STORE_COLUMNS order."""
+        columns = self.columns
+        columns['seed'].append(seed)
+        columns['winner'].append(winner)
+        columns['turns'].append(turns)
+        columns['shells_1'].append(shells_1)
+        columns['shells_2'].append(shells_2)
+        columns['flip_flops_used'].append(flip_flops_used)
+        columns['sun_expansions'].append(sun_expansions)
+        columns['rows'].append(rows)
+    
+    def clear(self):
+        """Forget the buffered rows (games in progress keep their tallies)."""
+        for column in self.columns.values():
+            del column[:]
+
+
+# A condition of a GameStore query, e.g. parse_condition('turns>=20')
+QueryCondition = namedtuple('QueryCondition', ['column', 'op', 'value'])
+
+# Comparison operators of query conditions -> NumPy ufunc name
+QUERY_OPERATORS = {'=': 'equal', '==': 'equal', '!=': 'not_equal',
+                   '<': 'less', '<=': 'less_equal', '>': 'greater', '>=': 'greater_equal'}
+
+# Aggregates of a GameStore query: 'count', or one of these applied to a column
+QUERY_AGGREGATES = ('sum', 'mean', 'min', 'max')
+
+
+def parse_condition(text):
+    """
+    Parse a query condition such as 'winner=1' or 'turns>=20'.
+    
+    Args:
+        text (str): Column name, comparison operator and integer value
+        
+    Returns:
+        QueryCondition: The parsed condition
+        
+    Raises:
+        ValueError: For malformed conditions or unknown columns
+    """
+    import re
+    
+    match = re.fullmatch(r'\s*(\w+)\s*(==|!=|<=|>=|=|<|>)\s*(-?\d+)\s*', text)
+    if not match:
+        raise ValueError(f"Bad condition {text!r}; expected COLUMN OP VALUE, e.g. turns>=20")
+    column, op, value = match.groups()
+    if column not in dict((name, dtype) for name, dtype, _ in GAME_STORE_COLUMNS):
+        raise ValueError(f"Unknown column: {column}")
+    return QueryCondition(column, op, int(value))
+
+
+def parse_aggregate(text):
+    """
+    Parse a query aggregate: 'count', or FUNCTION:COLUMN such as 'mean:turns'.
+    
+    Returns:
+        tuple: (function, column), with column None for 'count'
+        
+    Raises:
+        ValueError: For unknown functions or columns
+    """
+    text = text.strip()
+    if text == 'count':
+        return 'count', None
+    function, _, column = text.partition(':')
+    if function not in QUERY_AGGREGATES or not column:
+        raise ValueError(f"Bad aggregate {text!r}; expected count or one of "
+                         f"{', '.join(QUERY_AGGREGATES)} followed by :COLUMN")
+    if column not in dict((name, dtype) for name, dtype, _ in GAME_STORE_COLUMNS):
+        raise ValueError(f"Unknown column: {column}")
+    return function, column
+
+
+class QueryResult:
+    """
+    Rows returned by GameStore.query().
+    
+    Attributes:
+        columns (list): Group-by column names followed by the aggregates
+        rows (list): One tuple per group, sorted by the group values
+        scanned (int): Games the query scanned
+        elapsed (float): Wall-clock seconds the query took
+    """
+    
+    def __init__(self, columns, rows, scanned=0, elapsed=0.0):
+        self.columns = columns
+        self.rows = rows
+        self.scanned = scanned
+        self.elapsed = elapsed
+    
+    def report(self):
+        """
+        Format the rows as a table.
+        
+        Returns:
+            str: Header line, one line per row, then the scan rate
+        """
+        def show(value):
+            return f"{value:,.4f}" if isinstance(value, float) else f"{value:,}"
+        
+        cells = [[show(value) if value is not None else '-' for value in row] for row in self.rows]
+        widths = [max(len(name), *(len(row[i]) for row in cells)) for i, name in enumerate(self.columns)]
+        lines = ["  ".join(f"{name:>{w}}" for name, w in zip(self.columns, widths))]
+        lines += ["  ".join(f"{value:>{w}}" for value, w in zip(row, widths)) for row in cells]
+        rate = f", {self.scanned / self.elapsed:,.0f} games/sec" if self.elapsed > 0 else ""
+        lines.append(f"{self.scanned:,} games scanned in {self.elapsed:.2f}s{rate}")
+        return "\n".join(lines)
+
+
+class GameStore:
+    """
+    Columnar on-disk store of per-game records, memory-mapped with NumPy.
+    
+    A store is a directory with one file per column of GAME_STORE_COLUMNS,
+    each a flat array of fixed-width little-endian values, and a small JSON
+    file holding the number of games. Column files are memory-mapped and
+    grow GAME_STORE_CHUNK_ROWS games at a time, so appending never rewrites
+    what is already stored. The game count is only written after the
+    columns are flushed, so a crash mid-append leaves the earlier games
+    intact.
+    
+    Queries scan the columns they need in blocks of GAME_STORE_SCAN_ROWS
+    games. The blocks are views of the mapped files, so memory use stays
+    bounded however many games are stored and the operating system's page
+    cache keeps hot columns in RAM between queries.
+    """
+    
+    def __init__(self, path, mode='r'):
+        """
+        Args:
+            path (str): Directory of the store
+            mode (str): 'r' to query, 'a' to append (creating the store if needed)
+            
+        Raises:
+            ImportError: If NumPy is not installed
+            ValueError: For an unknown mode, or a directory that isn't a game store
+            FileNotFoundError: If mode is 'r' and there is no store at path
+        """
+        import json
+        import os
+        
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("The game store requires NumPy (pip install numpy)") from None
+        
+        if mode not in ('r', 'a'):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.np = np
+        self.path = path
+        self.mode = mode
+        self.dtypes = {name: np.dtype(dtype) for name, dtype, _ in GAME_STORE_COLUMNS}
+        meta_path = os.path.join(path, GAME_STORE_META)
+        if mode == 'a' and not os.path.exists(meta_path):
+            os.makedirs(path, exist_ok=True)
+            for name in self.dtypes:
+                open(self._column_path(name), 'wb').close()
+            self.count = 0
+            self._write_meta()
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"No game store at {path}")
+        with open(meta_path) as f:
+            meta = json.load(f)
+        columns = {name: dtype for name, dtype, _ in GAME_STORE_COLUMNS}
+        if meta.get('version') != GAME_STORE_VERSION or meta.get('columns') != columns:
+            raise ValueError(f"{path} is not a version {GAME_STORE_VERSION} game store")
+        self.count = meta['count']
+        self._maps = {}
+        self.capacity = 0
+        if mode == 'r':
+            for name, dtype in self.dtypes.items():
+                self._maps[name] = (np.memmap(self._column_path(name), dtype, 'r', shape=(self.count,))
+                                    if self.count else np.zeros(0, dtype))
+        else:
+            self._grow(self.count)
+    
+    def _column_path(self, name):
+        import os
+        
+        return os.path.join(self.path, name + '.col')
+    
+    def _write_meta(self):
+        """Atomically record how many games the column files hold."""
+        import json
+        import os
+        
+        meta_path = os.path.join(self.path, GAME_STORE_META)
+        columns = {name: dtype for name, dtype, _ in GAME_STORE_COLUMNS}
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump({'version': GAME_STORE_VERSION, 'count': self.count, 'columns': columns}, f)
+        os.replace(meta_path + '.tmp', meta_path)
+    
+    def _grow(self, rows):
+        """Extend every column file, a whole number of chunks at a time, to hold rows games."""
+        np = self.np
+        chunks = -(-rows // GAME_STORE_CHUNK_ROWS)
+        capacity = max(chunks, 1) * GAME_STORE_CHUNK_ROWS
+        if capacity <= self.capacity:
+            return
+        for name, dtype in self.dtypes.items():
+            mapped = self._maps.pop(name, None)
+            if mapped is not None:
+                mapped.flush()
+                del mapped
+            path = self._column_path(name)
+            with open(path, 'r+b') as f:
+                f.truncate(capacity * dtype.itemsize)
+            self._maps[name] = np.memmap(path, dtype, 'r+', shape=(capacity,))
+        self.capacity = capacity
+    
+    def __len__(self):
+        return self.count
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def append(self, records):
+        """
+        Append games to the end of the store.
+        
+        Args:
+            records (GameRecords or dict): Buffered records, or column name ->
+                                           equal-length array of values
+                                           
+        Raises:
+            ValueError: If the store was opened read-only or columns are missing
+        """
+        np = self.np
+        if self.mode != 'a':
+            raise ValueError("Store was opened read-only")
+        columns = records.columns if isinstance(records, GameRecords) else records
+        missing = [name for name in self.dtypes if name not in columns]
+        if missing:
+            raise ValueError(f"Missing column(s): {', '.join(missing)}")
+        count = len(columns['seed'])
+        if not count:
+            return
+        self._grow(self.count + count)
+        for name in self.dtypes:
+            self._maps[name][self.count:self.count + count] = np.asarray(columns[name])
+        self.count += count
+    
+    def flush(self):
+        """Write appended games to disk and make them visible to new readers."""
+        if self.mode == 'a':
+            for mapped in self._maps.values():
+                mapped.flush()
+            self._write_meta()
+    
+    def close(self):
+        """Flush and unmap the column files."""
+        self.flush()
+        self._maps = {}
+        self.capacity = 0
+    
+    def column(self, name):
+        """
+        Memory-mapped view of one column's stored values.
+        
+        Args:
+            name (str): Column name from GAME_STORE_COLUMNS
+            
+        Returns:
+            numpy.ndarray: Read-only view with one value per game
+        """
+        view = self._maps[name][:self.count]
+        view.flags.writeable = False
+        return view
+    
+    def query(self, where=(), group_by=(), aggregates=('count',), workers=1, block_rows=GAME_STORE_SCAN_ROWS):
+        """
+        Filter, group and aggregate the stored games.
+        
+        Only the columns the query mentions are read, one block at a time,
+        so a query over a billion games touches a few gigabytes of mapped
+        pages and needs memory for just a few blocks. NumPy releases the GIL
+        while it scans, so blocks are spread over threads rather than
+        processes, with no copying of the mapped columns.
+        
+        Args:
+            where (list): Conditions that must all hold, as QueryCondition
+                          values or strings for parse_condition()
+            group_by (list): Column names to group by; none gives one row
+            aggregates (list): 'count' or FUNCTION:COLUMN strings (see parse_aggregate)
+            workers (int): Threads scanning blocks (0 means one per CPU)
+            block_rows (int): Games scanned per block
+            
+        Returns:
+            QueryResult: One row per group holding the group values and aggregates
+            
+        Raises:
+            ValueError: For unknown columns, operators or aggregates
+        """
+        import os
+        import time
+        
+        began = time.perf_counter()
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        conditions = [parse_condition(c) if isinstance(c, str) else QueryCondition(*c) for c in where]
+        for condition in conditions:
+            if condition.op not in QUERY_OPERATORS:
+                raise ValueError(f"Unknown operator: {condition.op}")
+        group_by = list(group_by)
+        parsed = [parse_aggregate(a) for a in aggregates]
+        for name in group_by + [c.column for c in conditions]:
+            if name not in self.dtypes:
+                raise ValueError(f"Unknown column: {name}")
+        summed = sorted({column for function, column in parsed if function in ('sum', 'mean')})
+        minimum = sorted({column for function, column in parsed if function == 'min'})
+        maximum = sorted({column for function, column in parsed if function == 'max'})
+        
+        groups = {}  # Group values -> [count, {column: sum}, {column: min}, {column: max}]
+        
+        def scan(start):
+            return self._scan_block(start, min(start + block_rows, self.count), conditions, group_by,
+                                    summed, minimum, maximum)
+        
+        def merge(tallies):
+            for key, tally in tallies:
+                total = groups.get(key)
+                if total is None:
+                    groups[key] = tally
+                    continue
+                total[0] += tally[0]
+                for column, value in tally[1].items():
+                    total[1][column] += value
+                for column, value in tally[2].items():
+                    total[2][column] = min(total[2][column], value)
+                for column, value in tally[3].items():
+                    total[3][column] = max(total[3][column], value)
+        
+        starts = range(0, self.count, block_rows)
+        if workers == 1:
+            for start in starts:
+                merge(scan(start))
+        else:
+            from collections import deque
+            from concurrent.futures import ThreadPoolExecutor
+            
+            pending = deque()  # At most two blocks per thread in flight
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for start in starts:
+                    pending.append(pool.submit(scan, start))
+                    if len(pending) >= 2 * workers:
+                        merge(pending.popleft().result())
+                while pending:
+                    merge(pending.popleft().result())
+        if not group_by and not groups:
+            groups[()] = [0, {c: 0 for c in summed}, {c: None for c in minimum}, {c: None for c in maximum}]
+        
+        rows = []
+        for key in sorted(groups):
+            count, sums, mins, maxes = groups[key]
+            row = list(key)
+            for function, column in parsed:
+                if function == 'count':
+                    row.append(count)
+                elif function == 'sum':
+                    row.append(sums[column])
+                elif function == 'mean':
+                    row.append(sums[column] / count if count else None)
+                else:
+                    row.append((mins if function == 'min' else maxes)[column])
+            rows.append(tuple(row))
+        columns = group_by + [a.strip() for a in aggregates]
+        return QueryResult(columns, rows, self.count, time.perf_counter() - began)
+    
+    def _scan_block(self, start, stop, conditions, group_by, summed, minimum, maximum):
+        """Filter one block of games and aggregate it, as a list of (group values, tally)."""
+        np = self.np
+        block = {name: mapped[start:stop] for name, mapped in self._maps.items()}
+        mask = None
+        for condition in conditions:
+            values = block[condition.column]
+            if not np.can_cast(np.min_scalar_type(condition.value), values.dtype):
+                values = values.astype(np.int64)  # Compare out-of-range values exactly
+            test = getattr(np, QUERY_OPERATORS[condition.op])(values, condition.value)
+            mask = test if mask is None else mask & test
+        if mask is not None:
+            block = {name: values[mask] for name, values in block.items()
+                     if name in group_by or name in summed or name in minimum or name in maximum}
+            selected = int(np.count_nonzero(mask))
+        else:
+            selected = stop - start
+        if not selected:
+            return []
+        return list(self._aggregate_block(block, selected, group_by, summed, minimum, maximum))
+    
+    def _column_sums(self, values, code=None, size=1):
+        """
+        Exact sums of one column of a block, in total or per group.
+        
+        Values are summed 16 bits at a time and the partial sums are combined
+        as Python ints. A digit's sum over a block stays far below 2**53, so it
+        is exact both in uint64 and in bincount's float64 weights, and no
+        column (not even 64-bit seeds) can wrap or round.
+        
+        Args:
+            values (ndarray): The column's values in the block
+            code (ndarray, optional): Group number of each value; None sums them all
+            size (int): Number of groups
+            
+        Returns:
+            list: Sum of each group as a Python int (one sum when code is None)
+        """
+        np = self.np
+        totals = [0] * size
+        for shift in range(0, 8 * values.dtype.itemsize, 16):
+            digits = values >> shift & 0xFFFF if values.dtype.itemsize > 2 else values
+            if code is None:
+                partial = [int(digits.sum(dtype=np.uint64))]
+            else:
+                partial = np.bincount(code, weights=digits, minlength=size).tolist()
+            totals = [total + (int(part) << shift) for total, part in zip(totals, partial)]
+        return totals
+    
+    def _aggregate_block(self, block, selected, group_by, summed, minimum, maximum):
+        """Yield (group values, [count, sums, mins, maxes]) for each group in one block of games."""
+        np = self.np
+        if not group_by:
+            yield (), [selected,
+                       {c: self._column_sums(block[c])[0] for c in summed},
+                       {c: int(block[c].min()) for c in minimum},
+                       {c: int(block[c].max()) for c in maximum}]
+            return
+        
+        # Number the groups: small value ranges combine arithmetically, which
+        # lets bincount do the grouping; anything wider falls back to sorting
+        lows, spans = [], []
+        for name in group_by:
+            values = block[name]
+            lows.append(int(values.min()))
+            spans.append(int(values.max()) - lows[-1] + 1)
+        if np.prod(np.array(spans, dtype=float)) <= 4 * selected + (1 << 16):
+            code = None
+            for name, low, span in zip(group_by, lows, spans):
+                digit = block[name].astype(np.intp)
+                if low:
+                    digit -= low
+                if code is None:
+                    code = digit
+                else:
+                    code *= span
+                    code += digit
+            size = int(np.prod(spans))
+            counts = np.bincount(code, minlength=size)
+            present = np.flatnonzero(counts)
+            keys = []
+            for index in present.tolist():
+                values = []
+                for low, span in zip(reversed(lows), reversed(spans)):
+                    index, digit = divmod(index, span)
+                    values.append(low + digit)
+                keys.append(tuple(reversed(values)))
+        else:
+            stacked = np.stack([block[name].astype(np.uint64) for name in group_by], axis=1)
+            unique, code = np.unique(stacked, axis=0, return_inverse=True)
+            code = code.reshape(-1)
+            size = len(unique)
+            counts = np.bincount(code, minlength=size)
+            present = np.arange(size)
+            keys = [tuple(row) for row in unique.tolist()]
+        
+        sums = {c: self._column_sums(block[c], code, size) for c in summed}
+        mins, maxes = {}, {}
+        for c in minimum:
+            mins[c] = np.full(size, np.iinfo(block[c].dtype).max, dtype=block[c].dtype)
+            np.minimum.at(mins[c], code, block[c])
+        for c in maximum:
+            maxes[c] = np.zeros(size, dtype=block[c].dtype)
+            np.maximum.at(maxes[c], code, block[c])
+        for i, key in enumerate(keys):
+            index = present[i]
+            yield key, [int(counts[index]),
+                        {c: sums[c][index] for c in summed},
+                        {c: int(mins[c][index]) for c in minimum},
+                        {c: int(maxes[c][index]) for c in maximum}]
+
+
+# Fewest replicates before estimate_win_rates() may stop: below this, sample
+# variances (and so the confidence intervals) are too noisy to stop on
+ESTIMATE_MIN_REPLICATES = 200
+
+
+class CoupledGame(ShellDashGame):
+    """
+    A game dealt from a deck of numbered slots, for variance-reduced estimates.
+    
+    Games of different deck variants with the same seed see the same
+    shuffles (see deal_slots and coupled_layouts), and with swap_seats the
+    two players trade every board: Player 1 is dealt the boards Player 2
+    would have had and vice versa. Both tricks pair games whose outcomes
+    are strongly correlated. The deals differ from a plain ShellDashGame's
+    for the same seed, so these games are for estimators, not for play.
+    """
+    
+    def __init__(self, layout, players=None, swap_seats=False):
+        """
+        Args:
+            layout (list): Card code held by each deck slot (see coupled_layouts)
+            players (list, optional): Bot Policy for each seat
+            swap_seats (bool): Deal each player the other player's boards
+        """
+        self.layout = list(layout)
+        self.swap_seats = swap_seats
+        super().__init__(players=players)
+        self.set_layout(layout)
+    
+    def set_layout(self, layout):
+        """Deal from a new slot layout from the next deal on; card_counts follows it."""
+        self.layout = list(layout)
+        self.card_counts = [self.layout.count(code) for code in range(len(CARD_NAMES))]
+    
+    def deal_cards(self, count):
+        deck_rng = self.deck_rng
+        dealt, deck_rng.counter = deal_slots(deck_rng.key, deck_rng.counter, self.layout, count)
+        return dealt
+    
+    def _deal(self, deal, count):
+        if self.swap_seats:
+            deal ^= 2  # The deals of turns 2k and 2k + 1 trade places
+        return super()._deal(deal, count)
+
+
+def opening_stratum(key, layout):
+    """
+    Stratum of a game by the Shell and Sun cards in the first row of each player's first board.
+    
+    Strata are numbered 2 * min(shells, 2) + (1 if any Sun else 0) over the
+    six cards, so there are six of them.
+    
+    Args:
+        key (int): CounterRandom key of the game's deck stream
+        layout (list): Slot layout the game is dealt from
+        
+    Returns:
+        int: Stratum index, 0-5
+    """
+    cards = (deal_slots(key, 0, layout, 3)[0]
+             + deal_slots(key, 2 * DEAL_STRIDE, layout, 3)[0])
+    return 2 * min(cards.count(SHELL), 2) + (SUN in cards)
+
+
+def opening_strata_probabilities(card_counts):
+    """
+    Exact probability of each opening_stratum() for a deck.
+    
+    Each first row is 3 cards from a fresh deck, so the Shells and Suns in
+    it follow a multivariate hypergeometric distribution, and the two rows
+    are independent.
+    
+    Args:
+        card_counts (list): Number of cards of each type in the deck
+        
+    Returns:
+        list: Probability of each of the six strata
+    """
+    import math
+    
+    shells, suns = card_counts[SHELL], card_counts[SUN]
+    total = sum(card_counts)
+    others = total - shells - suns
+    row = {}  # (shells, suns) in one row of 3 -> probability
+    for s in range(4):
+        for u in range(4 - s):
+            row[s, u] = (math.comb(shells, s) * math.comb(suns, u) * math.comb(others, 3 - s - u)
+                         / math.comb(total, 3))
+    probabilities = [0.0] * 6
+    for (s1, u1), p1 in row.items():
+        for (s2, u2), p2 in row.items():
+            probabilities[2 * min(s1 + s2, 2) + (u1 + u2 > 0)] += p1 * p2
+    return probabilities
+
+
+class WinRateEstimate:
+    """
+    Player 1 win rate of several deck variants, estimated with variance reduction.
+    
+    Every replicate plays one game per variant from the same seed (common
+    random numbers), plus, when antithetic, the seat-swapped twin of each
+    game, and records the replicate's stratum. Sums are kept per stratum so
+    estimates from different workers merge exactly. Differences are always
+    measured against the first variant.
+    
+    Attributes:
+        variants (list): card_counts of each variant
+        probabilities (list): Probability of each stratum (a single stratum
+                              of probability 1 when not stratified)
+        strata (list): Per stratum, [replicates, sums, sums of squares], where
+                       sums hold each variant's win rate and then each
+                       difference from the first variant
+        antithetic (bool): Whether replicates include seat-swapped games
+        seed (int): Base seed of the estimate, once run
+        elapsed (float): Wall-clock seconds spent estimating
+    """
+    
+    def __init__(self, variants, probabilities=(1.0,), antithetic=True):
+        self.variants = [list(counts) for counts in variants]
+        self.probabilities = list(probabilities)
+        self.antithetic = antithetic
+        size = 2 * len(self.variants) - 1
+        self.strata = [[0, [0.0] * size, [0.0] * size] for _ in self.probabilities]
+        self.seed = None
+        self.elapsed = 0.0
+    
+    @property
+    def replicates(self):
+        """Number of replicates played."""
+        return sum(stratum[0] for stratum in self.strata)
+    
+    @property
+    def games(self):
+        """Number of games played."""
+        return self.replicates * len(self.variants) * (2 if self.antithetic else 1)
+    
+    def record(self, stratum, rates):
+        """
+        Add one replicate.
+        
+        Args:
+            stratum (int): Stratum of the replicate
+            rates (list): Player 1 win rate of each variant in the replicate
+        """
+        values = list(rates) + [rate - rates[0] for rate in rates[1:]]
+        entry = self.strata[stratum]
+        entry[0] += 1
+        sums, squares = entry[1], entry[2]
+        for i, value in enumerate(values):
+            sums[i] += value
+            squares[i] += value * value
+    
+    def merge(self, other):
+        """Fold another estimate of the same variants (e.g. from a worker process) into this one."""
+        for entry, (count, sums, squares) in zip(self.strata, other.strata):
+            entry[0] += count
+            for i in range(len(sums)):
+                entry[1][i] += sums[i]
+                entry[2][i] += squares[i]
+    
+    def _estimate(self, index):
+        """Post-stratified mean of quantity index and the variance of that mean."""
+        mean = variance = weight = 0.0
+        for p, (count, sums, squares) in zip(self.probabilities, self.strata):
+            if count:
+                weight += p
+                stratum_mean = sums[index] / count
+                mean += p * stratum_mean
+                if count > 1:
+                    spread = max(0.0, squares[index] - count * stratum_mean * stratum_mean) / (count - 1)
+                    variance += p * p * spread / count
+        if weight == 0:
+            return 0.0, float('inf')
+        # Renormalize over the strata seen so far
+        return mean / weight, variance / (weight * weight)
+    
+    def _interval(self, index, low, high, z):
+        mean, variance = self._estimate(index)
+        half = z * variance ** 0.5
+        return mean, (max(low, mean - half), min(high, mean + half))
+    
+    def win_rate(self, i, z=1.96):
+        """
+        Player 1 win rate of variant i.
+        
+        Returns:
+            tuple: (win rate, (low, high) 95% confidence interval)
+        """
+        return self._interval(i, 0.0, 1.0, z)
+    
+    def difference(self, i, z=1.96):
+        """
+        Player 1 win rate of variant i minus that of the first variant.
+        
+        Returns:
+            tuple: (difference, (low, high) 95% confidence interval)
+        """
+        return self._interval(len(self.variants) + i - 1, -1.0, 1.0, z)
+    
+    def width(self):
+        """
+        Widest confidence interval of interest: the differences if there are several variants, else the win rate.
+        
+        Returns:
+            float: Width (high - low) of the widest interval
+        """
+        if len(self.variants) == 1:
+            intervals = [self.win_rate(0)[1]]
+        else:
+            intervals = [self.difference(i)[1] for i in range(1, len(self.variants))]
+        return max(high - low for low, high in intervals)
+    
+    def plain_games(self):
+        """
+        Games plain Monte Carlo would need for the same confidence intervals.
+        
+        Plain Monte Carlo plays independent games for each variant, so a win
+        rate p needs p(1 - p) / variance games, and a difference needs that
+        many for both variants.
+        
+        Returns:
+            float: Estimated games, for comparison with self.games
+        """
+        rates = [self._estimate(i)[0] for i in range(len(self.variants))]
+        spread = [p * (1 - p) for p in rates]
+        if len(self.variants) == 1:
+            needed = spread[0] / max(self._estimate(0)[1], 1e-300)
+        else:
+            needed = max((spread[0] + spread[i]) / max(self._estimate(len(self.variants) + i - 1)[1], 1e-300)
+                         for i in range(1, len(self.variants)))
+        return needed * len(self.variants)
+    
+    def report(self):
+        """
+        Format the estimates as a human-readable summary.
+        
+        Returns:
+            str: Multi-line report of win rates, differences and efficiency
+        """
+        lines = [f"Games played:         {self.games} ({self.replicates} replicates)"]
+        for i, counts in enumerate(self.variants):
+            rate, (low, high) = self.win_rate(i)
+            line = f"Variant {i} {counts}: P1 win rate {rate:.4f} [{low:.4f}, {high:.4f}]"
+            if i:
+                diff, (low, high) = self.difference(i)
+                line += f", vs variant 0 {diff:+.4f} [{low:+.4f}, {high:+.4f}]"
+            lines.append(line)
+        if self.replicates > 1:
+            plain = self.plain_games()
+            lines.append(f"Plain Monte Carlo:    ~{plain:,.0f} games for the same precision "
+                         f"({plain / self.games:.1f}x more)")
+        if self.seed is not None:
+            lines.append(f"Seed:                 {self.seed}")
+        if self.elapsed > 0:
+            lines.append(f"Throughput:           {self.games / self.elapsed:.1f} games/sec")
+        return "\n".join(lines)
+
+
+def estimate_range(seed, start, stop, variants, policy='leftmost', antithetic=True, stratify=False):
+    """
+    Play replicates start..stop-1 of a seeded win rate estimate.
+    
+    Replicate r plays every variant from the seed derive_seed(seed, r), with
+    the same policy seeds, so variants are compared on the same shuffles.
+    
+    Args:
+        seed (int): Base seed of the whole estimate
+        start (int): Index of the first replicate
+        stop (int): Index one past the last replicate
+        variants (list): card_counts of each deck variant
+        policy (str): Name of a policy in POLICIES, used for both seats
+        antithetic (bool): Also play each game with the seats' boards swapped
+        stratify (bool): Post-stratify replicates by opening_stratum()
+        
+    Returns:
+        WinRateEstimate: Sums for just this range of replicates
+    """
+    layouts = coupled_layouts(variants)
+    probabilities = opening_strata_probabilities(variants[0]) if stratify else (1.0,)
+    estimate = WinRateEstimate(variants, probabilities, antithetic)
+    policy_class = POLICIES[policy]
+    policies = [policy_class(), policy_class()]
+    games = [CoupledGame(layouts[0], policies, swap) for swap in ((False, True) if antithetic else (False,))]
+    for index in range(start, stop):
+        game_seed = derive_seed(seed, index)
+        seat_seeds = (derive_seed(seed, index, 1), derive_seed(seed, index, 2))
+        rates = []
+        for layout in layouts:
+            wins = 0
+            for game in games:
+                game.set_layout(layout)
+                game.reset(game_seed)
+                first, second = seat_seeds[::-1] if game.swap_seats else seat_seeds
+                policies[0].reseed(first)
+                policies[1].reseed(second)
+                wins += run_game(game) == 1
+            rates.append(wins / len(games))
+        stratum = opening_stratum(games[0].deck_rng.key, layouts[0]) if stratify else 0
+        estimate.record(stratum, rates)
+    return estimate
+
+
+def _estimate_range_args(args):
+    """Unpack an estimate_range argument tuple for process pool workers."""
+    return estimate_range(*args)
+
+
+def estimate_win_rates(variants, policy='leftmost', seed=None, target_width=0.01, max_games=10 ** 7,
+                       batch_size=1000, workers=1, antithetic=True, stratify=False):
+    """
+    Estimate the Player 1 win rate of deck variants until the confidence intervals are narrow enough.
+    
+    Replicates are played in batches of batch_size, and batches are merged
+    in order; after each one the estimate stops if the widest interval of
+    interest (see WinRateEstimate.width) is at most target_width, once at
+    least ESTIMATE_MIN_REPLICATES replicates make the intervals trustworthy. A given
+    seed, batch size and target therefore give the same result for any
+    number of workers.
+    
+    Args:
+        variants (list): card_counts of each deck variant; differences are
+                         measured against the first
+        policy (str): Name of a policy in POLICIES, used for both seats
+        seed (int, optional): Base seed; None picks a random one
+        target_width (float): Stop once every 95% interval is this narrow
+        max_games (int): Stop after about this many games regardless
+        batch_size (int): Replicates per batch
+        workers (int): Number of worker processes (0 means one per CPU)
+        antithetic (bool): Pair every game with its seat-swapped twin
+        stratify (bool): Post-stratify by Shell and Sun cards in the opening rows
+        
+    Returns:
+        WinRateEstimate: Estimates with confidence intervals, and games played
+        
+    Raises:
+        ValueError: For an unknown policy or no variants
+    """
+    import os
+    import time
+    
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy: {policy}")
+    if not variants:
+        raise ValueError("Need at least one deck variant")
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    games_per_replicate = len(variants) * (2 if antithetic else 1)
+    max_replicates = max(2, max_games // games_per_replicate)
+    
+    def batches():
+        for start in range(0, max_replicates, batch_size):
+            yield (seed, start, min(start + batch_size, max_replicates), variants, policy,
+                   antithetic, stratify)
+    
+    probabilities = opening_strata_probabilities(variants[0]) if stratify else (1.0,)
+    estimate = WinRateEstimate(variants, probabilities, antithetic)
+    began = time.perf_counter()
+    
+    def done(batch_estimate):
+        estimate.merge(batch_estimate)
+        return estimate.replicates >= ESTIMATE_MIN_REPLICATES and estimate.width() <= target_width
+    
+    if workers == 1:
+        for batch in batches():
+            if done(estimate_range(*batch)):
+                break
+    else:
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+        
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for batch in batches():
+                pending.append(pool.submit(estimate_range, *batch))
+                if len(pending) >= 2 * workers and done(pending.popleft().result()):
+                    break
+            else:
+                while pending and not done(pending.popleft().result()):
+                    pass
+            for future in pending:
+                future.cancel()
+    estimate.seed = seed
+    estimate.elapsed = time.perf_counter() - began
+    return estimate
+
+
+def play_pairing(seed, names, first, second, start, stop):
+    """
+    Play games start..stop-1 between two policies of a tournament.
+    
+    Seats alternate: in even-numbered games the first policy moves first.
+    One game object and one instance of each policy are reused (and
+    reseeded) for the whole batch, so every game is reproducible from
+    (seed, pairing, game index) no matter how games are batched.
+    
+    Args:
+        seed (int): Base seed of the tournament
+        names (list): Policy names of all entrants, indexing into POLICIES
+        first (int): Index of the first policy in names
+        second (int): Index of the second policy in names
+        start (int): Index of the first game to play
+        stop (int): Index one past the last game to play
+        
+    Returns:
+        tuple: (first, second, wins for first, wins for second)
+    """
+    entrants = [POLICIES[names[first]](), POLICIES[names[second]]()]
+    game = ShellDashGame()
+    wins = [0, 0]
+    for index in range(start, stop):
+        order = [0, 1] if index % 2 == 0 else [1, 0]  # Entrant in seat 1, entrant in seat 2
+        game.reset(derive_seed(seed, first, second, index))
+        for seat, entrant in enumerate(order):
+            entrants[entrant].reseed(derive_seed(seed, first, second, index, seat + 1))
+            game.players[seat] = entrants[entrant]
+        winner = run_game(game)
+        wins[order[winner - 1]] += 1
+    return first, second, wins[0], wins[1]
+
+
+def _play_pairing_args(args):
+    """Unpack a play_pairing() argument tuple for process pool workers."""
+    return play_pairing(*args)
+
+
+class TournamentResult:
+    """
+    Head-to-head results of a round-robin tournament between policies.
+    
+    Provides win rates with Wilson confidence intervals for every pairing
+    and overall, plus Elo ratings fitted to all results at once.
+    """
+    
+    def __init__(self, names):
+        self.names = list(names)
+        size = len(self.names)
+        self.wins = [[0] * size for _ in range(size)]  # wins[i][j]: games policy i won against j
+        self.elapsed = 0.0
+    
+    def games(self, i, j):
+        """Return how many games policies i and j played against each other."""
+        return self.wins[i][j] + self.wins[j][i]
+    
+    @staticmethod
+    def wilson_interval(wins, games, z=1.96):
+        """
+        Wilson score confidence interval for a win rate.
+        
+        Args:
+            wins (int): Games won
+            games (int): Games played
+            z (float): Normal quantile (1.96 for 95% confidence)
+            
+        Returns:
+            tuple: (low, high) bounds on the true win rate
+        """
+        if games == 0:
+            return 0.0, 1.0
+        p = wins / games
+        denom = 1 + z * z / games
+        center = (p + z * z / (2 * games)) / denom
+        half = z * ((p * (1 - p) / games + z * z / (4 * games * games)) ** 0.5) / denom
+        return max(0.0, center - half), min(1.0, center + half)
+    
+    def win_rate(self, i, j):
+        """
+        Win rate of policy i against policy j.
+        
+        Returns:
+            tuple: (win rate, (low, high) 95% confidence interval)
+        """
+        games = self.games(i, j)
+        rate = self.wins[i][j] / games if games else 0.0
+        return rate, self.wilson_interval(self.wins[i][j], games)
+    
+    def overall(self, i):
+        """
+        Win rate of policy i against all opponents combined.
+        
+        Returns:
+            tuple: (win rate, (low, high) 95% confidence interval)
+        """
+        wins = sum(self.wins[i])
+        games = sum(self.games(i, j) for j in range(len(self.names)) if j != i)
+        return (wins / games if games else 0.0), self.wilson_interval(wins, games)
+    
+    def ratings(self, iterations=1000):
+        """
+        Fit Elo ratings to all results with a Bradley-Terry model.
+        
+        Each pairing gets half a win added in both directions so unbeaten
+        or winless policies still get finite ratings. Ratings are centered
+        on 1500.
+        
+        Args:
+            iterations (int): Maximum minorize-maximize iterations
+            
+        Returns:
+            list: Elo rating for each policy, in the order of names
+        """
+        import math
+        
+        size = len(self.names)
+        strength = [1.0] * size
+        for _ in range(iterations):
+            updated = []
+            for i in range(size):
+                wins = sum(self.wins[i][j] + 0.5 for j in range(size) if j != i and self.games(i, j))
+                denom = sum((self.games(i, j) + 1) / (strength[i] + strength[j])
+                            for j in range(size) if j != i and self.games(i, j))
+                updated.append(wins / denom if denom else strength[i])
+            scale = math.exp(sum(math.log(s) for s in updated) / size)
+            updated = [s / scale for s in updated]
+            converged = max(abs(a - b) for a, b in zip(updated, strength)) < 1e-10
+            strength = updated
+            if converged:
+                break
+        return [1500 + 400 * math.log10(s) for s in strength]
+    
+    def report(self):
+        """
+        Format ratings, overall win rates and the head-to-head table.
+        
+        Returns:
+            str: Multi-line tournament report
+        """
+        ratings = self.ratings()
+        order = sorted(range(len(self.names)), key=lambda i: -ratings[i])
+        width = max(len(name) for name in self.names) + 2
+        lines = [f"{'Policy':<{width}} {'Elo':>6}  {'Win rate':>8}  95% CI"]
+        for i in order:
+            rate, (low, high) = self.overall(i)
+            lines.append(f"{self.names[i]:<{width}} {ratings[i]:>6.0f}  {rate:>8.4f}  [{low:.4f}, {high:.4f}]")
+        lines.append("")
+        lines.append("Head-to-head win rate (row vs column):")
+        lines.append(" " * width + "".join(f"{self.names[j]:>{width}}" for j in order))
+        for i in order:
+            cells = "".join(f"{'-':>{width}}" if i == j else f"{self.win_rate(i, j)[0]:>{width}.4f}"
+                            for j in order)
+            lines.append(f"{self.names[i]:<{width}}{cells}")
+        if self.elapsed > 0:
+            total = sum(self.games(i, j) for i in range(len(self.names)) for j in range(i + 1, len(self.names)))
+            lines.append("")
+            lines.append(f"Throughput: {total / self.elapsed:.1f} games/sec")
+        return "\n".join(lines)
+
+
+def run_tournament(names, games_per_pair, seed=None, workers=1, batch_size=500):
+    """
+    Round-robin tournament: every pair of policies plays games_per_pair games.
+    
+    Games are played in batches that reuse one game object per batch, and
+    batches are spread over a process pool when workers > 1. Results for a
+    seed are identical for any worker count or batch size.
+    
+    Args:
+        names (list): Names of the competing policies (keys of POLICIES)
+        games_per_pair (int): Games played by each pair of policies
+        seed (int, optional): Base seed for the tournament; None picks a random one
+        workers (int): Number of worker processes (0 means one per CPU)
+        batch_size (int): Games per batch
+        
+    Returns:
+        TournamentResult: Win counts, ratings and confidence intervals
+    """
+    import os
+    import time
+    
+    for name in names:
+        if name not in POLICIES:
+            raise ValueError(f"Unknown policy: {name}")
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    
+    batches = [(seed, list(names), i, j, start, min(start + batch_size, games_per_pair))
+               for i in range(len(names)) for j in range(i + 1, len(names))
+               for start in range(0, games_per_pair, batch_size)]
+    
+    result = TournamentResult(names)
+    start_time = time.perf_counter()
+    
+    def record(outcomes):
+        for first, second, first_wins, second_wins in outcomes:
+            result.wins[first][second] += first_wins
+            result.wins[second][first] += second_wins
+    
+    if workers == 1 or len(batches) < 2:
+        record(map(_play_pairing_args, batches))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            record(pool.map(_play_pairing_args, batches))
+    
+    result.elapsed = time.perf_counter() - start_time
+    return result
+
+
+# Games per shard of a rule sweep. Shards are the unit of parallel work; a
+# rule set's results are the same however its games are sharded.
+SWEEP_SHARD_GAMES = 2000
+
+# Directory sweep() caches its results in, unless told otherwise
+SWEEP_CACHE_DIR = '.shelldash-cache'
+
+# Part of every sweep cache key; bump it when a rules change makes cached results stale
+SWEEP_CACHE_VERSION = 1
+
+# One evaluated rule set of a sweep, as returned by sweep()
+SweepPoint = namedtuple('SweepPoint', [
+    'rules',   # RuleSet that was played
+    'stats',   # SimulationStats of its games
+    'cached',  # True if the stats were read from the cache instead of simulated
+])
+
+
+def rule_grid(base=None, **axes):
+    """
+    Every combination of some rule values, for sweep().
+    
+    Args:
+        base (RuleSet, optional): Rules for the fields not swept; defaults to STANDARD_RULES
+        **axes: RuleSet field -> values to try, e.g. win_shells=[2, 3, 4]
+        
+    Returns:
+        list: RuleSet for every combination, the last field varying fastest
+        
+    Raises:
+        ValueError: For an unknown field, or values that make invalid rules
+    """
+    import itertools
+    
+    base = base if base is not None else STANDARD_RULES
+    unknown = [field for field in axes if field not in RuleSet._fields]
+    if unknown:
+        raise ValueError(f"Unknown rule(s): {', '.join(unknown)}")
+    fields = list(axes)
+    return [base._replace(**dict(zip(fields, values))) for values in itertools.product(*axes.values())]
+
+
+def sweep_cache_path(cache_dir, rules, games, policy, seed, backend='python'):
+    """
+    Cache file of one point of a sweep.
+    
+    The name starts with the rule set's key(), followed by a digest of
+    everything else the results depend on, so changing any of them misses
+    the cache instead of returning stale results.
+    
+    Returns:
+        str: Path of the JSON file in cache_dir
+    """
+    import os
+    
+    run = derive_seed(SWEEP_CACHE_VERSION, policy, games, seed, backend)
+    return os.path.join(cache_dir, f"{rules.key()}-{run:016x}.json")
+
+
+def _read_sweep_cache(path, rules):
+    """Cached stats of a sweep point, or None if the file is missing, damaged or for other rules."""
+    import json
+    
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if RuleSet(**data['rules']) != rules:
+            return None
+        return SimulationStats.from_dict(data['stats'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_sweep_cache(path, rules, stats, games, policy, seed, backend):
+    """Save a sweep point's stats, atomically so an interrupted run leaves no partial file."""
+    import json
+    import os
+    
+    data = {'version': SWEEP_CACHE_VERSION, 'rules': rules._asdict(), 'games': games,
+            'policy': policy, 'seed': seed, 'backend': backend, 'stats': stats.to_dict()}
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'w') as f:
+        json.dump(data, f, sort_keys=True)
+    os.replace(temporary, path)
+
+
+def sweep(rule_sets, games=10000, policy='leftmost', seed=0, workers=1, backend='python',
+          cache_dir=SWEEP_CACHE_DIR):
+    """
+    Simulate games under each of many rule sets, reusing cached results.
+    
+    Each rule set's results are cached in cache_dir under the hash of the
+    rule set (and of the games, policy, seed and backend) as soon as its
+    last shard finishes, so a re-run only simulates the rule sets it hasn't
+    seen and an interrupted sweep resumes where it stopped. Shards of all
+    the uncached rule sets share one process pool. Every rule set plays
+    the same seeds, which keeps the comparison between them fair.
+    
+    Args:
+        rule_sets (list): RuleSet values to evaluate, e.g. from rule_grid()
+        games (int): Games to play under each rule set
+        policy (str): Name of a policy in POLICIES, used in both seats
+        seed (int): Base seed of every rule set's games
+        workers (int): Number of worker processes (0 means one per CPU)
+        backend (str): 'python' or 'numpy', as for simulate()
+        cache_dir (str, optional): Directory of cached results; None disables the cache
+        
+    Returns:
+        list: SweepPoint for each rule set, in the order given
+        
+    Raises:
+        ValueError: For an unknown policy or backend, or fewer than one game
+    """
+    import os
+    import time
+    
+    if games < 1:
+        raise ValueError("A sweep needs at least one game per rule set")
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy: {policy}")
+    if backend not in ('python', 'numpy'):
+        raise ValueError(f"Unknown backend: {backend}")
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    points = {}
+    for rules in rule_sets:
+        if rules in points:
+            continue
+        stats = None
+        if cache_dir is not None:
+            stats = _read_sweep_cache(sweep_cache_path(cache_dir, rules, games, policy, seed, backend), rules)
+        points[rules] = SweepPoint(rules, stats, True) if stats is not None else None
+    todo = [rules for rules, point in points.items() if point is None]
+    
+    if backend == 'numpy':
+        run_shard = _simulate_batch_args
+        starts = range(0, games, VECTOR_BATCH_SIZE)
+        shard_args = lambda rules, b, start: (seed, b, min(VECTOR_BATCH_SIZE, games - start), policy, rules)
+    else:
+        run_shard = _simulate_range_args
+        starts = range(0, games, SWEEP_SHARD_GAMES)
+        shard_args = lambda rules, b, start: (seed, start, min(start + SWEEP_SHARD_GAMES, games), policy,
+                                              False, False, rules)
+    shards = ((rules, shard_args(rules, b, start)) for rules in todo for b, start in enumerate(starts))
+    partial = {rules: SimulationStats() for rules in todo}
+    remaining = {rules: len(starts) for rules in todo}
+    began = {}
+    
+    def merge(rules, shard_stats):
+        stats = partial[rules]
+        stats.merge(shard_stats)
+        remaining[rules] -= 1
+        if remaining[rules]:
+            return
+        stats.seed = seed
+        stats.elapsed = time.perf_counter() - began[rules]
+        points[rules] = SweepPoint(rules, stats, False)
+        if cache_dir is not None:
+            path = sweep_cache_path(cache_dir, rules, games, policy, seed, backend)
+            _write_sweep_cache(path, rules, stats, games, policy, seed, backend)
+    
+    if workers == 1:
+        for rules, shard in shards:
+            began.setdefault(rules, time.perf_counter())
+            merge(rules, run_shard(shard))
+    else:
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+        
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for rules, shard in shards:
+                began.setdefault(rules, time.perf_counter())
+                pending.append((rules, pool.submit(run_shard, shard)))
+                if len(pending) >= 2 * workers:
+                    rules, future = pending.popleft()
+                    merge(rules, future.result())
+            while pending:
+                rules, future = pending.popleft()
+                merge(rules, future.result())
+    
+    return [points[rules] for rules in rule_sets]
+
+
+def sweep_report(points):
+    """
+    Format sweep results as a table, one line per rule set.
+    
+    Only the rules that differ between the points are shown. Player 1's
+    win rate comes with a 95% Wilson confidence interval.
+    
+    Args:
+        points (list): SweepPoint values, as returned by sweep()
+        
+    Returns:
+        str: Multi-line table
+    """
+    if not points:
+        return "No rule sets swept"
+    varied = [field for field in RuleSet._fields if len({getattr(p.rules, field) for p in points}) > 1]
+    if not varied:
+        varied = ['win_shells']
+    
+    def show(value):
+        return ':'.join(map(str, value)) if isinstance(value, tuple) else str(value)
+    
+    rows = [[show(getattr(p.rules, field)) for field in varied] for p in points]
+    widths = [max(len(field), *(len(row[i]) for row in rows)) for i, field in enumerate(varied)]
+    lines = ["  ".join(f"{field:<{w}}" for field, w in zip(varied, widths))
+             + f"  {'games':>8} {'P1 win':>7} {'95% CI':>15} {'turns':>7} {'suns':>6}"]
+    for row, point in zip(rows, points):
+        stats = point.stats
+        low, high = TournamentResult.wilson_interval(stats.wins[0], stats.games)
+        games = stats.games or 1
+        lines.append("  ".join(f"{value:<{w}}" for value, w in zip(row, widths))
+                     + f"  {stats.games:>8} {stats.wins[0] / games:>7.4f} {f'{low:.4f}-{high:.4f}':>15} "
+                     f"{stats.turns / games:>7.2f} {stats.sun_expansions / (stats.turns or 1):>6.3f}"
+                     + ("  (cached)" if point.cached else ""))
+    computed = sum(not p.cached for p in points)
+    lines.append(f"{len(points)} rule sets, {computed} simulated, {len(points) - computed} from the cache")
+    return "\n".join(lines)
+
+
+class WinCalculator:
+    """
+    Exact turn-outcome distributions and win probabilities by dynamic programming.
+    
+    A turn is solved by recursing over what the next revealed card can be,
+    weighted by how many of each card type are still unseen in the deck the
+    current row was dealt from. Which hidden column a player picks does not
+    change these odds (hidden cards are exchangeable), so the only policy
+    input is the Jellyfish decision. Whole games are then solved over
+    (shells, Flip-Flops, player to move, board rows) states, reusing the
+    memoized turn distributions.
+    
+    Flip-Flop holdings are capped at max_flip_flops for the game-level
+    solution (extra Flip-Flops are treated as the cap); holding that many
+    is vanishingly rare with the standard deck.
+    """
+    
+    def __init__(self, use_flip_flop=True, max_flip_flops=8, card_counts=None, cols=None, rules=None):
+        """
+        Args:
+            use_flip_flop (bool or callable): Jellyfish decision - a constant, or a
+                function (row, rows, flip_flops) -> bool called when the player
+                holds at least one Flip-Flop
+            max_flip_flops (int): Cap on Flip-Flops tracked per player in game states
+            card_counts (list, optional): Deck composition; overrides the rules' deck
+            cols (int, optional): Cards per row; overrides the rules' board width
+            rules (RuleSet, optional): Rules to solve; defaults to STANDARD_RULES
+        """
+        template = ShellDashGame(seed=0, rules=rules)
+        self.rules = template.rules
+        if callable(use_flip_flop):
+            self.use_flip_flop = use_flip_flop
+            self._fixed_decision = False
+        else:
+            self.use_flip_flop = lambda row, rows, flip_flops: use_flip_flop
+            self._fixed_decision = True
+        self.max_flip_flops = max_flip_flops
+        self.card_counts = tuple(card_counts if card_counts is not None else template.card_counts)
+        self.cols = cols if cols is not None else template.cols
+        self.start_rows = template.rows
+        self.win_shells = self.rules.win_shells  # Shells needed to win, as in check_winner()
+        self.row_sizes = self.rules.row_sizes()  # Every size a board can grow to
+        self._turn_cache = {}   # (rows, flip_flops) -> {TurnOutcome: probability}
+        self._step_memos = {}   # start rows -> {(counts, row, rows, hidden, ff): distribution}
+        self._values = None     # (shells_me, shells_opp, ff_me, ff_opp, rows) -> P(mover wins)
+    
+    def turn_outcomes(self, rows=None, flip_flops=0):
+        """
+        Exact distribution of the outcome of one turn.
+        
+        Args:
+            rows (int, optional): Board rows at the start of the turn (3, or 6 once
+                                  expanded), one of row_sizes; defaults to the rules'
+                                  starting rows
+            flip_flops (int): Flip-Flops the player holds at the start of the turn
+            
+        Returns:
+            dict: TurnOutcome -> probability, summing to 1
+        """
+        if rows is None:
+            rows = self.start_rows
+        key = (rows, flip_flops)
+        if key not in self._turn_cache:
+            self._turn_cache[key] = self._solve_turn(rows, flip_flops)
+        return self._turn_cache[key]
+    
+    def _solve_turn(self, start_rows, flip_flops):
+        """Run the in-turn recursion for one (rows, flip_flops) starting state."""
+        full_deck = self.card_counts
+        cols = self.cols
+        use_flip_flop = self.use_flip_flop
+        fixed_decision = self._fixed_decision
+        max_rows = self.rules.max_rows
+        sun_rows = self.rules.sun_rows
+        largest = self.row_sizes[-1]
+        memo = self._step_memos.setdefault(start_rows, {})  # Shared by every starting Flip-Flop count
+        
+        def stop(row):
+            # Turn ends on this row with nothing further gained
+            return {TurnOutcome(0, 0, 0, row, 0): 1.0}
+        
+        def advance(counts, row, rows, ff, shells=0, gained=0, spent=0, expansions=0):
+            # Move down a row and shift the rest of the turn's outcomes by this card's effect
+            nxt = row + 1
+            if nxt >= rows:
+                rest = stop(rows)
+            else:
+                if nxt == start_rows:
+                    counts = full_deck  # Rows added by Suns come from a fresh deck
+                rest = step(counts, nxt, rows, cols, ff)
+            if not (shells or gained or spent or expansions):
+                return rest
+            return {TurnOutcome(o.shells + shells, o.flip_flops_gained + gained,
+                                o.flip_flops_spent + spent, o.end_row,
+                                o.sun_expansions + expansions): p
+                    for o, p in rest.items()}
+        
+        def step(counts, row, rows, hidden, ff):
+            # Distribution of the rest of the turn from the start of a reveal.
+            # With a fixed Jellyfish decision, at most one Flip-Flop is spent per
+            # row still reachable (counting rows a Sun may add), so larger
+            # holdings lead to identical outcomes.
+            key = (counts, row, rows, hidden, min(ff, max(rows, largest) - row) if fixed_decision else ff)
+            if key in memo:
+                return memo[key]
+            total = sum(counts)
+            dist = {}
+            for code, n in enumerate(counts):
+                if not n:
+                    continue
+                after = counts[:code] + (n - 1,) + counts[code + 1:]
+                if code == WAVE:
+                    sub = stop(row) if hidden == 1 else step(after, row, rows, hidden - 1, ff)
+                elif code == JELLYFISH:
+                    if ff > 0 and use_flip_flop(row, rows, ff):
+                        sub = advance(after, row, rows, ff - 1, spent=1)
+                    else:
+                        sub = stop(row)
+                elif code == SUN:
+                    if rows < max_rows:
+                        sub = advance(after, row, rows + sun_rows, ff, expansions=1)
+                    else:
+                        sub = advance(after, row, rows, ff)
+                elif code == FLIP_FLOP:
+                    sub = advance(after, row, rows, ff + 1, gained=1)
+                elif code == SHELL:
+                    sub = advance(after, row, rows, ff, shells=1)
+                else:
+                    sub = advance(after, row, rows, ff)
+                weight = n / total
+                for outcome, p in sub.items():
+                    dist[outcome] = dist.get(outcome, 0.0) + weight * p
+            memo[key] = dist
+            return dist
+        
+        return step(full_deck, 0, start_rows, cols, flip_flops)
+    
+    def _transitions(self, rows, flip_flops):
+        """Collapse a turn distribution to (probability, shells, flip_flops_after, rows_after)."""
+        merged = {}
+        for o, p in self.turn_outcomes(rows, flip_flops).items():
+            ff_after = min(flip_flops + o.flip_flops_gained - o.flip_flops_spent, self.max_flip_flops)
+            key = (o.shells, ff_after, rows + self.rules.sun_rows * o.sun_expansions)
+            merged[key] = merged.get(key, 0.0) + p
+        return [(p,) + key for key, p in merged.items()]
+    
+    def _solve_game(self, tolerance=1e-13):
+        """Solve P(player to move wins) for every game state."""
+        cap = self.max_flip_flops
+        win = self.win_shells
+        values = {}
+        row_sizes = self.row_sizes
+        
+        # Shells and rows never decrease, so solve the states with the most shells
+        # and the biggest board first. States that only differ in whose turn it is
+        # (or in Flip-Flops) form cycles, which are solved by Gauss-Seidel iteration.
+        for rows in reversed(row_sizes):
+            transitions = {f: self._transitions(rows, f) for f in range(cap + 1)}
+            for total in range(2 * (win - 1), -1, -1):
+                group = [(a, total - a, f1, f2, rows)
+                         for a in range(win) if 0 <= total - a < win
+                         for f1 in range(cap + 1) for f2 in range(cap + 1)]
+                for state in group:
+                    values[state] = 0.5
+                delta = 1.0
+                while delta > tolerance:
+                    delta = 0.0
+                    for state in group:
+                        me, opp, f_me, f_opp, _ = state
+                        v = 0.0
+                        for p, shells, ff_after, rows_after in transitions[f_me]:
+                            if me + shells >= win:
+                                v += p
+                            else:
+                                v += p * (1.0 - values[(opp, me + shells, f_opp, ff_after, rows_after)])
+                        delta = max(delta, abs(v - values[state]))
+                        values[state] = v
+        return values
+    
+    def position_value(self, me, opp, f_me, f_opp, rows, turn_over=False):
+        """
+        Probability that a given player wins from a position.
+        
+        Args:
+            me (int): Shells held by the player being evaluated
+            opp (int): Shells held by their opponent
+            f_me (int): Flip-Flops held by the player being evaluated
+            f_opp (int): Flip-Flops held by their opponent
+            rows (int): Board rows (3, or 6 once expanded)
+            turn_over (bool): False if it is this player's turn to move, True if
+                              they have just finished a turn and the opponent moves next
+            
+        Returns:
+            float: Probability that the evaluated player wins the game
+        """
+        win = self.win_shells
+        if me >= win:
+            return 1.0
+        if opp >= win:
+            return 0.0
+        if self._values is None:
+            self._values = self._solve_game()
+        cap = self.max_flip_flops
+        f_me = min(f_me, cap)
+        f_opp = min(f_opp, cap)
+        if turn_over:
+            return 1.0 - self._values[(opp, me, f_opp, f_me, rows)]
+        return self._values[(me, opp, f_me, f_opp, rows)]
+    
+    def win_probability(self, shell_count=(0, 0), flip_flop_count=(0, 0), current_player=1, rows=None):
+        """
+        Exact probability of each player winning from a game state.
+        
+        Args:
+            shell_count (tuple): Shells held by Player 1 and Player 2
+            flip_flop_count (tuple): Flip-Flops held by Player 1 and Player 2
+            current_player (int): Player about to take a turn (1 or 2)
+            rows (int, optional): Board rows (3, or 6 once a Sun has expanded the
+                                  board); defaults to the rules' starting rows
+            
+        Returns:
+            tuple: (P(Player 1 wins), P(Player 2 wins))
+        """
+        if rows is None:
+            rows = self.start_rows
+        for i in range(2):
+            if shell_count[i] >= self.win_shells:
+                return (1.0, 0.0) if i == 0 else (0.0, 1.0)
+        me = current_player - 1
+        v = self.position_value(shell_count[me], shell_count[1 - me],
+                                flip_flop_count[me], flip_flop_count[1 - me], rows)
+        return (v, 1.0 - v) if me == 0 else (1.0 - v, v)
+
+
+def build_alias_table(weights):
+    """
+    Build Walker's alias table (Vose's construction) for sampling in O(1).
+    
+    A draw picks a column i uniformly, then returns i with probability
+    cutoffs[i] and aliases[i] otherwise, which reproduces the weights exactly.
+    
+    Args:
+        weights (list): Non-negative weights, not all zero
+        
+    Returns:
+        tuple: (cutoffs, aliases) lists, one entry per weight
+    """
+    n = len(weights)
+    total = sum(weights)
+    scaled = [w * n / total for w in weights]
+    cutoffs = [1.0] * n
+    aliases = list(range(n))
+    small = [i for i, w in enumerate(scaled) if w < 1.0]
+    large = [i for i, w in enumerate(scaled) if w >= 1.0]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        cutoffs[less] = scaled[less]
+        aliases[less] = more
+        scaled[more] -= 1.0 - scaled[less]
+        (small if scaled[more] < 1.0 else large).append(more)
+    # Whatever is left is 1 up to rounding error
+    return cutoffs, aliases
+
+
+class TurnTable:
+    """
+    Exact turn-outcome distributions of a policy, tabulated for O(1) sampling.
+    
+    A turn's outcome depends only on the board rows, the player's Flip-Flops
+    and their Jellyfish decisions, because every board is dealt from a fresh
+    deck. Which column is revealed doesn't matter (see WinCalculator). The
+    table holds the exact distribution of TurnOutcome for every (rows,
+    Flip-Flops) state, as computed by WinCalculator, with an alias table
+    per state. A turn then costs one random number and one lookup instead
+    of resolving every card.
+    
+    Only policies that always make the same Jellyfish decision
+    (Policy.fixed_flip_flop_decision) can be tabulated. With a fixed
+    decision, a player never spends more Flip-Flops in a turn than there
+    are rows, so holdings of max_flip_flops or more all share one state
+    and the table is exact.
+    
+    Attributes:
+        policy (str): Name of the tabulated policy in POLICIES
+        rules (RuleSet): Rules the table was built for
+        card_counts (tuple): Deck composition the table was built for
+        cols (int): Cards per row
+        max_flip_flops (int): Flip-Flop holdings at or above this share a state
+        outcomes (dict): (rows, flip_flops) -> list of (TurnOutcome, probability)
+    """
+    
+    def __init__(self, policy='leftmost', card_counts=None, cols=None, max_flip_flops=6, outcomes=None,
+                 rules=None):
+        """
+        Args:
+            policy (str): Name of a policy in POLICIES
+            card_counts (list, optional): Deck composition; overrides the rules' deck
+            cols (int, optional): Cards per row; overrides the rules' board width
+            max_flip_flops (int): Holdings at or above this share a state
+            outcomes (dict, optional): Precomputed distributions (as loaded by
+                                       load()); computed with WinCalculator if None
+            rules (RuleSet, optional): Rules to tabulate; defaults to STANDARD_RULES
+            
+        Raises:
+            ValueError: For an unknown policy, or one whose Jellyfish decision
+                        depends on the game
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {policy}")
+        decision = POLICIES[policy].fixed_flip_flop_decision
+        if decision is None:
+            raise ValueError(f"Policy {policy} decides Flip-Flops from the game state, "
+                             "so its turns can't be tabulated")
+        rules = rules if rules is not None else STANDARD_RULES
+        self.policy = policy
+        self.card_counts = tuple(card_counts if card_counts is not None else rules.card_counts)
+        self.cols = cols if cols is not None else rules.cols
+        self.rules = rules._replace(card_counts=self.card_counts, cols=self.cols)
+        self.max_flip_flops = max_flip_flops
+        if outcomes is None:
+            calculator = WinCalculator(decision, rules=self.rules)
+            outcomes = {(rows, ff): sorted(calculator.turn_outcomes(rows, ff).items())
+                        for rows in self.rules.row_sizes() for ff in range(max_flip_flops + 1)}
+        self.outcomes = outcomes
+        self._samplers = {}  # (rows, flip_flops) -> (outcomes, cutoffs, aliases)
+        for state, distribution in outcomes.items():
+            cutoffs, aliases = build_alias_table([p for _, p in distribution])
+            self._samplers[state] = ([o for o, _ in distribution], cutoffs, aliases)
+    
+    def sample(self, rows, flip_flops, rng):
+        """
+        Draw the outcome of one turn.
+        
+        Args:
+            rows (int): Board rows at the start of the turn (3 or 6, see RuleSet.row_sizes)
+            flip_flops (int): Flip-Flops the player holds
+            rng (random.Random): Source of randomness
+            
+        Returns:
+            TurnOutcome: Shells, Flip-Flops gained and spent, end row and Sun expansions
+        """
+        outcomes, cutoffs, aliases = self._samplers[rows, min(flip_flops, self.max_flip_flops)]
+        u = rng.random() * len(outcomes)
+        i = int(u)
+        return outcomes[i if u - i < cutoffs[i] else aliases[i]]
+    
+    def save(self, path):
+        """
+        Write the table to a binary file.
+        
+        The file is a header (magic, format version, columns, Flip-Flop cap,
+        deck composition, policy name) and the rest of the rules, then for
+        each state its rows, Flip-Flops and number of outcomes, followed by
+        the outcomes with their exact probabilities.
+        
+        Args:
+            path (str): File to write
+        """
+        name = self.policy.encode()
+        rules = self.rules
+        with open(path, 'wb') as f:
+            f.write(TURN_TABLE_HEADER.pack(TURN_TABLE_MAGIC, TURN_TABLE_VERSION, self.cols,
+                                           self.max_flip_flops, *self.card_counts, len(name)))
+            f.write(name)
+            f.write(TURN_TABLE_RULES.pack(rules.rows, rules.max_rows, rules.sun_rows, rules.win_shells))
+            f.write(struct.pack('<H', len(self.outcomes)))
+            for (rows, ff), distribution in sorted(self.outcomes.items()):
+                f.write(TURN_TABLE_STATE.pack(rows, ff, len(distribution)))
+                for outcome, p in distribution:
+                    f.write(TURN_TABLE_OUTCOME.pack(*outcome, p))
+    
+    @classmethod
+    def load(cls, path):
+        """
+        Read a table written by save(). Version 1 files, from before rule
+        sets, hold tables of the standard rules.
+        
+        Args:
+            path (str): File to read
+            
+        Returns:
+            TurnTable: The table, ready to sample
+            
+        Raises:
+            ValueError: If the file is not a turn table of a known version
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < TURN_TABLE_HEADER.size or data[:4] != TURN_TABLE_MAGIC:
+            raise ValueError(f"{path} is not a Shell Dash turn table")
+        magic, version, cols, max_flip_flops, *rest = TURN_TABLE_HEADER.unpack_from(data)
+        if version not in (1, TURN_TABLE_VERSION):
+            raise ValueError(f"Unsupported turn table version {version}")
+        card_counts, name_length = rest[:-1], rest[-1]
+        offset = TURN_TABLE_HEADER.size
+        policy = data[offset:offset + name_length].decode()
+        offset += name_length
+        rules = STANDARD_RULES
+        if version >= 2:
+            rows, max_rows, sun_rows, win_shells = TURN_TABLE_RULES.unpack_from(data, offset)
+            offset += TURN_TABLE_RULES.size
+            rules = RuleSet(card_counts, rows, cols, max_rows, sun_rows, win_shells)
+        (states,) = struct.unpack_from('<H', data, offset)
+        offset += 2
+        outcomes = {}
+        for _ in range(states):
+            rows, ff, count = TURN_TABLE_STATE.unpack_from(data, offset)
+            offset += TURN_TABLE_STATE.size
+            distribution = []
+            for _ in range(count):
+                *outcome, p = TURN_TABLE_OUTCOME.unpack_from(data, offset)
+                offset += TURN_TABLE_OUTCOME.size
+                distribution.append((TurnOutcome(*outcome), p))
+            outcomes[rows, ff] = distribution
+        return cls(policy, card_counts, cols, max_flip_flops, outcomes, rules)
+    
+    def play_game(self, rng, stats=None):
+        """
+        Play one whole game by sampling its turns.
+        
+        Args:
+            rng (random.Random): Source of randomness
+            stats (SimulationStats, optional): Collector to record the turns and game into
+            
+        Returns:
+            int: The winner (1 or 2)
+        """
+        shells = [0, 0]
+        flip_flops = [0, 0]
+        rows = self.rules.rows
+        sun_rows = self.rules.sun_rows
+        win = self.rules.win_shells
+        player = 0
+        turns = 0
+        samplers = self._samplers
+        cap = self.max_flip_flops
+        while True:
+            outcomes, cutoffs, aliases = samplers[rows, min(flip_flops[player], cap)]
+            u = rng.random() * len(outcomes)
+            i = int(u)
+            outcome = outcomes[i if u - i < cutoffs[i] else aliases[i]]
+            turns += 1
+            shells[player] += outcome.shells
+            flip_flops[player] += outcome.flip_flops_gained - outcome.flip_flops_spent
+            rows += sun_rows * outcome.sun_expansions
+            if stats is not None:
+                stats.record_outcome(outcome, rows)
+            if shells[player] >= win:
+                if stats is not None:
+                    stats.record_game(player + 1, turns)
+                return player + 1
+            player = 1 - player
+    
+    def simulate(self, num_games, seed=None, backend='python'):
+        """
+        Simulate many games by sampling whole turns from the table.
+        
+        Args:
+            num_games (int): Number of complete games to play
+            seed (int, optional): Seed for the run; None picks a random one
+            backend (str): 'python' to play one game at a time, 'numpy' to
+                           advance every game in lockstep with vector operations
+            
+        Returns:
+            SimulationStats: Aggregated results, comparable with simulate()'s
+            
+        Raises:
+            ValueError: For an unknown backend
+        """
+        import time
+        
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(64)
+        start = time.perf_counter()
+        if backend == 'numpy':
+            stats = self._simulate_numpy(num_games, seed)
+        elif backend == 'python':
+            stats = SimulationStats()
+            rng = random.Random(seed)
+            for _ in range(num_games):
+                self.play_game(rng, stats)
+        else:
+            raise ValueError(f"Unknown backend: {backend}")
+        stats.seed = seed
+        stats.elapsed = time.perf_counter() - start
+        return stats
+    
+    def _simulate_numpy(self, num_games, seed):
+        """Advance all games in lockstep, one turn per step, with vectorized alias sampling."""
+        import numpy as np
+        
+        # Flatten every state's alias table into shared arrays
+        states = sorted(self._samplers)
+        state_index = {state: i for i, state in enumerate(states)}
+        offsets, sizes, cutoffs, aliases, outcomes, start_rows = [], [], [], [], [], []
+        for state in states:
+            state_outcomes, state_cutoffs, state_aliases = self._samplers[state]
+            offsets.append(len(outcomes))
+            sizes.append(len(state_outcomes))
+            cutoffs.extend(state_cutoffs)
+            aliases.extend(offsets[-1] + a for a in state_aliases)
+            outcomes.extend(state_outcomes)
+            start_rows.extend([state[0]] * len(state_outcomes))
+        offsets, sizes = np.array(offsets), np.array(sizes)
+        cutoffs, aliases = np.array(cutoffs), np.array(aliases)
+        fields = np.array(outcomes, dtype=np.int64).T  # One row per TurnOutcome field
+        gained_shells, ff_gained, ff_spent, _, expansions = fields
+        ff_delta = ff_gained - ff_spent
+        cap = self.max_flip_flops
+        sun_rows = self.rules.sun_rows
+        row_state = np.array([state_index[rows, 0] for rows in self.rules.row_sizes()])  # Flip-Flops add to these
+        
+        rng = np.random.default_rng(seed)
+        shells = np.zeros((num_games, 2), dtype=np.int64)
+        flip_flops = np.zeros((num_games, 2), dtype=np.int64)
+        expanded = np.zeros(num_games, dtype=np.int64)   # Sun expansions so far, 0 for the starting rows
+        turns = np.zeros(num_games, dtype=np.int64)
+        winners = np.zeros(num_games, dtype=np.int64)
+        drawn = np.zeros(len(outcomes), dtype=np.int64)  # Times each outcome was sampled
+        games = np.arange(num_games)
+        seat = 0
+        while len(games):
+            state = row_state[expanded[games]] + np.minimum(flip_flops[games, seat], cap)
+            u = rng.random(len(games)) * sizes[state]
+            column = u.astype(np.int64)
+            picked = offsets[state] + column
+            picked = np.where(u - column < cutoffs[picked], picked, aliases[picked])
+            drawn += np.bincount(picked, minlength=len(outcomes))
+            turns[games] += 1
+            shells[games, seat] += gained_shells[picked]
+            flip_flops[games, seat] += ff_delta[picked]
+            expanded[games] += expansions[picked]
+            won = shells[games, seat] >= self.rules.win_shells
+            winners[games[won]] = seat + 1
+            games = games[~won]
+            seat = 1 - seat
+        
+        stats = SimulationStats()
+        stats.games = num_games
+        stats.wins = [int((winners == 1).sum()), int((winners == 2).sum())]
+        stats.turns = int(turns.sum())
+        for length, count in zip(*np.unique(turns, return_counts=True)):
+            length, count = int(length), int(count)
+            stats.game_length.add(length, count)
+            stats.game_length_buckets.observe(length, count)
+            stats.game_length_sketch.add(length, count)
+        for i, count in enumerate(drawn.tolist()):
+            if count:
+                stats.record_outcome(outcomes[i], start_rows[i] + sun_rows * outcomes[i].sun_expansions, count)
+        return stats
+    
+    def verify(self, games=2000, seed=None, alpha=0.001):
+        """
+        Check the table against the full rules engine.
+        
+        Plays games through the turn engine with the table's policy and
+        compares the outcomes of the turns started from each state with the
+        table by a chi-square test, and the engine's Player 1 win rate with
+        one sampled from the table.
+        
+        Args:
+            games (int): Games to play through the engine (and through the table)
+            seed (int, optional): Base seed; None picks a random one
+            alpha (float): Significance level, split across the states tested
+            
+        Returns:
+            TurnTableCheck: Per-state test results and the win rate comparison
+        """
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(64)
+        observed = {}  # (rows, flip_flops) -> {TurnOutcome: count}
+        
+        def on_turn_end(game, result):
+            rows = game.rows - game.rules.sun_rows * result.sun_expansions
+            ff = game.flip_flop_count[result.player - 1] - result.flip_flops_gained + result.flip_flops_used
+            outcome = TurnOutcome(result.shells_gained, result.flip_flops_gained, result.flip_flops_used,
+                                  result.end_row, result.sun_expansions)
+            counts = observed.setdefault((rows, min(ff, self.max_flip_flops)), {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+        
+        policy_class = POLICIES[self.policy]
+        policies = [policy_class(), policy_class()]
+        rules = self.rules._replace(card_counts=self.card_counts, cols=self.cols)
+        game = ShellDashGame(players=policies, rules=rules)
+        game.add_hook('on_turn_end', on_turn_end)
+        engine = SimulationStats()
+        for index in range(games):
+            game.reset(derive_seed(seed, index))
+            policies[0].reseed(derive_seed(seed, index, 1))
+            policies[1].reseed(derive_seed(seed, index, 2))
+            run_game(game, stats=engine)
+        
+        check = TurnTableCheck(alpha)
+        for state, counts in sorted(observed.items()):
+            check.add_state(state, counts, dict(self.outcomes[state]))
+        check.engine = engine
+        check.sampled = self.simulate(games, derive_seed(seed, 'table'))
+        return check
+
+
+class TurnTableCheck:
+    """
+    Result of checking a TurnTable against the rules engine (see TurnTable.verify).
+    
+    Attributes:
+        alpha (float): Overall significance level
+        states (list): (state, turns, chi_square, degrees of freedom, p-value) per state tested
+        engine (SimulationStats): Games played through the engine
+        sampled (SimulationStats): As many games sampled from the table
+    """
+    
+    def __init__(self, alpha=0.001):
+        self.alpha = alpha
+        self.states = []
+        self.engine = None
+        self.sampled = None
+    
+    def add_state(self, state, counts, probabilities):
+        """
+        Chi-square test of the turns observed from one state against the table.
+        
+        Outcomes expected fewer than 5 times are pooled into one category so
+        the chi-square approximation holds.
+        
+        Args:
+            state (tuple): (rows, flip_flops)
+            counts (dict): TurnOutcome -> times the engine produced it
+            probabilities (dict): TurnOutcome -> probability from the table
+        """
+        import math
+        
+        turns = sum(counts.values())
+        chi_square = 0.0
+        categories = 0
+        pooled_expected = pooled_observed = 0.0
+        for outcome in set(probabilities) | set(counts):
+            expected = turns * probabilities.get(outcome, 0.0)
+            seen = counts.get(outcome, 0)
+            if expected >= 5:
+                chi_square += (seen - expected) ** 2 / expected
+                categories += 1
+            else:
+                pooled_expected += expected
+                pooled_observed += seen
+        if pooled_expected > 0:
+            chi_square += (pooled_observed - pooled_expected) ** 2 / pooled_expected
+            categories += 1
+        elif pooled_observed:
+            chi_square = math.inf  # The engine produced an outcome the table calls impossible
+        freedom = max(categories - 1, 1)
+        self.states.append((state, turns, chi_square, freedom, chi_square_survival(chi_square, freedom)))
+    
+    def win_rate_p_value(self):
+        """Two-sided p-value of the engine's and the table's Player 1 win rates being equal."""
+        import math
+        
+        if self.engine is None or self.sampled is None or not self.engine.games or not self.sampled.games:
+            return 1.0
+        n1, n2 = self.engine.games, self.sampled.games
+        pooled = (self.engine.wins[0] + self.sampled.wins[0]) / (n1 + n2)
+        spread = math.sqrt(pooled * (1 - pooled) * (1 / n1 + 1 / n2))
+        if spread == 0:
+            return 1.0
+        z = (self.engine.wins[0] / n1 - self.sampled.wins[0] / n2) / spread
+        return math.erfc(abs(z) / math.sqrt(2))
+    
+    @property
+    def ok(self):
+        """True if neither any state's outcomes nor the win rate differ significantly from the table."""
+        tested = len(self.states) + 1
+        return (all(p >= self.alpha / tested for *_, p in self.states)
+                and self.win_rate_p_value() >= self.alpha / tested)
+    
+    def report(self):
+        """
+        Format the check as a human-readable summary.
+        
+        Returns:
+            str: Multi-line report of the per-state tests and win rates
+        """
+        lines = [f"{'state':<14} {'turns':>8} {'chi2':>9} {'dof':>4} {'p':>8}"]
+        for (rows, ff), turns, chi_square, freedom, p in self.states:
+            lines.append(f"rows {rows}, ff {ff:<3} {turns:>8} {chi_square:>9.2f} {freedom:>4} {p:>8.4f}")
+        if self.engine is not None and self.sampled is not None:
+            engine_rate = self.engine.wins[0] / max(self.engine.games, 1)
+            sampled_rate = self.sampled.wins[0] / max(self.sampled.games, 1)
+            lines.append(f"P1 win rate:          engine {engine_rate:.4f}, table {sampled_rate:.4f} "
+                         f"(p {self.win_rate_p_value():.4f})")
+            lines.append(f"Average turns/game:   engine {self.engine.turns / max(self.engine.games, 1):.3f}, "
+                         f"table {self.sampled.turns / max(self.sampled.games, 1):.3f}")
+        lines.append("Turn table matches the engine" if self.ok else "TURN TABLE MISMATCH")
+        return "\n".join(lines)
+
+
+def chi_square_survival(x, freedom):
+    """
+    Probability that a chi-square variable with the given degrees of freedom exceeds x.
+    
+    Uses the Wilson-Hilferty cube-root normal approximation, which is
+    accurate to a few percent of the p-value, plenty for a significance test.
+    """
+    import math
+    
+    if x == math.inf:
+        return 0.0
+    if x <= 0:
+        return 1.0
+    k = freedom
+    z = ((x / k) ** (1 / 3) - (1 - 2 / (9 * k))) / math.sqrt(2 / (9 * k))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+# Recommendation returned by ExpectimaxSolver.hint()
+Hint = namedtuple('Hint', [
+    'action',           # 'reveal', 'use_flip_flop' or 'decline'
+    'column',           # Column to reveal for 'reveal', otherwise None
+    'win_probability',  # Mover's chance of winning the game if the hint is followed
+])
+
+
+class ExpectimaxSolver:
+    """
+    Optimal Jellyfish decisions by expectimax over the cards still hidden.
+    
+    The rest of the current turn is searched exactly: chance nodes weight
+    each card type by how many are still unseen in the deck the row came
+    from, and at every Jellyfish the player takes the better of spending a
+    Flip-Flop or ending the turn. When the turn ends, the position is valued
+    with WinCalculator's game-level win probabilities. Positions are
+    canonicalized to (unseen counts, row, rows, hidden cards in row, scores)
+    and kept in an LRU transposition cache, so repeated positions are free.
+    
+    Which hidden column to reveal never matters: hidden cards in a row are
+    exchangeable even after a Wave, so any hidden column is optimal.
+    """
+    
+    def __init__(self, calculator=None, cache_size=1 << 18):
+        """
+        Args:
+            calculator (WinCalculator, optional): Supplies end-of-turn position values;
+                                                  defaults to one for the standard deck
+            cache_size (int): Maximum positions kept in the transposition cache
+        """
+        import functools
+        
+        self.calculator = calculator or WinCalculator()
+        self._value = functools.lru_cache(maxsize=cache_size)(self._search)
+    
+    def cache_info(self):
+        """Return hit/miss statistics of the transposition cache."""
+        return self._value.cache_info()
+    
+    def _end_of_turn(self, me, opp, ff, f_opp, rows):
+        """Mover's win probability once their turn ends in the given position."""
+        return self.calculator.position_value(me, opp, ff, f_opp, rows, turn_over=True)
+    
+    def _advance(self, counts, row, rows, start_rows, ff, me, opp, f_opp):
+        """Value of moving down a row, switching to a fresh deck for Sun-added rows."""
+        nxt = row + 1
+        if nxt >= rows:
+            return self._end_of_turn(me, opp, ff, f_opp, rows)
+        if nxt == start_rows:
+            counts = self.calculator.card_counts
+        return self._value(counts, nxt, rows, start_rows, self.calculator.cols, ff, me, opp, f_opp)
+    
+    def _search(self, counts, row, rows, start_rows, hidden, ff, me, opp, f_opp):
+        """Expected win probability for the mover about to reveal a card (cached)."""
+        total = sum(counts)
+        value = 0.0
+        for code, n in enumerate(counts):
+            if not n:
+                continue
+            after = counts[:code] + (n - 1,) + counts[code + 1:]
+            if code == WAVE:
+                if hidden == 1:
+                    sub = self._end_of_turn(me, opp, ff, f_opp, rows)
+                else:
+                    sub = self._value(after, row, rows, start_rows, hidden - 1, ff, me, opp, f_opp)
+            elif code == JELLYFISH:
+                sub = self._end_of_turn(me, opp, ff, f_opp, rows)
+                if ff > 0:
+                    sub = max(sub, self._advance(after, row, rows, start_rows, ff - 1, me, opp, f_opp))
+            elif code == SUN:
+                if rows < self.calculator.rules.max_rows:
+                    rows_after = rows + self.calculator.rules.sun_rows
+                else:
+                    rows_after = rows
+                sub = self._advance(after, row, rows_after, start_rows, ff, me, opp, f_opp)
+            elif code == FLIP_FLOP:
+                sub = self._advance(after, row, rows, start_rows, min(ff + 1, self.calculator.max_flip_flops),
+                                    me, opp, f_opp)
+            elif code == SHELL:
+                sub = self._advance(after, row, rows, start_rows, ff, min(me + 1, self.calculator.win_shells),
+                                    opp, f_opp)
+            else:
+                sub = self._advance(after, row, rows, start_rows, ff, me, opp, f_opp)
+            value += n / total * sub
+        return value
+    
+    def _position(self, game):
+        """Canonicalize a live game's turn into the solver's position tuple."""
+        calc = self.calculator
+        board = game.board
+        start_rows = game.rows - game.rules.sun_rows * game.turn_result.sun_expansions
+        # Rows dealt from the same deck as the current row
+        if game.current_row < start_rows:
+            segment = range(0, start_rows)
+        else:
+            segment = range(start_rows, game.rows)
+        counts = list(calc.card_counts)
+        for r in segment:
+            for c in range(board.cols):
+                if board.is_revealed(r, c):
+                    counts[board.card(r, c)] -= 1
+        me = game.current_player - 1
+        hidden = board.cols - bin(board.revealed[game.current_row]).count('1')
+        return (tuple(counts), game.current_row, game.rows, start_rows, hidden,
+                min(game.flip_flop_count[me], calc.max_flip_flops),
+                min(game.shell_count[me], calc.win_shells), game.shell_count[1 - me],
+                min(game.flip_flop_count[1 - me], calc.max_flip_flops))
+    
+    def hint(self, game):
+        """
+        Recommend the best move for the player whose turn it is.
+        
+        Args:
+            game (ShellDashGame): Game with a turn in progress
+            
+        Returns:
+            Hint: The recommended action and the resulting win probability
+            
+        Raises:
+            ValueError: If the current turn is already over
+        """
+        if game.turn_over:
+            raise ValueError("Turn is over; nothing to decide")
+        counts, row, rows, start_rows, hidden, ff, me, opp, f_opp = self._position(game)
+        
+        if game.awaiting_flip_flop:
+            # The Jellyfish is already revealed (and excluded from counts)
+            decline = self._end_of_turn(me, opp, ff, f_opp, rows)
+            use = self._advance(counts, row, rows, start_rows, ff - 1, me, opp, f_opp)
+            if use >= decline:
+                return Hint('use_flip_flop', None, use)
+            return Hint('decline', None, decline)
+        
+        mask = game.board.revealed[row]
+        column = next(j for j in range(game.cols) if not mask >> j & 1)
+        value = self._value(counts, row, rows, start_rows, hidden, ff, me, opp, f_opp)
+        return Hint('reveal', column, value)
+
+
+class ExpectimaxPolicy(Policy):
+    """
+    Bot policy that follows ExpectimaxSolver hints, so it spends Flip-Flops
+    on Jellyfish only when that maximizes its chance of winning the game.
+    """
+    
+    name = 'expectimax'
+    _shared_solvers = {}  # RuleSet -> solver, solved once per process and shared by every instance
+    
+    def __init__(self, seed=None, solver=None):
+        super().__init__(seed)
+        self.solver = solver  # None: the shared solver for the rules of each game played
+    
+    @classmethod
+    def prepare(cls, rules=None):
+        """Build and solve the shared solver for a set of rules (about two seconds, once per process)."""
+        rules = rules if rules is not None else STANDARD_RULES
+        solvers = ExpectimaxPolicy._shared_solvers
+        if rules not in solvers:
+            solver = ExpectimaxSolver(WinCalculator(rules=rules))
+            solver.calculator.position_value(0, 0, 0, 0, rules.rows)  # Solves every game state
+            solvers[rules] = solver
+        return solvers[rules]
+    
+    def solver_for(self, game):
+        """Return the solver to use for a game, solving its rules on first use."""
+        if self.solver is not None:
+            return self.solver
+        return ExpectimaxPolicy.prepare(game.rules)
+    
+    def choose_column(self, game):
+        """Return the leftmost hidden card (every hidden card is equally good)."""
+        mask = game.board.revealed[game.current_row]
+        return next(j for j in range(game.cols) if not mask >> j & 1)
+    
+    def use_flip_flop(self, game):
+        """Spend a Flip-Flop only if that gives the better chance of winning."""
+        return self.solver_for(game).hint(game).action == 'use_flip_flop'
+
+
+# Built-in policies selectable by name (e.g. from --policy on the command line)
+POLICIES = {
+    'leftmost': LeftmostPolicy,
+    'random': RandomPolicy,
+    'expectimax': ExpectimaxPolicy,
+}
+
+
+class ServerConnection:
+    """
+    One TCP client of the game server: its output stream and the game it sits in.
+    
+    Lines sent while a command is handled are queued and written together by
+    flush(), so a whole bot turn reaches the client in a single socket write.
+    """
+    
+    __slots__ = ('writer', 'name', 'session', 'room', 'outbox')
+    
+    def __init__(self, writer):
+        self.writer = writer
+        self.name = None
+        self.session = None  # GameSession being played, if any
+        self.room = None     # Room name while waiting for an opponent to JOIN
+        self.outbox = []     # Lines queued since the last flush
+    
+    def send(self, line):
+        self.outbox.append(line)
+    
+    def flush(self):
+        if self.outbox:
+            self.outbox.append('')
+            self.writer.write("\n".join(self.outbox).encode())
+            self.outbox.clear()
+
+
+class GameSession:
+    """
+    One ShellDashGame hosted by the server, with a seat per player.
+    
+    A seat holds whatever identifies the client playing it (a
+    ServerConnection for TCP players, a token string for HTTP players), or
+    None for a bot seat played by the game's policy. A client playing both
+    seats (hot-seat) sits in both. start() and submit() return what
+    happened as a list of events, which each transport formats its own way:
+    
+        {'type': 'reveal', 'player', 'row', 'col', 'card', 'effect', 'expanded'}
+        {'type': 'end', 'player', 'shells', 'flip_flops'}   a turn ended with these totals
+        {'type': 'win', 'player'}
+    
+    Rows and columns in events are 0-based.
+    """
+    
+    __slots__ = ('id', 'game', 'seats', 'events', 'winner', 'touched')
+    
+    def __init__(self, session_id, game, seats):
+        """
+        Args:
+            session_id (int): Identifier reported to clients
+            game (ShellDashGame): Fresh game; bot seats need a policy in game.players
+            seats (list): Client identity or None (bot) for Player 1 and Player 2
+        """
+        self.id = session_id
+        self.game = game
+        self.seats = seats
+        self.events = []
+        self.winner = None  # Declared when the turn that reached 3 shells ends
+        self.touched = 0.0  # Time of the last move, for expiring abandoned HTTP games
+    
+    @property
+    def finished(self):
+        """True once a player has won."""
+        return self.winner is not None
+    
+    def start(self):
+        """
+        Let a bot in seat 1 play its turns.
+        
+        Returns:
+            list: Events produced before a client is to move
+        """
+        self._play_bots()
+        return self._take_events()
+    
+    def _take_events(self):
+        events, self.events = self.events, []
+        return events
+    
+    def _record(self, result):
+        self.events.append({
+            'type': 'reveal', 'player': self.game.current_player, 'row': result.row,
+            'col': result.col, 'card': result.card, 'effect': result.effect,
+            'expanded': result.expanded,
+        })
+    
+    def _end_turn(self):
+        """
+        End the current turn and record it.
+        
+        Returns:
+            bool: True if the game is over
+        """
+        game = self.game
+        result = game.end_turn()
+        index = result.player - 1
+        self.events.append({'type': 'end', 'player': result.player,
+                            'shells': game.shell_count[index],
+                            'flip_flops': game.flip_flop_count[index]})
+        if result.winner:
+            self.winner = result.winner
+            self.events.append({'type': 'win', 'player': result.winner})
+            return True
+        return False
+    
+    def _play_bots(self):
+        """Play out bot turns until a client is to move or the game is over."""
+        game = self.game
+        while self.seats[game.current_player - 1] is None:
+            policy = game.players[game.current_player - 1]
+            while not game.turn_over:
+                if game.awaiting_flip_flop:
+                    self._record(game.use_flip_flop(policy.use_flip_flop(game)))
+                else:
+                    self._record(game.reveal(policy.choose_column(game)))
+            if self._end_turn():
+                return
+    
+    def submit(self, seat, action, arg):
+        """
+        Apply a move from a client.
+        
+        Args:
+            seat: Identity of the client, as stored in seats
+            action (str): 'reveal' or 'use_flip_flop'
+            arg: Column index for 'reveal', True or False for 'use_flip_flop'
+            
+        Returns:
+            list: Events the move produced, including any bot turns it triggered
+            
+        Raises:
+            ValueError: If the game is over, it is not this client's turn or the move is illegal
+        """
+        game = self.game
+        if self.finished:
+            raise ValueError("Game is over")
+        if self.seats[game.current_player - 1] != seat:
+            raise ValueError("Not your turn")
+        if action == 'reveal':
+            result = game.reveal(arg)
+        else:
+            result = game.use_flip_flop(arg)
+        self._record(result)
+        
+        if game.turn_over and not self._end_turn():
+            self._play_bots()
+        return self._take_events()
+
+
+class GameServer:
+    """
+    Hosts many Shell Dash games in one asyncio process.
+    
+    Each client is a coroutine waiting on its next request, so an idle game
+    costs only its ShellDashGame - no thread, process or terminal. Games are
+    played over a line-based TCP protocol (handle_connection) or a JSON HTTP
+    API (handle_http). TCP clients send one command per line:
+    
+        NAME <name>          set the name shown for your seat
+        NEW [opponent]       play against a bot policy (default leftmost), or
+                             'human' to play both seats from this connection
+        JOIN <room>          pair with the next connection to JOIN the same room
+        PICK <A-C>           reveal a card in your current row
+        FLIP <Y|N>           decide whether to spend a Flip-Flop on a Jellyfish
+        STATE                show the game state as JSON
+        QUIT                 close the connection
+    
+    and receive lines describing what happened, ending with a prompt for
+    the player to move:
+    
+        GAME <id> <seat>                      joined game <id> as seat 1 or 2 (0 for both seats)
+        REVEAL <player> <row> <col> <card> <effect>
+        END <player> <shells> <flip_flops>    <player>'s turn ended with these totals
+        WIN <player>
+        TURN <player> <row> <rows>            <player> must PICK a card in <row> (1-based)
+        FLIP <player> <flip_flops>            <player> must answer FLIP Y or FLIP N for a Jellyfish
+    
+    plus "WAIT <room>", "STATE <json>", and "ERR <message>" for rejected commands.
+    """
+    
+    def __init__(self, seed=None, max_sessions=100000, http_idle_timeout=3600, event_log=None,
+                 board_pool=None, profiler=None, metrics=None):
+        """
+        Args:
+            seed (int, optional): Base seed; game N is dealt from derive_seed(seed, N)
+            max_sessions (int): Most games hosted at once; further new games are
+                                refused so memory stays bounded
+            http_idle_timeout (float): Seconds after which an HTTP game nobody has
+                                       moved in may be dropped to make room
+            event_log (EventLog, optional): Log recording every game's moves,
+                                            tagged with the session id
+            board_pool (BoardPool, optional): Pool dealing every game's boards
+                                              ahead of time, off the request path
+            profiler (GameProfiler, optional): Profiler following every game
+            metrics (GameMetrics, optional): Metrics counting every game's moves,
+                                             plus active games and move latency
+        """
+        self.seed = seed
+        self.event_log = event_log
+        self.board_pool = board_pool
+        self.profiler = profiler
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.active_games.function = lambda: len(self.sessions)
+        self.max_sessions = max_sessions
+        self.http_idle_timeout = http_idle_timeout
+        self.sessions = {}   # Session id -> GameSession currently in progress
+        self.rooms = {}      # Room name -> ServerConnection waiting for an opponent to JOIN
+        self.http_sessions = {}  # Session id -> GameSession played over HTTP, least recently used first
+        self.games_started = 0
+    
+    def prepare_bots(self):
+        """Do every bot policy's one-time setup now, rather than in the middle of some game's move."""
+        for policy_class in POLICIES.values():
+            policy_class.prepare()
+    
+    def _new_session(self, seats, opponent=None):
+        """
+        Create, register and start a game.
+        
+        Returns:
+            tuple: (GameSession, events produced by its opening bot turns)
+        """
+        session_id = self.games_started
+        self.games_started += 1
+        players = [None, None]
+        if opponent is not None:
+            players[1] = POLICIES[opponent]()
+        seed = None
+        if self.seed is not None:
+            seed = derive_seed(self.seed, session_id)
+            if players[1] is not None:
+                players[1].reseed(derive_seed(self.seed, session_id, 2))
+        game = ShellDashGame(seed=seed, players=players)
+        game.game_id = session_id
+        if self.event_log is not None:
+            self.event_log.attach(game, session_id)
+        if self.board_pool is not None:
+            self.board_pool.attach(game)
+        if self.profiler is not None:
+            self.profiler.attach(game)
+        if self.metrics is not None:
+            self.metrics.attach(game)
+        session = GameSession(session_id, game, seats)
+        if opponent is not None:
+            session.game.player_names[1] = f"{opponent.title()} Bot"
+        self.sessions[session_id] = session
+        return session, session.start()
+    
+    def _finish(self, session):
+        """Forget a finished (or abandoned) game so its players can start another."""
+        if self.event_log is not None:
+            self.event_log.flush()  # A finished game's record is complete on disk
+        self.sessions.pop(session.id, None)
+        self.http_sessions.pop(session.id, None)
+        for conn in self._connections(session):
+            conn.session = None
+    
+    def _has_room(self):
+        """
+        Check whether another game may start, dropping the longest-idle HTTP
+        game if the server is full and that game has timed out.
+        """
+        if len(self.sessions) < self.max_sessions:
+            return True
+        import time
+        oldest = next(iter(self.http_sessions.values()), None)
+        if oldest is not None and time.monotonic() - oldest.touched > self.http_idle_timeout:
+            self._finish(oldest)
+            return True
+        return False
+    
+    # -- TCP line protocol ---------------------------------------------------
+    
+    @staticmethod
+    def _connections(session):
+        """Distinct TCP connections at a session's table."""
+        seats = session.seats
+        return [conn for i, conn in enumerate(seats)
+                if isinstance(conn, ServerConnection) and (i == 0 or conn is not seats[0])]
+    
+    def _broadcast(self, session, events):
+        """Send events to a session's TCP players, followed by a prompt for the next move."""
+        lines = []
+        for event in events:
+            kind = event['type']
+            if kind == 'reveal':
+                lines.append(f"REVEAL {event['player']} {event['row'] + 1} "
+                             f"{chr(65 + event['col'])} {event['card']} {event['effect']}")
+            elif kind == 'end':
+                lines.append(f"END {event['player']} {event['shells']} {event['flip_flops']}")
+            else:
+                lines.append(f"WIN {event['player']}")
+        
+        game = session.game
+        if not session.finished:
+            player = game.current_player
+            if game.awaiting_flip_flop:
+                lines.append(f"FLIP {player} {game.flip_flop_count[player - 1]}")
+            else:
+                lines.append(f"TURN {player} {game.current_row + 1} {game.rows}")
+        for conn in self._connections(session):
+            for line in lines:
+                conn.send(line)
+    
+    def _start_tcp(self, seats, opponent=None):
+        session, events = self._new_session(seats, opponent)
+        hot_seat = seats[0] is seats[1]
+        for seat, conn in enumerate(seats, 1):
+            if conn is not None and not (hot_seat and seat == 2):
+                conn.session = session
+                if conn.name:
+                    session.game.player_names[seat - 1] = conn.name
+                conn.send(f"GAME {session.id} {0 if hot_seat else seat}")
+        self._broadcast(session, events)
+    
+    def _leave(self, conn):
+        """Clean up after a connection closes."""
+        if conn.room is not None:
+            self.rooms.pop(conn.room, None)
+        session = conn.session
+        if session is not None:
+            self._finish(session)
+            for other in self._connections(session):
+                if other is not conn:
+                    other.send("ERR Opponent disconnected")
+                    other.flush()
+    
+    def handle_command(self, conn, line):
+        """
+        Apply one command line from a TCP connection, queueing any replies.
+        
+        Returns:
+            bool: False if the connection should be closed
+        """
+        import time
+        
+        command, _, arg = line.strip().partition(' ')
+        command = command.upper()
+        arg = arg.strip()
+        session = conn.session
+        
+        if command in ('PICK', 'FLIP'):
+            if session is None:
+                conn.send("ERR No game in progress; send NEW or JOIN")
+                return True
+            arg = arg.upper()
+            cols = session.game.cols
+            started = time.perf_counter()
+            try:
+                if command == 'PICK':
+                    if len(arg) != 1 or not 'A' <= arg <= chr(64 + cols):
+                        raise ValueError(f"Choose a card from A-{chr(64 + cols)}")
+                    events = session.submit(conn, 'reveal', ord(arg) - 65)
+                else:
+                    if arg not in ('Y', 'N'):
+                        raise ValueError("Answer FLIP Y or FLIP N")
+                    events = session.submit(conn, 'use_flip_flop', arg == 'Y')
+            except ValueError as error:
+                conn.send(f"ERR {error}")
+                return True
+            self._broadcast(session, events)
+            if session.finished:
+                self._finish(session)
+            if self.metrics is not None:
+                self.metrics.move_latency.observe(time.perf_counter() - started)
+        elif command == 'STATE':
+            if session is None:
+                conn.send("ERR No game in progress; send NEW or JOIN")
+            else:
+                import json
+                conn.send("STATE " + json.dumps(session.game.state(), separators=(',', ':')))
+        elif command in ('NEW', 'JOIN'):
+            if session is not None or conn.room is not None:
+                conn.send("ERR Already in a game")
+            elif not self._has_room():
+                conn.send("ERR Server is full")
+            elif command == 'NEW':
+                opponent = arg.lower() or 'leftmost'
+                if opponent == 'human':
+                    self._start_tcp([conn, conn])
+                elif opponent in POLICIES:
+                    self._start_tcp([conn, None], opponent)
+                else:
+                    conn.send(f"ERR Unknown opponent {opponent!r}")
+            elif not arg:
+                conn.send("ERR JOIN needs a room name")
+            elif arg in self.rooms:
+                first = self.rooms.pop(arg)
+                first.room = None
+                self._start_tcp([first, conn])
+            else:
+                conn.room = arg
+                self.rooms[arg] = conn
+                conn.send(f"WAIT {arg}")
+        elif command == 'NAME':
+            conn.name = arg or None
+        elif command == 'QUIT':
+            return False
+        elif command:
+            conn.send(f"ERR Unknown command {command!r}")
+        return True
+    
+    async def handle_connection(self, reader, writer):
+        """Serve one TCP client until it quits or disconnects."""
+        conn = ServerConnection(writer)
+        conn.send("HELLO shelldash 1")
+        conn.flush()
+        try:
+            while True:
+                line = await reader.readline()
+                previous = conn.session
+                if not line or not self.handle_command(conn, line.decode(errors='replace')):
+                    break
+                # Deliver everything the command produced, including to the other seat
+                conn.flush()
+                for session in (previous, conn.session):
+                    if session is not None:
+                        for other in self._connections(session):
+                            other.flush()
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass  # Client went away (or sent an oversized line)
+        finally:
+            self._leave(conn)
+            writer.close()
+    
+    # -- HTTP JSON API ---------------------------------------------------------
+    
+    def _delta(self, session, events):
+        """
+        Describe a move's outcome without dumping the board.
+        
+        Clients apply the reveal events to their own copy of the board; an
+        'end' event means the next turn starts on a fresh hidden board of
+        `rows` rows.
+        """
+        game = session.game
+        return {
+            'events': events,
+            'current_player': game.current_player,
+            'current_row': game.current_row,
+            'rows': game.rows,
+            'shell_count': list(game.shell_count),
+            'flip_flop_count': list(game.flip_flop_count),
+            'awaiting_flip_flop': game.awaiting_flip_flop,
+            'winner': session.winner,
+        }
+    
+    def handle_request(self, method, path, body):
+        """
+        Answer one HTTP API request.
+        
+        Endpoints (request and response bodies are JSON):
+        
+            POST /api/new_game       {"opponent": "human" or a policy, "names": [..]}
+                                     -> {"game", "token", "state"}
+            POST /api/reveal         {"game", "token", "col"}  -> delta
+            POST /api/use_flip_flop  {"game", "token", "use"}  -> delta
+            GET  /api/state?game=ID  -> full state, as ShellDashGame.state()
+        
+        Moves return a delta (see _delta) rather than the whole board. The
+        token from new_game must accompany every move in that game. A game is
+        forgotten once the delta of its winning move has been returned.
+        
+        Args:
+            method (str): HTTP method
+            path (str): Request target, including any query string
+            body (bytes): Request body
+            
+        Returns:
+            tuple: (HTTP status line text, JSON-serializable payload)
+        """
+        import json
+        import secrets
+        import time
+        from urllib.parse import parse_qs, urlsplit
+        
+        url = urlsplit(path)
+        endpoint = url.path.rstrip('/')
+        if endpoint not in ('/api/new_game', '/api/reveal', '/api/use_flip_flop', '/api/state'):
+            return '404 Not Found', {'error': f"Unknown endpoint {url.path}"}
+        if method not in (('GET', 'POST') if endpoint == '/api/state' else ('POST',)):
+            return '405 Method Not Allowed', {'error': f"{method} not allowed on {url.path}"}
+        
+        try:
+            if method == 'GET':
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            else:
+                params = json.loads(body or b'{}')
+            if not isinstance(params, dict):
+                raise ValueError("Request body must be a JSON object")
+        except ValueError as error:
+            return '400 Bad Request', {'error': str(error)}
+        
+        if endpoint == '/api/new_game':
+            opponent = str(params.get('opponent', 'human')).lower()
+            if opponent != 'human' and opponent not in POLICIES:
+                return '400 Bad Request', {'error': f"Unknown opponent {opponent!r}"}
+            if not self._has_room():
+                return '503 Service Unavailable', {'error': "Server is full"}
+            token = secrets.token_hex(8)
+            seats = [token, token] if opponent == 'human' else [token, None]
+            session, _ = self._new_session(seats, None if opponent == 'human' else opponent)
+            names = params.get('names') or []
+            for i, name in enumerate(names[:2] if isinstance(names, list) else []):
+                if name and seats[i] is not None:
+                    session.game.player_names[i] = str(name)
+            session.touched = time.monotonic()
+            self.http_sessions[session.id] = session
+            return '200 OK', {'game': session.id, 'token': token, 'state': session.game.state()}
+        
+        try:
+            session = self.http_sessions.get(int(params.get('game')))
+        except (TypeError, ValueError):
+            return '400 Bad Request', {'error': "Missing or invalid 'game'"}
+        if session is None:
+            return '404 Not Found', {'error': "No such game"}
+        if endpoint == '/api/state':
+            return '200 OK', session.game.state()
+        
+        token = params.get('token')
+        if token is None or token not in session.seats:
+            return '403 Forbidden', {'error': "Invalid token"}
+        started = time.perf_counter()
+        try:
+            if endpoint == '/api/reveal':
+                col = params.get('col')
+                if not isinstance(col, int) or isinstance(col, bool):
+                    raise ValueError("'col' must be a column index")
+                events = session.submit(token, 'reveal', col)
+            else:
+                events = session.submit(token, 'use_flip_flop', bool(params.get('use')))
+        except ValueError as error:
+            return '409 Conflict', {'error': str(error)}
+        
+        # Keep the most recently played games at the end for idle expiry
+        session.touched = time.monotonic()
+        del self.http_sessions[session.id]
+        self.http_sessions[session.id] = session
+        delta = self._delta(session, events)
+        if session.finished:
+            self._finish(session)
+        if self.metrics is not None:
+            self.metrics.move_latency.observe(time.perf_counter() - started)
+        return '200 OK', delta
+    
+    async def handle_http(self, reader, writer):
+        """
+        Serve HTTP/1.1 requests from one client over a keep-alive connection.
+        
+        Each response is sent with a single write. Request bodies must carry
+        a Content-Length; chunked uploads are not supported.
+        """
+        import asyncio
+        import json
+        
+        try:
+            while True:
+                # Request line and headers arrive together; read them in one go
+                request_line, *header_lines = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+                method, target, version = request_line.split()
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                
+                length = int(headers.get('content-length', 0))
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                if 'transfer-encoding' in headers:
+                    status, payload, keep_alive = '411 Length Required', {'error': "Content-Length required"}, False
+                elif length > 65536:
+                    status, payload, keep_alive = '413 Content Too Large', {'error': "Request body too large"}, False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    if method == 'OPTIONS':
+                        status, payload = '204 No Content', None  # CORS preflight from a browser front end
+                    else:
+                        status, payload = self.handle_request(method.upper(), target, body)
+                
+                data = b'' if payload is None else json.dumps(payload, separators=(',', ':')).encode()
+                head = (f"HTTP/1.1 {status}\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(data)}\r\n"
+                        "Access-Control-Allow-Origin: *\r\n"
+                        "Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+                        "Access-Control-Allow-Headers: Content-Type\r\n")
+                if not keep_alive:
+                    head += "Connection: close\r\n"
+                writer.write(head.encode() + b"\r\n" + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass  # Client went away or sent something that is not HTTP
+        finally:
+            writer.close()
+    
+    # -- Running -----------------------------------------------------------------
+    
+    async def start(self, host='127.0.0.1', port=0):
+        """
+        Start accepting TCP line-protocol clients without blocking.
+        
+        Returns:
+            asyncio.Server: The listening server; port 0 picks a free port
+        """
+        import asyncio
+        
+        self.prepare_bots()  # Before listening, so no client's move waits on it
+        # A deep accept queue so bursts of thousands of connections are not dropped
+        return await asyncio.start_server(self.handle_connection, host, port, backlog=4096)
+    
+    async def start_http(self, host='127.0.0.1', port=0):
+        """
+        Start serving the HTTP JSON API without blocking.
+        
+        Returns:
+            asyncio.Server: The listening server; port 0 picks a free port
+        """
+        import asyncio
+        
+        self.prepare_bots()  # Before listening, so no client's move waits on it
+        return await asyncio.start_server(self.handle_http, host, port, backlog=4096)
+    
+    def serve(self, host='127.0.0.1', port=None, http_port=None):
+        """Run the TCP server, the HTTP API or both until interrupted."""
+        import asyncio
+        
+        async def run():
+            servers = []
+            for start, listen_port, label in ((self.start, port, "server"),
+                                              (self.start_http, http_port, "HTTP API")):
+                if listen_port is not None:
+                    server = await start(host, listen_port)
+                    address = server.sockets[0].getsockname()
+                    print(f"Shell Dash {label} listening on {address[0]}:{address[1]}", flush=True)
+                    servers.append(server)
+            await asyncio.gather(*(server.serve_forever() for server in servers))
+        
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            pass
+
+
+def main(argv=None):
+    """
+    Command-line entry point.
+    
+    With no arguments an interactive two-player game is started. With
+    --simulate N, N games are played headlessly and a statistics report
+    is printed instead; with --serve PORT and/or --http PORT games are
+    hosted for network clients. --verify-replays FILE checks the games in
+    an event log by replaying them, and --estimate measures Player 1's win
+    rate for one or more deck variants. --build-turn-table, --turn-table and
+    --verify-turn-table create, simulate with and check turn tables, and
+    --sweep simulates a grid of rule sets, caching each one's results.
+    --game-store DIR records a row per game into a columnar store, which
+    --query DIR filters, groups and aggregates.
+    
+    Args:
+        argv (list, optional): Command-line arguments (defaults to sys.argv)
+        
+    Returns:
+        int or None: Exit status; 1 if --verify-replays or --verify-turn-table
+        found a mismatch
+    """
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Shell Dash - Card Game")
+    parser.add_argument('--simulate', type=int, metavar='N',
+                        help="simulate N games headlessly and print statistics")
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='leftmost',
+                        help="bot policy used for both seats when simulating")
+    parser.add_argument('--tournament', metavar='POLICIES',
+                        help="comma-separated policies to play a round-robin tournament")
+    parser.add_argument('--games', type=int, default=1000, metavar='M',
+                        help="games per pairing in a tournament, or per rule set in a sweep")
+    parser.add_argument('--player1', choices=sorted(POLICIES),
+                        help="let a bot policy play seat 1 of the interactive game")
+    parser.add_argument('--player2', choices=sorted(POLICIES),
+                        help="let a bot policy play seat 2 of the interactive game")
+    parser.add_argument('--seed', type=int,
+                        help="base seed for reproducible simulations")
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help="worker processes for simulation (0 = one per CPU)")
+    parser.add_argument('--backend', choices=['python', 'numpy'], default='python',
+                        help="simulation backend (numpy resolves games in vectorized batches)")
+    parser.add_argument('--serve', type=int, metavar='PORT',
+                        help="host games for network clients on PORT instead of playing locally")
+    parser.add_argument('--http', type=int, metavar='PORT',
+                        help="serve the JSON move API over HTTP on PORT")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="address the game server listens on")
+    parser.add_argument('--event-log', metavar='FILE',
+                        help="append every move of the interactive or served games to a binary log")
+    parser.add_argument('--redraw', action='store_true',
+                        help="redraw the board in place during the interactive game instead of scrolling")
+    parser.add_argument('--board-pool', type=int, metavar='N',
+                        help="deal up to N boards ahead of time in a background thread")
+    parser.add_argument('--profile', action='store_true',
+                        help="time each phase of the games played and print a summary at exit")
+    parser.add_argument('--profile-json', metavar='FILE',
+                        help="write the --profile timings and counters to FILE as JSON")
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help="serve Prometheus metrics of served or simulated games at /metrics on PORT")
+    parser.add_argument('--metrics-interval', type=float, metavar='SECONDS',
+                        help="print a one-line metrics summary to stderr every SECONDS")
+    parser.add_argument('--estimate', action='append', metavar='COUNTS',
+                        help="estimate Player 1's win rate with this deck (six comma-separated card "
+                             "counts); repeat to compare variants against the first")
+    parser.add_argument('--target-width', type=float, default=0.01,
+                        help="stop --estimate once every 95%% confidence interval is this narrow")
+    parser.add_argument('--max-games', type=int, default=10 ** 7,
+                        help="most games --estimate may play")
+    parser.add_argument('--stratify', action='store_true',
+                        help="post-stratify --estimate by the Shells and Suns in the opening rows")
+    parser.add_argument('--no-antithetic', action='store_true',
+                        help="don't pair --estimate games with seat-swapped twins")
+    parser.add_argument('--build-turn-table', metavar='FILE',
+                        help="tabulate the exact turn outcomes of --policy and save them to FILE")
+    parser.add_argument('--turn-table', metavar='FILE',
+                        help="with --simulate, sample whole turns from a saved turn table")
+    parser.add_argument('--verify-turn-table', metavar='FILE',
+                        help="check a saved turn table against --games games of the rules engine")
+    parser.add_argument('--sweep', action='append', metavar='RULE=V1,V2',
+                        help="simulate --games games for every combination of rule values; repeat for "
+                             "more rules (%s; card_counts values are colon-separated)"
+                             % ", ".join(RuleSet._fields))
+    parser.add_argument('--cache-dir', default=SWEEP_CACHE_DIR,
+                        help="directory --sweep caches results in (default %(default)s)")
+    parser.add_argument('--game-store', metavar='DIR',
+                        help="append a row per simulated or interactive game to the columnar store in DIR")
+    parser.add_argument('--query', metavar='DIR',
+                        help="aggregate the games in a columnar store and print a table")
+    parser.add_argument('--where', action='append', default=[], metavar='COND',
+                        help="with --query, only count games where COND holds, e.g. turns>=20 (repeatable)")
+    parser.add_argument('--group-by', metavar='COLUMNS',
+                        help="with --query, comma-separated columns to group by, e.g. winner,rows")
+    parser.add_argument('--agg', default='count', metavar='AGGREGATES',
+                        help="with --query, comma-separated aggregates: count, or sum, mean, min or max "
+                             "followed by :COLUMN (default %(default)s)")
+    parser.add_argument('--verify-replays', metavar='FILE',
+                        help="replay every finished game in an event log and check its recorded outcome")
+    args = parser.parse_args(argv)
+    
+    other_modes = [option for option, value in (
+        ('--serve', args.serve), ('--http', args.http), ('--tournament', args.tournament),
+        ('--estimate', args.estimate), ('--sweep', args.sweep), ('--query', args.query),
+        ('--verify-replays', args.verify_replays), ('--build-turn-table', args.build_turn_table),
+        ('--turn-table', args.turn_table), ('--verify-turn-table', args.verify_turn_table))
+        if value is not None]
+    if args.redraw and (other_modes or args.simulate is not None):
+        parser.error(f"--redraw only applies to the interactive game, not {(other_modes or ['--simulate'])[0]}")
+    if args.game_store:
+        if other_modes:
+            parser.error(f"--game-store only records --simulate or interactive games, not {other_modes[0]}")
+        if args.simulate is not None and args.backend != 'python':
+            parser.error("--game-store needs the python backend")
+    
+    if args.query:
+        try:
+            store = GameStore(args.query)
+            group_by = [name.strip() for name in (args.group_by or '').split(',') if name.strip()]
+            result = store.query(args.where, group_by, args.agg.split(','), workers=args.workers)
+        except (OSError, ValueError) as error:
+            parser.error(f"--query: {error}")
+        print(result.report())
+        return 0
+    
+    if args.verify_replays:
+        report = verify_replays(replays_from_events(read_events(args.verify_replays)), args.workers)
+        print(report.report())
+        return 1 if report.mismatches else 0
+    
+    if args.build_turn_table or args.verify_turn_table or args.turn_table:
+        try:
+            if args.build_turn_table:
+                TurnTable(args.policy).save(args.build_turn_table)
+                print(f"Turn table for {args.policy} saved to {args.build_turn_table}")
+                return 0
+            table = TurnTable.load(args.verify_turn_table or args.turn_table)
+        except ValueError as error:
+            parser.error(str(error))
+        if args.verify_turn_table:
+            check = table.verify(args.games, args.seed)
+            print(check.report())
+            return 0 if check.ok else 1
+        if args.simulate is None:
+            parser.error("--turn-table needs --simulate")
+        print(table.simulate(args.simulate, args.seed, args.backend).report())
+        return 0
+    
+    profiler = GameProfiler() if args.profile or args.profile_json else None
+    if profiler is not None and args.tournament:
+        parser.error("--profile does not support tournaments")
+    if profiler is not None and args.simulate is not None and args.backend != 'python':
+        parser.error("--profile needs the python backend")
+    
+    metrics = None
+    if args.metrics_port is not None or args.metrics_interval:
+        if args.simulate is None and args.serve is None and args.http is None:
+            parser.error("--metrics-port and --metrics-interval need --simulate, --serve or --http")
+        metrics = GameMetrics()
+        if args.metrics_port is not None:
+            metrics.registry.serve(args.host, args.metrics_port)
+        if args.metrics_interval:
+            metrics.report_every(args.metrics_interval)
+    
+    board_pool = BoardPool(args.board_pool) if args.board_pool else None
+    if args.serve is not None or args.http is not None:
+        event_log = EventLog(args.event_log) if args.event_log else None
+        try:
+            GameServer(args.seed, event_log=event_log, board_pool=board_pool, profiler=profiler,
+                       metrics=metrics).serve(args.host, args.serve, args.http)
+        finally:
+            if event_log is not None:
+                event_log.close()
+            _write_profile(profiler, args)
+        return
+    
+    if args.simulate is not None:
+        # Headless batch mode - no rendering, just statistics
+        store = GameStore(args.game_store, 'a') if args.game_store else None
+        stats = simulate(args.simulate, args.policy, args.seed, args.workers, args.backend,
+                         profile=profiler is not None, metrics=metrics, store=store)
+        if store is not None:
+            store.close()
+        print(stats.report())
+        if args.metrics_interval:
+            print(metrics.summary(), file=sys.stderr)
+        _write_profile(stats.profile, args)
+        return
+    
+    if args.estimate:
+        try:
+            variants = [[int(count) for count in counts.split(',')] for counts in args.estimate]
+        except ValueError:
+            parser.error("--estimate takes comma-separated card counts")
+        if any(len(counts) != len(CARD_NAMES) or min(counts) < 0 for counts in variants):
+            parser.error(f"--estimate needs {len(CARD_NAMES)} card counts, one per card type")
+        estimate = estimate_win_rates(variants, args.policy, args.seed, args.target_width, args.max_games,
+                                      workers=args.workers, antithetic=not args.no_antithetic,
+                                      stratify=args.stratify)
+        print(estimate.report())
+        return
+    
+    if args.sweep:
+        if args.games < 1:
+            parser.error("--sweep needs --games of at least 1")
+        axes = {}
+        try:
+            for axis in args.sweep:
+                field, _, values = axis.partition('=')
+                field = field.strip()
+                if field == 'card_counts':
+                    axes[field] = [tuple(int(c) for c in v.split(':')) for v in values.split(',')]
+                else:
+                    axes[field] = [int(v) for v in values.split(',')]
+            rule_sets = rule_grid(**axes)
+        except ValueError as error:
+            parser.error(f"--sweep: {error}")
+        seed = args.seed if args.seed is not None else 0  # Cached results need a fixed seed
+        points = sweep(rule_sets, args.games, args.policy, seed, args.workers, args.backend, args.cache_dir)
+        print(sweep_report(points))
+        return
+    
+    if args.tournament:
+        names = [name.strip() for name in args.tournament.split(',') if name.strip()]
+        print(run_tournament(names, args.games, args.seed, args.workers).report())
+        return
+    
+    # Create a new game instance, with bots in any seats requested
+    players = [POLICIES[name]() if name else None for name in (args.player1, args.player2)]
+    game = ShellDashGame(seed=args.seed, players=players)
+    game.redraw = args.redraw
+    if args.event_log:
+        EventLog(args.event_log).attach(game, 0)
+    if board_pool is not None:
+        board_pool.attach(game)
+    if profiler is not None:
+        profiler.attach(game)
+    store = records = None
+    if args.game_store:
+        store = GameStore(args.game_store, 'a')
+        records = GameRecords()
+        records.attach(game)
+    
+    # Begin the interactive game experience
+    try:
+        game.play()
+    finally:
+        if game.event_log is not None:
+            game.event_log.close()
+        if store is not None:
+            store.append(records)
+            store.close()
+        _write_profile(profiler, args)
+
+
+def _write_profile(profiler, args):
+    """Print the --profile summary to stderr and/or write it to the --profile-json file."""
+    import json
+    
+    if profiler is None:
+        return
+    if args.profile:
+        print(profiler.report(), file=sys.stderr)
+    if args.profile_json:
+        with open(args.profile_json, 'w') as f:
+            json.dump(profiler.to_dict(), f, indent=2, sort_keys=True)
+
+
+# Game entry point - only runs when script is executed directly
+if __name__ == "__main__":
+    """
+    Initialize and start a new Shell Dash game.
+    
+    This block only executes when the script is run directly,
+    not when imported as a module. Parses command-line options and
+    either starts the interactive game or a headless simulation.
+    """
+    sys.exit(main())
@@ -1,7 +1,21 @@
 """Tests for Shell Dash Python game (shelldash.py)."""
 
+import asyncio
+import json
+import random
+
 import pytest
-from shelldash import ShellDashGame
+import shelldash
+from shelldash import (
+    ShellDashGame, Board, LeftmostPolicy, RandomPolicy, run_turn, run_game, simulate, simulate_range,
+    simulate_batch, main, SAND, SHELL, SUN, WAVE, WinCalculator, TurnOutcome,
+    ExpectimaxSolver, ExpectimaxPolicy, Policy, TournamentResult, run_tournament, CounterRandom, BoardPool,
+    TerminalRenderer, GameServer, EventLog, EventRecord, read_events, replay_game,
+    replays_from_events, verify_replays, GameProfiler, MetricsRegistry, GameMetrics, CoupledGame,
+    coupled_layouts, deal_slots, estimate_win_rates, opening_strata_probabilities, RunningStats,
+    FixedHistogram, QuantileSketch, TurnTable, build_alias_table, RuleSet, STANDARD_RULES, rule_grid,
+    sweep, SimulationStats, GameRecords, GameStore, derive_seed,
+)
 
 
 # ---------------------------------------------------------------------------
@@ -149,9 +163,7 @@ class TestCardEffects:
         game = ShellDashGame()
         game.rows = len(cards_grid)
         game.cols = len(cards_grid[0]) if cards_grid else 3
-        game.board = []
-        for row_cards in cards_grid:
-            game.board.append([{'card': c, 'revealed': False} for c in row_cards])
+        game.board = Board.from_cards(cards_grid)
         return game
 
     # -- Shell --
@@ -160,7 +172,7 @@ class TestCardEffects:
         game.current_player = 1
         game.shell_count = [0, 0]
         # Simulate revealing Shell at (0, 0)
-        game.board[0][0]['revealed'] = True
+        game.board.reveal(0, 0)
         card = game.board[0][0]['card']
         assert card == 'Shell'
         game.shell_count[game.current_player - 1] += 1
@@ -170,7 +182,7 @@ class TestCardEffects:
         game = self._make_game_with_board([['Shell', 'Sand', 'Sand']])
         game.current_player = 2
         game.shell_count = [1, 0]
-        game.board[0][0]['revealed'] = True
+        game.board.reveal(0, 0)
         game.shell_count[game.current_player - 1] += 1
         assert game.shell_count == [1, 1]
 
@@ -179,7 +191,7 @@ class TestCardEffects:
         game = self._make_game_with_board([['Flip-Flop', 'Sand', 'Sand']])
         game.current_player = 1
         game.flip_flop_count = [0, 0]
-        game.board[0][0]['revealed'] = True
+        game.board.reveal(0, 0)
         game.flip_flop_count[game.current_player - 1] += 1
         assert game.flip_flop_count == [1, 0]
 
@@ -210,15 +222,7 @@ class TestCardEffects:
         # Simulate Sun effect
         if game.rows < 6:
             game.rows += 3
-            deck = game.create_deck()
-            for _ in range(3):
-                new_row = []
-                for col in range(game.cols):
-                    if deck:
-                        new_row.append({'card': deck.pop(), 'revealed': False})
-                    else:
-                        new_row.append({'card': 'Sand', 'revealed': False})
-                game.board.append(new_row)
+            game.board.append_rows(game.deal_cards(3 * game.cols))
         assert game.rows == 6
         assert len(game.board) == 6
 
@@ -244,7 +248,7 @@ class TestCardEffects:
         """Wave card should keep the player in the same row."""
         game = self._make_game_with_board([['Wave', 'Sand', 'Sand']])
         current_row = 0
-        game.board[0][0]['revealed'] = True
+        game.board.reveal(0, 0)
         card = game.board[0][0]['card']
         if card == 'Wave':
             pass  # Stay in same row
@@ -255,8 +259,8 @@ class TestCardEffects:
     def test_all_waves_in_row(self):
         """If all cards in a row are revealed and all are waves, turn ends."""
         game = self._make_game_with_board([['Wave', 'Wave', 'Wave']])
-        for cell in game.board[0]:
-            cell['revealed'] = True
+        for col in range(3):
+            game.board.reveal(0, col)
         all_revealed = all(cell['revealed'] for cell in game.board[0])
         all_waves = all(cell['card'] == 'Wave' for cell in game.board[0])
         assert all_revealed and all_waves
@@ -272,12 +276,12 @@ class TestBoardState:
     def test_revealing_card_changes_state(self):
         game = ShellDashGame()
         assert game.board[0][0]['revealed'] is False
-        game.board[0][0]['revealed'] = True
+        game.board.reveal(0, 0)
         assert game.board[0][0]['revealed'] is True
 
     def test_unrevealed_cards_stay_hidden(self):
         game = ShellDashGame()
-        game.board[0][0]['revealed'] = True
+        game.board.reveal(0, 0)
         # Other cards remain hidden
         assert game.board[0][1]['revealed'] is False
         assert game.board[0][2]['revealed'] is False
@@ -285,7 +289,7 @@ class TestBoardState:
     def test_card_type_persists_after_reveal(self):
         game = ShellDashGame()
         original_card = game.board[1][1]['card']
-        game.board[1][1]['revealed'] = True
+        game.board.reveal(1, 1)
         assert game.board[1][1]['card'] == original_card
 
 
@@ -326,3 +330,1721 @@ class TestGameInit:
         game = ShellDashGame()
         for card in game.cards:
             assert card in game.card_icons
+
+
+# ---------------------------------------------------------------------------
+# Headless turn engine
+# ---------------------------------------------------------------------------
+
+class TestTurnEngine:
+    """Tests for the I/O-free reveal/use_flip_flop/end_turn engine."""
+
+    def _make_game_with_board(self, cards_grid):
+        game = ShellDashGame()
+        game.rows = len(cards_grid)
+        game.cols = len(cards_grid[0])
+        game.board = Board.from_cards(cards_grid)
+        return game
+
+    def test_sand_advances_row(self):
+        game = self._make_game_with_board([['Sand', 'Wave', 'Wave'], ['Wave'] * 3])
+        result = game.reveal(0)
+        assert result.effect == 'sand'
+        assert game.current_row == 1
+        assert game.board[0][0]['revealed'] is True
+
+    def test_wave_stays_in_row(self):
+        game = self._make_game_with_board([['Wave', 'Sand', 'Sand'], ['Sand'] * 3])
+        result = game.reveal(0)
+        assert result.effect == 'wave'
+        assert game.current_row == 0
+        assert not game.turn_over
+
+    def test_all_waves_end_turn(self):
+        game = self._make_game_with_board([['Wave'] * 3, ['Sand'] * 3])
+        game.reveal(0)
+        game.reveal(1)
+        result = game.reveal(2)
+        assert result.effect == 'wave_end'
+        assert result.turn_over and game.turn_over
+
+    def test_jellyfish_without_flip_flop_stings(self):
+        game = self._make_game_with_board([['Jellyfish', 'Sand', 'Sand'], ['Sand'] * 3])
+        result = game.reveal(0)
+        assert result.effect == 'sting'
+        assert game.turn_over
+
+    def test_jellyfish_with_flip_flop_awaits_decision(self):
+        game = self._make_game_with_board([['Jellyfish', 'Sand', 'Sand'], ['Sand'] * 3])
+        game.flip_flop_count = [1, 0]
+        assert game.reveal(0).effect == 'jellyfish'
+        assert game.awaiting_flip_flop
+        with pytest.raises(ValueError):
+            game.reveal(1)
+        result = game.use_flip_flop(True)
+        assert result.effect == 'flip_flop_used'
+        assert game.flip_flop_count == [0, 0]
+        assert game.current_row == 1
+
+    def test_declining_flip_flop_ends_turn(self):
+        game = self._make_game_with_board([['Jellyfish', 'Sand', 'Sand'], ['Sand'] * 3])
+        game.flip_flop_count = [2, 0]
+        game.reveal(0)
+        result = game.use_flip_flop(False)
+        assert result.effect == 'sting'
+        assert game.turn_over
+        assert game.flip_flop_count == [2, 0]
+
+    def test_sun_expands_and_advances(self):
+        game = self._make_game_with_board([['Sun', 'Sand', 'Sand'], ['Sand'] * 3, ['Sand'] * 3])
+        result = game.reveal(0)
+        assert result.expanded
+        assert game.rows == 6 and len(game.board) == 6
+        assert game.current_row == 1
+
+    def test_shells_and_reaching_end(self):
+        game = self._make_game_with_board([['Shell', 'Sand', 'Sand'], ['Flip-Flop', 'Sand', 'Sand']])
+        game.reveal(0)
+        result = game.reveal(0)
+        assert result.turn_over
+        assert game.shell_count == [1, 0]
+        assert game.flip_flop_count == [1, 0]
+        assert game.turn_result.reached_end
+
+    def test_invalid_moves_raise(self):
+        game = self._make_game_with_board([['Wave', 'Sand', 'Sand'], ['Sand'] * 3])
+        with pytest.raises(ValueError):
+            game.reveal(3)
+        game.reveal(0)
+        with pytest.raises(ValueError):
+            game.reveal(0)
+        with pytest.raises(ValueError):
+            game.use_flip_flop(True)
+        with pytest.raises(ValueError):
+            game.end_turn()
+
+    def test_end_turn_switches_player_and_deals_new_board(self):
+        game = self._make_game_with_board([['Shell', 'Sand', 'Sand']])
+        game.reveal(0)
+        result = game.end_turn()
+        assert result.player == 1
+        assert result.shells_gained == 1
+        assert result.winner is None
+        assert game.current_player == 2
+        assert game.current_row == 0
+        assert not game.turn_over
+        assert all(not cell['revealed'] for row in game.board for cell in row)
+
+    def test_state_hides_unrevealed_cards(self):
+        game = self._make_game_with_board([['Wave', 'Sand', 'Sand'], ['Sand'] * 3])
+        game.reveal(0)
+        state = game.state()
+        assert state['board'][0] == ['Wave', None, None]
+        assert state['current_player'] == 1
+        assert state['winner'] is None
+
+    def test_play_turn_drives_engine_from_input(self, monkeypatch, capsys):
+        game = self._make_game_with_board([['Shell', 'Sand', 'Sand'], ['Sand'] * 3, ['Sand'] * 3])
+        answers = iter(['A', 'B', 'C'])
+        monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+        result = game.play_turn()
+        assert result.shells_gained == 1
+        assert result.reached_end
+        assert game.current_player == 2
+        assert "reached the end!" in capsys.readouterr().out
+
+
+# ---------------------------------------------------------------------------
+# Headless simulation
+# ---------------------------------------------------------------------------
+
+class TestSimulation:
+    """Tests for bot policies and the --simulate batch mode."""
+
+    def test_run_turn_finishes_turn(self):
+        game = ShellDashGame()
+        result = run_turn(game, LeftmostPolicy())
+        assert result.player == 1
+        assert result.reveals >= 1
+        assert game.current_player == 2
+
+    def test_run_game_returns_winner(self):
+        game = ShellDashGame()
+        winner = run_game(game, [RandomPolicy(1), RandomPolicy(2)])
+        assert winner in (1, 2)
+        assert game.shell_count[winner - 1] >= 3
+
+    def test_simulate_stats_are_consistent(self):
+        stats = simulate(30, 'random')
+        assert stats.games == 30
+        assert sum(stats.wins) == 30
+        assert stats.turns >= 30
+        assert sum(stats.shells_per_turn.values()) == stats.turns
+        assert sum(stats.flip_flops_per_turn.values()) == stats.turns
+
+    def test_simulate_cli_prints_report(self, capsys):
+        main(['--simulate', '5', '--policy', 'leftmost'])
+        out = capsys.readouterr().out
+        assert "Games simulated:      5" in out
+        assert "games/sec" in out
+
+    def test_seeded_games_are_reproducible(self):
+        game1 = ShellDashGame(seed=42)
+        game2 = ShellDashGame(seed=42)
+        assert game1.state() == game2.state()
+        assert [[c['card'] for c in row] for row in game1.board] == \
+            [[c['card'] for c in row] for row in game2.board]
+        assert run_game(game1, [LeftmostPolicy(), LeftmostPolicy()]) == \
+            run_game(game2, [LeftmostPolicy(), LeftmostPolicy()])
+
+    def test_same_seed_same_results_for_any_worker_count(self):
+        single = simulate(24, 'random', seed=123, workers=1)
+        pooled = simulate(24, 'random', seed=123, workers=3)
+        assert single.wins == pooled.wins
+        assert single.turns == pooled.turns
+        assert single.shells_per_turn == pooled.shells_per_turn
+        assert single.flip_flops_per_turn == pooled.flip_flops_per_turn
+
+    def test_single_shard_runs_without_a_pool(self, monkeypatch):
+        import concurrent.futures
+        
+        def no_pool(*args, **kwargs):
+            raise AssertionError("started a process pool for one shard")
+        monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', no_pool)
+        assert simulate(1, seed=4, workers=4).games == 1
+        assert simulate(0, seed=4, workers=4).games == 0
+
+    def test_simulate_range_shards_merge_exactly(self):
+        whole = simulate_range(9, 0, 10)
+        merged = simulate_range(9, 0, 4)
+        merged.merge(simulate_range(9, 4, 10))
+        assert (whole.games, whole.wins, whole.turns) == (merged.games, merged.wins, merged.turns)
+        assert whole.sun_expansions == merged.sun_expansions
+        assert whole.game_length.squares == merged.game_length.squares
+        assert whole.game_length_buckets.counts == merged.game_length_buckets.counts
+        assert whole.game_length_sketch.buckets == merged.game_length_sketch.buckets
+
+
+class TestStreamingStats:
+    """Tests for the constant-memory aggregators behind SimulationStats."""
+
+    def test_running_stats_match_direct_computation(self):
+        values = [3, 9, 4, 12, 7, 7, 30]
+        stats = RunningStats()
+        for value in values:
+            stats.add(value)
+        mean = sum(values) / len(values)
+        assert stats.mean() == pytest.approx(mean)
+        assert stats.variance() == pytest.approx(sum((v - mean) ** 2 for v in values) / (len(values) - 1))
+        assert (stats.min, stats.max) == (3, 30)
+
+    def test_merges_are_exact_in_any_order(self):
+        parts = [RunningStats(), RunningStats(), RunningStats()]
+        for i, value in enumerate(range(1, 1000)):
+            parts[i % 3].add(value * value)
+        forward, backward = RunningStats(), RunningStats()
+        for part in parts:
+            forward.merge(part)
+        for part in reversed(parts):
+            backward.merge(part)
+        assert (forward.count, forward.total, forward.squares) == \
+            (backward.count, backward.total, backward.squares)
+        with pytest.raises(ValueError, match="different buckets"):
+            FixedHistogram((1, 2)).merge(FixedHistogram((1, 3)))
+
+    def test_histogram_buckets_values(self):
+        histogram = FixedHistogram((5, 10))
+        for value in (1, 5, 6, 10, 11):
+            histogram.observe(value)
+        histogram.observe(100, count=3)
+        assert histogram.counts == [2, 2, 4]
+        assert histogram.count == 8
+
+    def test_quantile_sketch_is_within_its_accuracy(self):
+        sketch, halves = QuantileSketch(0.01), [QuantileSketch(0.01), QuantileSketch(0.01)]
+        values = list(range(1, 100001))
+        for value in values:
+            sketch.add(value)
+            halves[value % 2].add(value)
+        for q in (0.01, 0.5, 0.9, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            assert abs(sketch.quantile(q) - exact) <= 0.01 * exact + 1
+        assert len(sketch.buckets) < 1200
+        halves[0].merge(halves[1])
+        assert halves[0].buckets == sketch.buckets
+        assert QuantileSketch().quantile(0.5) is None
+
+    def test_report_shows_game_length_distribution(self):
+        stats = simulate(40, 'random', seed=2)
+        assert stats.game_length.count == 40
+        assert stats.game_length.total == stats.turns
+        assert sum(stats.game_length_buckets.counts) == 40
+        assert stats.game_length.min <= stats.game_length_sketch.quantile(0.5) <= stats.game_length.max * 1.01
+        assert "Turns/game spread:" in stats.report()
+
+
+# ---------------------------------------------------------------------------
+# NumPy batch backend
+# ---------------------------------------------------------------------------
+
+class TestVectorizedBackend:
+    """Tests for the NumPy lockstep simulation backend."""
+
+    def test_batch_stats_are_consistent(self):
+        pytest.importorskip('numpy')
+        stats = simulate_batch(5, 0, 500, 'random')
+        assert stats.games == 500
+        assert sum(stats.wins) == 500
+        assert sum(stats.shells_per_turn.values()) == stats.turns
+        assert sum(stats.flip_flops_per_turn.values()) == stats.turns
+
+    def test_batches_are_reproducible(self):
+        pytest.importorskip('numpy')
+        first = simulate_batch(5, 3, 200)
+        second = simulate_batch(5, 3, 200)
+        assert (first.wins, first.turns, first.shells_per_turn) == \
+            (second.wins, second.turns, second.shells_per_turn)
+
+    def test_single_batch_runs_without_a_pool(self, monkeypatch):
+        pytest.importorskip('numpy')
+        import concurrent.futures
+        
+        def no_pool(*args, **kwargs):
+            raise AssertionError("started a process pool for one batch")
+        monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', no_pool)
+        assert simulate(10, seed=4, workers=4, backend='numpy').games == 10
+
+    def test_worker_count_does_not_change_results(self, monkeypatch):
+        pytest.importorskip('numpy')
+        monkeypatch.setattr(shelldash, 'VECTOR_BATCH_SIZE', 50)
+        single = simulate(200, seed=11, workers=1, backend='numpy')
+        pooled = simulate(200, seed=11, workers=2, backend='numpy')
+        assert (single.wins, single.turns, single.sun_expansions) == \
+            (pooled.wins, pooled.turns, pooled.sun_expansions)
+        assert single.game_length.squares == pooled.game_length.squares
+        assert single.game_length_sketch.buckets == pooled.game_length_sketch.buckets
+
+    def test_matches_turn_engine_statistically(self):
+        pytest.importorskip('numpy')
+        fast = simulate(20000, seed=1, backend='numpy')
+        slow = simulate(1000, seed=1, backend='python')
+        assert abs(fast.sun_expansions / fast.turns - slow.sun_expansions / slow.turns) < 0.02
+        assert abs(fast.reached_end / fast.turns - slow.reached_end / slow.turns) < 0.03
+        assert abs(fast.turns / fast.games - slow.turns / slow.games) < 0.6
+
+    def test_unsupported_policy_raises(self):
+        pytest.importorskip('numpy')
+        with pytest.raises(ValueError):
+            simulate_batch(1, 0, 10, 'nonsense')
+
+
+# ---------------------------------------------------------------------------
+# Compact board
+# ---------------------------------------------------------------------------
+
+class TestCompactBoard:
+    """Tests for the byte-backed Board and its read-only cell views."""
+
+    def test_from_cards_round_trips(self):
+        grid = [['Sand', 'Wave', 'Shell'], ['Sun', 'Jellyfish', 'Flip-Flop']]
+        board = Board.from_cards(grid)
+        assert len(board) == 2
+        assert board.card_names() == grid
+        assert board.card(0, 2) == SHELL
+
+    def test_reveal_sets_row_bitmask(self):
+        board = Board.from_cards([['Sand', 'Wave', 'Shell']])
+        assert board.reveal(0, 1) == WAVE
+        assert board.revealed[0] == 0b010
+        assert board[0][1] == {'card': 'Wave', 'revealed': True}
+        assert not board.row_full(0)
+
+    def test_views_are_read_only(self):
+        board = Board.from_cards([['Sand', 'Wave', 'Shell']])
+        with pytest.raises(TypeError):
+            board[0][0]['revealed'] = True
+        with pytest.raises(TypeError):
+            board[0][0] = {'card': 'Shell', 'revealed': False}
+
+    def test_append_rows_adds_hidden_rows(self):
+        board = Board.from_cards([['Sand', 'Sand', 'Sand']])
+        board.append_rows([SHELL, SUN, WAVE])
+        assert len(board) == 2
+        assert [cell['card'] for cell in board[1]] == ['Shell', 'Sun', 'Wave']
+        assert not any(cell['revealed'] for cell in board[1])
+
+    def test_display_board_renders_revealed_cards(self, capsys):
+        game = ShellDashGame()
+        game.board = Board.from_cards([['Shell', 'Sand', 'Sand']] * 3)
+        game.board.reveal(0, 0)
+        game.display_board(0)
+        out = capsys.readouterr().out
+        assert 'Shell]' in out
+        assert '[B]' in out
+
+
+# ---------------------------------------------------------------------------
+# Partial deck draws
+# ---------------------------------------------------------------------------
+
+class TestDealCards:
+    """Tests for ShellDashGame.deal_cards() sampling only the cards it needs."""
+
+    def test_deals_requested_number_of_codes(self):
+        game = ShellDashGame(seed=3)
+        dealt = game.deal_cards(9)
+        assert len(dealt) == 9
+        assert all(0 <= code < len(game.cards) for code in dealt)
+
+    def test_full_deal_matches_deck_composition(self):
+        game = ShellDashGame(seed=3)
+        dealt = game.deal_cards(51)
+        assert [dealt.count(code) for code in range(len(game.cards))] == game.card_counts
+
+    def test_falls_back_to_sand_when_deck_runs_out(self):
+        game = ShellDashGame(seed=3)
+        dealt = game.deal_cards(55)
+        assert dealt.count(SAND) == game.card_counts[SAND] + 4
+
+    def test_card_frequencies_match_deck(self):
+        """Every board position sees each card type with probability count/51."""
+        game = ShellDashGame(seed=5)
+        trials = 6000
+        tally = [0] * len(game.cards)
+        for _ in range(trials):
+            for code in game.deal_cards(9):
+                tally[code] += 1
+        for code, count in enumerate(game.card_counts):
+            expected = trials * 9 * count / 51
+            assert abs(tally[code] - expected) < 5 * expected ** 0.5 + 5
+
+    def test_no_card_type_exceeds_deck_count(self):
+        game = ShellDashGame(seed=8)
+        for _ in range(200):
+            dealt = game.deal_cards(18)
+            for code, count in enumerate(game.card_counts):
+                assert dealt.count(code) <= count
+
+
+class TestCounterRandom:
+    """Tests for the counter-based deck stream and random-access boards."""
+
+    def test_draws_depend_only_on_seed_and_position(self):
+        rng = CounterRandom(7)
+        draws = [rng.random64() for _ in range(5)]
+        rng.seek(3)
+        assert rng.random64() == draws[3]
+        assert CounterRandom(7, counter=2).random64() == draws[2]
+        assert CounterRandom(8).random64() != draws[0]
+        assert all(0 <= d < 1 << 64 for d in draws)
+
+    def test_randrange_is_uniform(self):
+        rng = CounterRandom(1)
+        tally = [0] * 6
+        for _ in range(6000):
+            tally[rng.randrange(6)] += 1
+        assert all(abs(count - 1000) < 150 for count in tally)
+
+    def test_board_for_turn_matches_played_boards(self):
+        game = ShellDashGame(seed=12)
+        policy = LeftmostPolicy()
+        seen = []
+        while not game.check_winner():
+            seen.append((game.turn_index, game.rows, game.board.card_names()))
+            result = run_turn(game, policy)
+            if result.sun_expansions:
+                expanded = game.board_for_turn(game.turn_index - 1, 3, expanded=True)
+                assert len(expanded) == 6
+        for turn, rows, cards in reversed(seen):
+            assert game.board_for_turn(turn, rows).card_names() == cards
+
+    def test_turn_boards_do_not_depend_on_earlier_play(self):
+        a, b = ShellDashGame(seed=3), ShellDashGame(seed=3)
+        a.reveal(0)
+        a.turn_over = True
+        a.end_turn()
+        b.turn_index = 1
+        b.setup_board()
+        assert a.board.card_names() == b.board.card_names()
+
+
+class TestBoardPool:
+    """Tests for dealing boards ahead of time through a BoardPool."""
+
+    def play(self, pool=None):
+        game = ShellDashGame(seed=21)
+        if pool is not None:
+            pool.attach(game)
+        boards = []
+        while not game.check_winner():
+            if pool is not None:
+                pool.refill()
+            boards.append(game.board.card_names())
+            run_turn(game, LeftmostPolicy())
+        boards.append(game.board.card_names())
+        return boards
+
+    def test_pooled_games_deal_the_same_boards(self):
+        pool = BoardPool(background=False)
+        assert self.play(pool) == self.play()
+        stats = pool.stats()
+        assert stats['hits'] >= len(self.play()) - 2
+        assert stats['misses'] <= 1  # The board after a Sun is requested mid-turn, while this test isn't refilling
+
+    def test_unused_deals_are_discarded(self):
+        pool = BoardPool(background=False)
+        self.play(pool)
+        pool.refill()
+        assert len(pool.deals) <= 2  # Only what the finished game would have dealt next
+
+    def test_size_and_memory_caps_evict_oldest(self):
+        pool = BoardPool(max_size=3, background=False)
+        for deal in range(5):
+            pool.prefetch(1, deal, 9, [20, 10, 6, 6, 5, 4])
+            pool.refill()
+        assert sorted(deal for _, deal, _, _ in pool.deals) == [2, 3, 4]
+        assert pool.evictions == 2
+        
+        small = BoardPool(max_bytes=2 * (9 + shelldash.BOARD_POOL_ENTRY_BYTES), background=False)
+        for deal in range(4):
+            small.prefetch(1, deal, 9, [20, 10, 6, 6, 5, 4])
+        small.refill()
+        assert len(small.deals) == 2 and small.bytes <= small.max_bytes
+        assert small.take(1, 0, 9, [20, 10, 6, 6, 5, 4]) is None
+        assert small.misses == 1
+
+    def test_background_thread_deals_ahead(self):
+        import time
+        pool = BoardPool()
+        try:
+            game = ShellDashGame(seed=2)
+            pool.attach(game)
+            deadline = time.monotonic() + 5
+            while len(pool.deals) < 2 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            expected = game.board_for_turn(1).card_names()
+            game.turn_over = True
+            game.end_turn()
+            assert game.board.card_names() == expected
+            assert pool.hits == 1
+        finally:
+            pool.close()
+
+
+# ---------------------------------------------------------------------------
+# Exact win-probability calculator
+# ---------------------------------------------------------------------------
+
+class TestWinCalculator:
+    """Tests for the dynamic-programming WinCalculator."""
+
+    def test_turn_outcomes_sum_to_one(self):
+        calc = WinCalculator()
+        for rows, flip_flops in [(3, 0), (3, 2), (6, 1)]:
+            assert sum(calc.turn_outcomes(rows, flip_flops).values()) == pytest.approx(1.0)
+
+    def test_all_sand_deck_always_reaches_end(self):
+        calc = WinCalculator(card_counts=[51, 0, 0, 0, 0, 0])
+        assert calc.turn_outcomes(3, 0) == {TurnOutcome(0, 0, 0, 3, 0): 1.0}
+
+    def test_all_shell_deck_collects_a_shell_per_row(self):
+        calc = WinCalculator(card_counts=[0, 0, 0, 0, 0, 51])
+        assert calc.turn_outcomes(6, 0) == {TurnOutcome(6, 0, 0, 6, 0): 1.0}
+
+    def test_declining_flip_flops_never_spends_them(self):
+        calc = WinCalculator(use_flip_flop=False)
+        assert all(o.flip_flops_spent == 0 for o in calc.turn_outcomes(3, 4))
+
+    def test_turn_distribution_matches_engine(self):
+        calc = WinCalculator()
+        expected = sum(p for o, p in calc.turn_outcomes(3, 0).items() if o.shells == 0)
+        trials = 3000
+        misses = 0
+        for i in range(trials):
+            game = ShellDashGame(seed=i)
+            misses += run_turn(game, LeftmostPolicy()).shells_gained == 0
+        assert abs(misses / trials - expected) < 4 * (expected * (1 - expected) / trials) ** 0.5
+
+    def test_win_probabilities(self):
+        calc = WinCalculator(max_flip_flops=3)
+        p1, p2 = calc.win_probability()
+        assert p1 + p2 == pytest.approx(1.0)
+        assert 0.5 < p1 < 0.6  # Moving first is an advantage
+        assert calc.win_probability((2, 0), (0, 0), 1)[0] > p1
+        assert calc.win_probability((0, 3), (0, 0), 1) == (0.0, 1.0)
+
+
+# ---------------------------------------------------------------------------
+# Expectimax solver
+# ---------------------------------------------------------------------------
+
+class TestExpectimaxSolver:
+    """Tests for ExpectimaxSolver hints and the expectimax bot policy."""
+
+    solver = None
+
+    def _solver(self):
+        if TestExpectimaxSolver.solver is None:
+            TestExpectimaxSolver.solver = ExpectimaxSolver(WinCalculator(max_flip_flops=4))
+        return TestExpectimaxSolver.solver
+
+    def _make_game_with_board(self, cards_grid):
+        game = ShellDashGame()
+        game.rows = len(cards_grid)
+        game.board = Board.from_cards(cards_grid)
+        return game
+
+    def test_hint_recommends_a_hidden_column(self):
+        game = self._make_game_with_board([['Wave', 'Sand', 'Sand'], ['Sand'] * 3, ['Sand'] * 3])
+        game.reveal(0)
+        hint = self._solver().hint(game)
+        assert hint.action == 'reveal'
+        assert hint.column == 1
+        assert 0.0 < hint.win_probability < 1.0
+
+    def test_hint_for_pending_jellyfish(self):
+        game = self._make_game_with_board([['Jellyfish', 'Sand', 'Sand'], ['Sand'] * 3, ['Sand'] * 3])
+        game.shell_count = [2, 2]
+        game.flip_flop_count = [1, 0]
+        game.reveal(0)
+        hint = self._solver().hint(game)
+        # Opponent is one shell from winning, so pressing on is worth the Flip-Flop
+        assert hint.action == 'use_flip_flop'
+        assert hint.column is None
+
+    def test_repeated_positions_hit_cache(self):
+        solver = self._solver()
+        game = ShellDashGame(seed=12)
+        solver.hint(game)
+        hits = solver.cache_info().hits
+        solver.hint(ShellDashGame(seed=12))
+        assert solver.cache_info().hits > hits
+
+    def test_hint_after_turn_over_raises(self):
+        game = self._make_game_with_board([['Jellyfish', 'Sand', 'Sand']])
+        game.reveal(0)
+        with pytest.raises(ValueError):
+            self._solver().hint(game)
+
+    def test_expectimax_policy_plays_full_game(self):
+        policy = ExpectimaxPolicy(solver=self._solver())
+        winner = run_game(ShellDashGame(seed=4), [policy, policy])
+        assert winner in (1, 2)
+
+
+# ---------------------------------------------------------------------------
+# Policies in seats and tournaments
+# ---------------------------------------------------------------------------
+
+class TestPoliciesAndTournament:
+    """Tests for seat policies, game reuse and the round-robin tournament."""
+
+    def test_bot_seat_plays_turn_without_input(self, monkeypatch, capsys):
+        def no_input(prompt=''):
+            raise AssertionError("bot seat asked for input")
+        monkeypatch.setattr('builtins.input', no_input)
+        game = ShellDashGame(seed=1, players=[LeftmostPolicy(), None])
+        result = game.play_turn()
+        assert result.player == 1
+        assert "chooses A" in capsys.readouterr().out
+
+    def test_bot_picking_a_revealed_card_is_an_error(self, capsys):
+        class Stubborn(Policy):
+            name = 'stubborn'
+            
+            def choose_column(self, game):
+                return 0
+        
+        game = ShellDashGame(seed=1, players=[Stubborn(), None])
+        game.board.reveal(0, 0)
+        with pytest.raises(ValueError, match="'stubborn' chose column 0"):
+            game.play_turn()
+        game = ShellDashGame(seed=1, players=[LeftmostPolicy(), None])
+        game.players[0].choose_column = lambda game: 3
+        with pytest.raises(ValueError, match="'leftmost' chose column 3"):
+            game.play_turn()
+
+    def test_base_policy_is_abstract(self):
+        with pytest.raises(NotImplementedError):
+            Policy().choose_column(ShellDashGame())
+
+    def test_reset_reuses_game(self):
+        game = ShellDashGame(seed=5)
+        fresh_board = game.board.card_names()
+        run_game(game, [LeftmostPolicy(), LeftmostPolicy()])
+        game.reset(5)
+        assert game.shell_count == [0, 0]
+        assert game.current_player == 1
+        assert game.rows == 3
+        assert game.board.card_names() == fresh_board
+
+    def test_styling_is_shared_between_games(self):
+        assert ShellDashGame().card_colors is ShellDashGame().card_colors
+
+    def test_tournament_counts_every_game(self):
+        result = run_tournament(['leftmost', 'random'], 20, seed=3, batch_size=7)
+        assert result.games(0, 1) == 20
+        rate, (low, high) = result.win_rate(0, 1)
+        assert low <= rate <= high
+        assert sum(result.ratings()) == pytest.approx(3000)
+
+    def test_tournament_is_independent_of_batching(self):
+        a = run_tournament(['leftmost', 'random', 'leftmost'], 12, seed=9, batch_size=12)
+        b = run_tournament(['leftmost', 'random', 'leftmost'], 12, seed=9, batch_size=5, workers=2)
+        assert a.wins == b.wins
+
+    def test_stronger_record_gets_higher_rating(self):
+        result = TournamentResult(['a', 'b'])
+        result.wins = [[0, 70], [30, 0]]
+        elo_a, elo_b = result.ratings()
+        assert elo_a > elo_b
+        assert 'Elo' in result.report()
+
+
+# ---------------------------------------------------------------------------
+# Terminal rendering
+# ---------------------------------------------------------------------------
+
+class CountingStream:
+    def __init__(self):
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(text)
+
+    def flush(self):
+        pass
+
+
+class TestTerminalRenderer:
+    def test_frame_is_a_single_write(self):
+        stream = CountingStream()
+        game = ShellDashGame(seed=1)
+        game._renderer = TerminalRenderer(stream)
+        game.display_board(0)
+        assert len(stream.writes) == 1
+        assert stream.writes[0].count('\n') == len(game.render_board_lines(0))
+
+    def test_redraw_rewrites_only_changed_lines(self):
+        stream = CountingStream()
+        game = ShellDashGame(seed=1)
+        game._renderer = TerminalRenderer(stream)
+        game.display_board(0, clear_screen=True)
+        assert stream.writes[0].startswith('\033[H\033[2J')
+
+        game.board.reveal(1, 2)
+        game.display_board(1, clear_screen=True)
+        frame = stream.writes[1]
+        assert '\033[2J' not in frame
+        # Rows 1 and 2 change (marker moved, card revealed); borders and row 3 do not
+        assert frame.count('\033[K') == 2
+        assert '\033[4;1H' in frame and '\033[5;1H' in frame
+
+    def test_unchanged_redraw_writes_no_lines(self):
+        stream = CountingStream()
+        renderer = TerminalRenderer(stream)
+        renderer.draw(['a', 'b'])
+        renderer.draw(['a', 'b'])
+        assert stream.writes[1] == '\033[3;1H\033[J'
+
+    def test_play_turn_redraws_in_place_when_asked(self, capsys):
+        stream = CountingStream()
+        game = ShellDashGame(seed=3, players=[LeftmostPolicy(), LeftmostPolicy()])
+        game._renderer = TerminalRenderer(stream)
+        game.redraw = True
+        game.play_turn()
+        frames = stream.writes
+        assert len(frames) >= 2
+        assert frames[0].startswith('\033[H\033[2J') and "Player 1's Turn" in frames[0]
+        # The messages of each pick are carried into the next frame instead of scrolling
+        assert "You revealed" in frames[1]
+        assert "'s Turn" not in capsys.readouterr().out
+
+    def test_scrolling_play_turn_never_moves_the_cursor(self):
+        stream = CountingStream()
+        game = ShellDashGame(seed=3, players=[LeftmostPolicy(), LeftmostPolicy()])
+        game._renderer = TerminalRenderer(stream)
+        game.play_turn()
+        assert not any(';1H' in frame or '\033[2J' in frame for frame in stream.writes)
+
+    def test_resize_handler_is_only_installed_by_watch_resize(self, monkeypatch):
+        import signal
+        if not hasattr(signal, 'SIGWINCH'):
+            pytest.skip("no SIGWINCH on this platform")
+        monkeypatch.setattr(TerminalRenderer, '_handler_installed', False)
+        monkeypatch.setattr(TerminalRenderer, '_watching_resize', False)
+        monkeypatch.setattr(TerminalRenderer, '_size_stale', True)
+        before = signal.getsignal(signal.SIGWINCH)
+        try:
+            TerminalRenderer().terminal_width()
+            ShellDashGame().display_board()
+            assert signal.getsignal(signal.SIGWINCH) is before
+            assert TerminalRenderer.watch_resize()
+            assert signal.getsignal(signal.SIGWINCH) == TerminalRenderer._on_resize
+        finally:
+            signal.signal(signal.SIGWINCH, before)
+
+    def test_redraw_is_refused_outside_the_interactive_game(self, capsys):
+        with pytest.raises(SystemExit):
+            main(['--simulate', '10', '--redraw'])
+        assert "--redraw" in capsys.readouterr().err
+
+    def test_card_fragments_are_cached(self):
+        game = ShellDashGame()
+        text, width = game.card_fragment('Shell')
+        assert game.card_fragment('Shell')[0] is text
+        assert width == len('[🐚 Shell] ')
+
+
+# ---------------------------------------------------------------------------
+# Game server
+# ---------------------------------------------------------------------------
+
+def serve(client, **kwargs):
+    """Run client(connect) against a GameServer listening on localhost."""
+    async def run():
+        server = await GameServer(**kwargs).start()
+        port = server.sockets[0].getsockname()[1]
+        writers = []
+        
+        async def connect():
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writers.append(writer)
+            assert await reader.readline() == b"HELLO shelldash 1\n"
+            return reader, writer
+        
+        try:
+            return await client(connect)
+        finally:
+            for writer in writers:
+                writer.close()
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(run())
+
+
+async def send(conn, command):
+    """Send one command and return the reply line."""
+    reader, writer = conn
+    writer.write(command.encode() + b"\n")
+    return (await reader.readline()).decode().strip()
+
+
+async def hang_up(conn):
+    """Quit and wait for the server to close its side."""
+    reader, writer = conn
+    writer.write(b"QUIT\n")
+    await reader.read()
+    writer.close()
+
+
+async def play_vs_bot(connect, opponent='leftmost', latencies=None):
+    """Play a whole game against a bot, returning every line received (and timing each reply)."""
+    import time
+    
+    conn = await connect()
+    reader, writer = conn
+    writer.write(f"NEW {opponent}\n".encode())
+    transcript, tried = [], set()
+    sent = time.perf_counter()
+    while True:
+        line = (await reader.readline()).decode().strip()
+        if latencies is not None and sent is not None:
+            latencies.append(time.perf_counter() - sent)
+        sent = None
+        transcript.append(line)
+        kind, *fields = line.split()
+        if kind == 'TURN' and fields[0] == '1':
+            column = next(c for c in 'ABC' if (fields[1], c) not in tried)
+            tried.add((fields[1], column))
+            writer.write(f"PICK {column}\n".encode())
+            sent = time.perf_counter()
+        elif kind == 'FLIP' and fields[0] == '1':
+            writer.write(b"FLIP Y\n")
+            sent = time.perf_counter()
+        elif kind == 'END':
+            tried.clear()
+        elif kind == 'WIN':
+            await hang_up(conn)
+            return transcript
+
+
+class TestGameServer:
+    def test_game_against_bot_plays_to_a_winner(self):
+        transcript = serve(play_vs_bot, seed=11)
+        assert transcript[0] == 'GAME 0 1'
+        assert transcript[1] == 'TURN 1 1 3'
+        assert transcript[-1] in ('WIN 1', 'WIN 2')
+        assert any(line.startswith('REVEAL 2 ') for line in transcript)
+
+    def test_expectimax_opponent_is_solved_before_the_first_move(self):
+        latencies = []
+        
+        async def client(connect):
+            for _ in range(3):
+                transcript = await play_vs_bot(connect, 'expectimax', latencies)
+                assert transcript[-1] in ('WIN 1', 'WIN 2')
+        serve(client, seed=5)
+        # Solving the game takes seconds; after start() no reply should wait on it
+        assert max(latencies) < 0.3
+    
+    def test_seeded_server_deals_the_same_games(self):
+        assert serve(play_vs_bot, seed=11) == serve(play_vs_bot, seed=11)
+
+    def test_joined_players_share_a_game(self):
+        async def client(connect):
+            first, second = await connect(), await connect()
+            first[1].write(b"NAME Ada\n")  # No reply
+            assert await send(first, "JOIN room") == 'WAIT room'
+            assert await send(second, "JOIN room") == 'GAME 0 2'
+            assert (await second[0].readline()).strip() == b'TURN 1 1 3'
+            assert (await first[0].readline()).strip() == b'GAME 0 1'
+            assert (await first[0].readline()).strip() == b'TURN 1 1 3'
+            assert await send(second, "PICK A") == 'ERR Not your turn'
+            state = json.loads((await send(first, "STATE")).split(' ', 1)[1])
+            assert state['player_names'][0] == 'Ada'
+            assert state['board'][0] == [None, None, None]
+            reply = await send(first, "PICK B")
+            assert reply.startswith('REVEAL 1 1 B ')
+            assert (await second[0].readline()).decode().strip() == reply
+            await first[0].readline()  # Prompt for the next move
+            await hang_up(second)
+            assert (await first[0].readline()).decode().strip() == 'ERR Opponent disconnected'
+            assert await send(first, "PICK A") == 'ERR No game in progress; send NEW or JOIN'
+            await hang_up(first)
+        serve(client, seed=3)
+
+    def test_bad_commands_are_rejected(self):
+        async def client(connect):
+            conn = await connect()
+            assert await send(conn, "PICK A") == 'ERR No game in progress; send NEW or JOIN'
+            assert await send(conn, "NEW chess") == "ERR Unknown opponent 'chess'"
+            assert await send(conn, "DANCE") == "ERR Unknown command 'DANCE'"
+            assert await send(conn, "NEW human") == 'GAME 0 0'
+            assert (await conn[0].readline()).strip() == b'TURN 1 1 3'
+            assert await send(conn, "PICK Z") == 'ERR Choose a card from A-C'
+            assert await send(conn, "FLIP Y") == 'ERR No Jellyfish decision pending'
+            await hang_up(conn)
+        serve(client)
+
+    def test_server_refuses_games_beyond_its_limit(self):
+        async def client(connect):
+            first, second = await connect(), await connect()
+            assert await send(first, "NEW") == 'GAME 0 1'
+            await first[0].readline()
+            assert await send(second, "NEW") == 'ERR Server is full'
+            await hang_up(first)
+            await hang_up(second)
+        serve(client, max_sessions=1)
+
+
+def api(server, method, path, payload=None):
+    """Call the HTTP API handler directly, returning (status code, body)."""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    status, result = server.handle_request(method, path, body)
+    return int(status.split()[0]), result
+
+
+class TestHttpApi:
+    def test_moves_return_small_deltas(self):
+        server = GameServer(seed=4)
+        status, new = api(server, 'POST', '/api/new_game', {'names': ['Ann', 'Bo']})
+        assert status == 200
+        assert new['state']['player_names'] == ['Ann', 'Bo']
+        move = {'game': new['game'], 'token': new['token']}
+        
+        status, delta = api(server, 'POST', '/api/reveal', dict(move, col=1))
+        assert status == 200
+        assert 'board' not in delta
+        reveal = delta['events'][0]
+        assert (reveal['type'], reveal['row'], reveal['col']) == ('reveal', 0, 1)
+        status, state = api(server, 'GET', f"/api/state?game={new['game']}")
+        assert state['board'][0][1] == reveal['card']
+        assert state['current_row'] == delta['current_row']
+    
+    def test_hot_seat_game_plays_to_a_winner_and_is_forgotten(self):
+        server = GameServer(seed=8)
+        _, new = api(server, 'POST', '/api/new_game', {'opponent': 'human'})
+        move = {'game': new['game'], 'token': new['token']}
+        delta = {'winner': None, 'awaiting_flip_flop': False}
+        while delta['winner'] is None:
+            if delta['awaiting_flip_flop']:
+                status, delta = api(server, 'POST', '/api/use_flip_flop', dict(move, use=True))
+            else:
+                game = server.http_sessions[new['game']].game
+                col = next(c for c in range(3) if not game.board.is_revealed(game.current_row, c))
+                status, delta = api(server, 'POST', '/api/reveal', dict(move, col=col))
+            assert status == 200
+        assert delta['events'][-1] == {'type': 'win', 'player': delta['winner']}
+        assert api(server, 'GET', f"/api/state?game={new['game']}")[0] == 404
+        assert not server.sessions
+    
+    def test_win_is_declared_when_the_turn_ends(self):
+        server = GameServer(seed=2)
+        _, new = api(server, 'POST', '/api/new_game')
+        move = {'game': new['game'], 'token': new['token']}
+        game = server.http_sessions[new['game']].game
+        game.shell_count = [2, 0]
+        game.board = Board.from_cards([['Shell', 'Sand', 'Sand'], ['Sand'] * 3, ['Sand'] * 3])
+        
+        _, delta = api(server, 'POST', '/api/reveal', dict(move, col=0))
+        assert delta['shell_count'] == [3, 0]
+        assert delta['winner'] is None and delta['current_row'] == 1
+        api(server, 'POST', '/api/reveal', dict(move, col=0))
+        _, delta = api(server, 'POST', '/api/reveal', dict(move, col=0))
+        assert delta['winner'] == 1
+    
+    def test_bad_requests_are_rejected(self):
+        server = GameServer()
+        _, new = api(server, 'POST', '/api/new_game', {'opponent': 'random'})
+        move = {'game': new['game'], 'token': new['token']}
+        assert api(server, 'GET', '/api/nowhere')[0] == 404
+        assert api(server, 'GET', '/api/reveal')[0] == 405
+        assert api(server, 'POST', '/api/new_game', {'opponent': 'chess'})[0] == 400
+        assert server.handle_request('POST', '/api/reveal', b'{oops')[0].startswith('400')
+        assert api(server, 'POST', '/api/reveal', {'game': 99, 'token': 'x', 'col': 0})[0] == 404
+        assert api(server, 'POST', '/api/reveal', dict(move, token='x', col=0))[0] == 403
+        assert api(server, 'POST', '/api/reveal', dict(move, col=7)) == (409, {'error': "Column 7 is out of range"})
+        assert api(server, 'POST', '/api/use_flip_flop', dict(move, use=True))[0] == 409
+    
+    def test_idle_games_make_room_when_full(self):
+        server = GameServer(max_sessions=1, http_idle_timeout=3600)
+        assert api(server, 'POST', '/api/new_game')[0] == 200
+        assert api(server, 'POST', '/api/new_game')[0] == 503
+        server.http_idle_timeout = 0
+        assert api(server, 'POST', '/api/new_game')[0] == 200
+        assert len(server.sessions) == 1
+    
+    def test_requests_share_a_keep_alive_connection(self):
+        async def client():
+            server = await GameServer(seed=1).start_http()
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.sockets[0].getsockname()[1])
+            
+            async def call(method, path, payload=None):
+                body = json.dumps(payload).encode() if payload is not None else b''
+                writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                             f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+                head = (await reader.readuntil(b'\r\n\r\n')).decode()
+                length = int(head.lower().split('content-length:')[1].split()[0])
+                return head.split()[1], json.loads(await reader.readexactly(length))
+            
+            try:
+                status, new = await call('POST', '/api/new_game')
+                assert status == '200'
+                status, delta = await call('POST', '/api/reveal', {'game': new['game'], 'token': new['token'], 'col': 0})
+                assert status == '200' and delta['events']
+                status, state = await call('GET', f"/api/state?game={new['game']}")
+                assert status == '200' and state['shell_count'] == delta['shell_count']
+            finally:
+                writer.close()
+                server.close()
+                await server.wait_closed()
+        asyncio.run(client())
+
+
+# ---------------------------------------------------------------------------
+# Snapshots
+# ---------------------------------------------------------------------------
+
+class TestSnapshot:
+    def test_fresh_game_packs_into_a_few_dozen_bytes(self):
+        data = ShellDashGame(seed=1).snapshot()
+        assert len(data) == 47
+        assert data[0] == shelldash.SNAPSHOT_VERSION
+    
+    def test_restore_resumes_mid_turn_identically(self):
+        game = ShellDashGame(seed=6)
+        game.player_names = ['Ann', 'Bö']
+        game.flip_flop_count = [1, 0]
+        game.board = Board.from_cards([['Sun', 'Sand', 'Wave'], ['Jellyfish', 'Sand', 'Sand'], ['Shell'] * 3])
+        game.reveal(0)  # Sun: expands to 6 rows
+        game.reveal(0)  # Jellyfish with a Flip-Flop in hand
+        assert game.rows == 6 and game.awaiting_flip_flop
+        
+        copy = ShellDashGame().restore(game.snapshot())
+        assert copy.state() == game.state()
+        assert copy.board.card_names() == game.board.card_names()
+        assert copy.turn_result.sun_expansions == 1
+        
+        policies = [LeftmostPolicy(), LeftmostPolicy()]
+        for g in (game, copy):
+            g.use_flip_flop(True)
+            run_game(g, policies)
+        assert copy.state() == game.state()
+    
+    def test_snapshot_keeps_the_game_replayable(self):
+        game = ShellDashGame(seed=4)
+        run_turn(game, LeftmostPolicy())
+        board = game.board.card_names()
+        copy = ShellDashGame().restore(game.snapshot())
+        assert (copy.seed, copy.turn_index) == (game.seed, game.turn_index) == (4, 1)
+        assert game.board.card_names() == board
+        for g in (game, copy):
+            run_turn(g, LeftmostPolicy())
+        assert copy.board.card_names() == game.board.card_names()
+    
+    def test_version_1_snapshots_still_restore(self):
+        game = ShellDashGame(seed=6)
+        game.shell_count = [2, 1]
+        data = game.snapshot()
+        head = shelldash.SNAPSHOT_HEADS[1]
+        old = head.pack(1, *shelldash.SNAPSHOT_HEAD.unpack_from(data)[1:-5]) + data[shelldash.SNAPSHOT_HEAD.size:]
+        copy = ShellDashGame().restore(old)
+        assert copy.state() == game.state()
+        assert copy.turn_index == 0
+        assert copy.rules == STANDARD_RULES
+    
+    def test_snapshot_keeps_the_rules(self):
+        rules = RuleSet(win_shells=5, sun_rows=2, max_rows=7, card_counts=(40, 10, 6, 6, 5, 4))
+        game = ShellDashGame(seed=1, rules=rules)
+        run_turn(game, LeftmostPolicy())
+        copy = ShellDashGame().restore(game.snapshot())
+        assert copy.rules == rules
+        assert copy.state() == game.state()
+        for g in (game, copy):
+            run_game(g, [LeftmostPolicy(), LeftmostPolicy()])
+        assert copy.state() == game.state()
+        assert max(game.shell_count) == 5
+    
+    def test_bad_snapshots_are_rejected(self):
+        data = ShellDashGame(seed=1).snapshot()
+        with pytest.raises(ValueError, match="version"):
+            ShellDashGame().restore(b'\x09' + data[1:])
+        with pytest.raises(ValueError, match="Truncated"):
+            ShellDashGame().restore(data[:10])
+        with pytest.raises(ValueError, match="Truncated"):
+            ShellDashGame().restore(data[:-1])
+
+
+# ---------------------------------------------------------------------------
+# Event log
+# ---------------------------------------------------------------------------
+
+class TestEventLog:
+    def play_logged(self, path, game_id, seed):
+        game = ShellDashGame(seed=seed)
+        game.game_id = game_id
+        with EventLog(path) as log:
+            game.event_log = log
+            turns = []
+            while not turns or not turns[-1].winner:
+                turns.append(run_turn(game, LeftmostPolicy()))
+        return turns
+    
+    def test_records_every_move_and_turn_end(self, tmp_path):
+        path = str(tmp_path / 'games.sdev')
+        turns = self.play_logged(path, 7, seed=3)
+        records = list(read_events(path))
+        assert all(record.game == 7 for record in records)
+        
+        ends = [r for r in records if r.kind == shelldash.EVENT_TURN_END]
+        assert len(ends) == len(turns)
+        assert ends[-1].col == turns[-1].winner and ends[-1].a >= 3
+        reveals = [r for r in records if r.kind == shelldash.EVENT_REVEAL]
+        assert len(reveals) == sum(turn.reveals for turn in turns)
+        suns = [r for r in records if r.kind == shelldash.EVENT_SUN]
+        assert len(suns) == sum(turn.sun_expansions for turn in turns)
+        assert {shelldash.EFFECTS[r.b] for r in reveals if r.a == SUN} <= {'sun'}
+        assert {shelldash.EFFECTS[r.b] for r in reveals if r.a == SHELL} <= {'shell'}
+    
+    def test_reopening_appends_after_cutting_a_torn_record(self, tmp_path):
+        path = tmp_path / 'games.sdev'
+        self.play_logged(str(path), 1, seed=3)
+        first = list(read_events(str(path)))
+        with open(path, 'ab') as f:
+            f.write(b'\x01\x02\x03')  # Half-written record from a crash
+        assert list(read_events(str(path))) == first
+        
+        self.play_logged(str(path), 2, seed=4)
+        records = list(read_events(str(path), chunk_records=3))
+        assert records[:len(first)] == first
+        assert {r.game for r in records[len(first):]} == {2}
+    
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / 'notes.txt'
+        path.write_text('hello, world')
+        with pytest.raises(ValueError, match='not a Shell Dash event log'):
+            list(read_events(str(path)))
+        with pytest.raises(ValueError, match='not a Shell Dash event log'):
+            EventLog(str(path))
+    
+    def test_records_are_fixed_width(self, tmp_path):
+        path = tmp_path / 'one.sdev'
+        with EventLog(str(path)) as log:
+            log.record(5, shelldash.EVENT_SUN, 2, 1, 0, 6)
+        assert path.stat().st_size == shelldash.EVENT_LOG_HEADER.size + shelldash.EVENT_RECORD.size
+        assert list(read_events(str(path))) == [EventRecord(5, shelldash.EVENT_SUN, 2, 1, 0, 6, 0)]
+
+
+# ---------------------------------------------------------------------------
+# Seeded replay
+# ---------------------------------------------------------------------------
+
+class TestReplay:
+    def log_games(self, path, count, seed=1):
+        game = ShellDashGame(seed=seed, players=[RandomPolicy(2), LeftmostPolicy()])
+        winners = []
+        with EventLog(path) as log:
+            for index in range(count):
+                if index:
+                    game.reset()
+                log.attach(game, index)
+                run_game(game)
+                winners.append(game.check_winner())
+        return winners
+    
+    def test_every_game_has_a_seed_that_deals_it(self):
+        game = ShellDashGame()
+        assert ShellDashGame(seed=game.seed).board.card_names() == game.board.card_names()
+        game.reset()
+        assert ShellDashGame(seed=game.seed).board.card_names() == game.board.card_names()
+        assert ShellDashGame(seed=8).seed == 8
+    
+    def test_reset_without_a_seed_is_deterministic(self):
+        a, b = ShellDashGame(seed=4), ShellDashGame(seed=4)
+        a.reset()
+        b.reset()
+        assert a.seed == b.seed != 4
+        assert a.board.card_names() == b.board.card_names()
+    
+    def test_logged_games_replay_to_their_outcomes(self, tmp_path):
+        path = str(tmp_path / 'games.sdev')
+        winners = self.log_games(path, 5)
+        replays = list(replays_from_events(read_events(path)))
+        assert [winner for _, _, _, winner in replays] == winners
+        for seed, moves, shells, winner in replays:
+            assert set(moves) <= set('ABCYN')
+            assert replay_game(seed, moves) == (shells, winner)
+        assert verify_replays(replays).mismatches == []
+    
+    def test_unfinished_and_unseeded_games_are_skipped(self, tmp_path):
+        path = str(tmp_path / 'games.sdev')
+        with EventLog(path) as log:
+            game = ShellDashGame(seed=2)
+            log.attach(game, 1)
+            run_turn(game, LeftmostPolicy())  # Abandoned after one turn
+            other = ShellDashGame(seed=3)
+            other.event_log = log  # No seed recorded
+            run_game(other, [LeftmostPolicy(), LeftmostPolicy()])
+        assert list(replays_from_events(read_events(path))) == []
+    
+    def test_mismatches_are_reported(self):
+        assert replay_game(9, '') == ((0, 0), None)
+        replays = [(9, '', (0, 0), None), (9, '', (1, 0), None), (9, 'Q', (0, 0), None)]
+        report = verify_replays(replays, batch_size=2)
+        assert report.checked == 3
+        assert [m.index for m in report.mismatches] == [1, 2]
+        assert report.mismatches[1].actual.startswith("Move 1 (Q)")
+        assert "Mismatches:           2" in report.report()
+    
+    def test_moves_after_the_win_are_illegal(self, tmp_path):
+        path = str(tmp_path / 'games.sdev')
+        self.log_games(path, 1)
+        seed, moves, shells, winner = next(replays_from_events(read_events(path)))
+        with pytest.raises(ValueError, match="already won"):
+            replay_game(seed, moves + 'A')
+    
+    def test_pooled_check_matches_single_process(self, tmp_path):
+        path = str(tmp_path / 'games.sdev')
+        self.log_games(path, 6)
+        replays = list(replays_from_events(read_events(path)))
+        replays[4] = replays[4][:2] + ((0, 0), 1)
+        single = verify_replays(replays, workers=1, batch_size=2)
+        pooled = verify_replays(replays, workers=2, batch_size=2)
+        assert single.mismatches == pooled.mismatches
+        assert [m.index for m in pooled.mismatches] == [4]
+    
+    def test_cli_exit_status(self, tmp_path, capsys):
+        path = str(tmp_path / 'games.sdev')
+        self.log_games(path, 3)
+        assert main(['--verify-replays', path]) == 0
+        assert "Replays checked:      3" in capsys.readouterr().out
+
+
+# ---------------------------------------------------------------------------
+# Hooks and profiling
+# ---------------------------------------------------------------------------
+
+class TestHooks:
+    def test_hooks_observe_every_event(self):
+        game = ShellDashGame(seed=3)
+        seen = []
+        for name in shelldash.HOOK_NAMES:
+            game.add_hook(name, lambda g, *args, name=name: seen.append((name, args)))
+        run_game(game, [LeftmostPolicy(), LeftmostPolicy()])
+        turns = game.turn_index
+        names = [name for name, _ in seen]
+        assert names.count('on_turn_end') == turns
+        assert names.count('on_deal') == turns + names.count('on_sun_expand')
+        reveals = [args[0] for name, args in seen if name == 'on_reveal']
+        assert all(result.card in shelldash.CARD_NAMES for result in reveals)
+        game.render_board_lines()
+        assert seen[-1][0] == 'on_render' and seen[-1][1][0]
+    
+    def test_removing_the_last_hook_restores_the_fast_path(self):
+        game = ShellDashGame(seed=3)
+        def hook(g, result):
+            pass
+        game.add_hook('on_reveal', hook)
+        game.remove_hook('on_reveal', hook)
+        game.remove_hook('on_reveal', hook)  # Removing twice is harmless
+        assert game.hooks is None
+        with pytest.raises(ValueError, match="Unknown hook"):
+            game.add_hook('on_win', hook)
+
+
+class TestGameProfiler:
+    def test_counts_match_the_turn_results(self):
+        game = ShellDashGame(seed=8, players=[LeftmostPolicy(), RandomPolicy(1)])
+        profiler = GameProfiler()
+        profiler.attach(game)
+        profiler.attach(game)  # Attaching again must not time phases twice
+        results = []
+        while not results or not results[-1].winner:
+            results.append(run_turn(game))
+        counters = profiler.counters
+        assert counters['turns'] == len(results) and counters['games'] == 1
+        assert counters['reveals'] == sum(r.reveals for r in results)
+        assert counters['wave_retries'] == sum(r.wave_retries for r in results)
+        assert counters.get('sun_expansions', 0) == sum(r.sun_expansions for r in results)
+        assert profiler.phases['end_turn'][0] == len(results)
+        assert profiler.phases['deal'][0] == len(results)
+        assert profiler.phases['bot'][0] >= counters['reveals']
+        assert "reveals:" in profiler.report()
+    
+    def test_pooled_simulation_profiles_merge_exactly(self):
+        single = simulate(12, 'random', seed=5, workers=1, profile=True).profile
+        pooled = simulate(12, 'random', seed=5, workers=2, profile=True).profile
+        assert single.counters == pooled.counters
+        assert {p: s[0] for p, s in single.phases.items()} == {p: s[0] for p, s in pooled.phases.items()}
+        with pytest.raises(ValueError, match="python backend"):
+            simulate(12, backend='numpy', profile=True)
+    
+    def test_cli_writes_summary_and_json(self, tmp_path, capsys):
+        path = tmp_path / 'profile.json'
+        main(['--simulate', '5', '--seed', '1', '--profile', '--profile-json', str(path)])
+        assert "reveal" in capsys.readouterr().err
+        profile = json.loads(path.read_text())
+        assert profile['counters']['games'] == 5
+        assert profile['phases']['reveal']['calls'] == profile['counters']['reveals']
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+class TestMetrics:
+    def test_registry_renders_prometheus_text(self):
+        registry = MetricsRegistry()
+        registry.counter('moves_total', "Moves").value += 3
+        registry.gauge('active', "Active", function=lambda: 7)
+        latency = registry.histogram('latency_seconds', "Latency", (0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            latency.observe(value)
+        assert registry.counter('moves_total', "Moves").value == 3  # Same metric back
+        text = registry.render()
+        assert "# TYPE moves_total counter\nmoves_total 3\n" in text
+        assert "active 7\n" in text
+        assert 'latency_seconds_bucket{le="0.1"} 2\n' in text
+        assert 'latency_seconds_bucket{le="1.0"} 3\n' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 4\n' in text
+        assert "latency_seconds_count 4\n" in text
+        with pytest.raises(ValueError, match="already registered"):
+            registry.gauge('moves_total', "Moves")
+    
+    def test_sharded_simulation_metrics_merge_exactly(self):
+        single = simulate(30, 'random', seed=6, workers=1, metrics=GameMetrics())
+        pooled = simulate(30, 'random', seed=6, workers=2, metrics=GameMetrics())
+        assert single.metrics.registry.render() == pooled.metrics.registry.render()
+        assert single.metrics.games.value == 30
+        assert single.metrics.turns.value == single.turns
+        assert single.metrics.deals.value >= single.turns
+        assert "games 30" in single.metrics.summary()
+    
+    def test_server_counts_moves_and_latency(self):
+        metrics = GameMetrics()
+        server = GameServer(seed=4, metrics=metrics)
+        status, new = api(server, 'POST', '/api/new_game', {})
+        assert metrics.active_games.get() == 1
+        api(server, 'POST', '/api/reveal', {'game': new['game'], 'token': new['token'], 'col': 0})
+        assert metrics.moves.value >= 1
+        assert metrics.move_latency.count == 1
+        server.sessions[new['game']].game.snapshot()
+        assert metrics.snapshot_bytes.count == 1
+        
+        serve(play_vs_bot, seed=11, metrics=metrics)
+        assert metrics.games.value == 1
+        assert metrics.move_latency.count > 1
+    
+    def test_metrics_are_served_over_http(self):
+        import urllib.request
+        
+        metrics = GameMetrics()
+        metrics.moves.value += 5
+        server = metrics.registry.serve(port=0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url) as response:
+                assert "shelldash_moves_total 5" in response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+# ---------------------------------------------------------------------------
+# Variance-reduced estimates
+# ---------------------------------------------------------------------------
+
+class TestWinRateEstimate:
+    def test_coupled_layouts_differ_only_in_changed_slots(self):
+        base, more_shells, smaller = coupled_layouts([[20, 10, 6, 6, 5, 4], [19, 10, 6, 6, 5, 5],
+                                                      [20, 10, 6, 6, 5, 2]])
+        assert sum(a != b for a, b in zip(base, more_shells)) == 1
+        assert [smaller.count(code) for code in range(6)] == [20, 10, 6, 6, 5, 2]
+        assert sum(a != b for a, b in zip(base, smaller)) <= 2
+    
+    def test_deal_slots_deals_like_a_shuffled_deck(self):
+        layout = coupled_layouts([[20, 10, 6, 6, 5, 4]])[0]
+        key = CounterRandom(9).key
+        dealt, counter = deal_slots(key, 0, layout, 51)
+        assert sorted(dealt) == layout and counter == 17
+        assert deal_slots(key, 0, layout, 9)[0] == dealt[:9]
+        assert deal_slots(key, 0, layout, 60)[0][51:] == [SAND] * 9
+    
+    def test_seat_swapped_game_trades_boards(self):
+        layout = coupled_layouts([[20, 10, 6, 6, 5, 4]])[0]
+        plain = CoupledGame(layout)
+        swapped = CoupledGame(layout, swap_seats=True)
+        plain.reset(5)
+        swapped.reset(5)
+        assert swapped.board.codes != plain.board.codes
+        plain.turn_index = 1
+        plain.setup_board()
+        assert swapped.board.codes == plain.board.codes
+    
+    def test_strata_probabilities_sum_to_one(self):
+        probabilities = opening_strata_probabilities([20, 10, 6, 6, 5, 4])
+        assert len(probabilities) == 6
+        assert sum(probabilities) == pytest.approx(1.0)
+        # No Shells and no Suns in 6 cards from 51, 9 of them Shell or Sun
+        assert probabilities[0] == pytest.approx((42 * 41 * 40 / (51 * 50 * 49)) ** 2)
+    
+    def test_estimates_merge_exactly_across_workers(self):
+        variants = [[20, 10, 6, 6, 5, 4], [19, 10, 6, 6, 5, 5]]
+        kwargs = dict(seed=4, target_width=0.0, max_games=160, batch_size=10, stratify=True)
+        single = estimate_win_rates(variants, workers=1, **kwargs)
+        pooled = estimate_win_rates(variants, workers=2, **kwargs)
+        assert single.strata == pooled.strata
+        assert single.games == 160
+        rate, (low, high) = single.win_rate(1)
+        assert low <= rate <= high
+        diff, (low, high) = single.difference(1)
+        assert diff == pytest.approx(single.win_rate(1)[0] - single.win_rate(0)[0])
+        assert "vs variant 0" in single.report()
+    
+    def test_stops_at_the_target_width(self):
+        estimate = estimate_win_rates([[20, 10, 6, 6, 5, 4]], seed=2, target_width=0.15, batch_size=50)
+        assert estimate.width() <= 0.15
+        assert estimate.replicates == shelldash.ESTIMATE_MIN_REPLICATES
+        with pytest.raises(ValueError, match="Unknown policy"):
+            estimate_win_rates([[20, 10, 6, 6, 5, 4]], policy='chess')
+
+
+# ---------------------------------------------------------------------------
+# Turn tables
+# ---------------------------------------------------------------------------
+
+@pytest.fixture(scope='module')
+def turn_table():
+    return TurnTable('leftmost')
+
+
+class TestTurnTable:
+    def test_alias_table_reproduces_the_weights(self):
+        weights = [5, 1, 0, 3, 1]
+        cutoffs, aliases = build_alias_table(weights)
+        implied = [0.0] * len(weights)
+        for i, (cutoff, alias) in enumerate(zip(cutoffs, aliases)):
+            implied[i] += cutoff / len(weights)
+            implied[alias] += (1 - cutoff) / len(weights)
+        assert implied == pytest.approx([w / sum(weights) for w in weights])
+    
+    def test_matches_the_exact_turn_distributions(self, turn_table):
+        calc = WinCalculator()
+        assert dict(turn_table.outcomes[3, 1]) == calc.turn_outcomes(3, 1)
+        rng = random.Random(4)
+        draws = [turn_table.sample(3, 0, rng) for _ in range(20000)]
+        expected = sum(p for o, p in calc.turn_outcomes(3, 0).items() if o.shells == 0)
+        assert abs(sum(o.shells == 0 for o in draws) / len(draws) - expected) < 0.015
+        assert turn_table.sample(6, 40, rng) in dict(turn_table.outcomes[6, 6])
+    
+    def test_save_and_load_round_trip(self, turn_table, tmp_path):
+        path = tmp_path / 'leftmost.tt'
+        turn_table.save(path)
+        loaded = TurnTable.load(path)
+        assert loaded.outcomes == turn_table.outcomes
+        assert (loaded.policy, loaded.card_counts, loaded.cols) == ('leftmost', (20, 10, 6, 6, 5, 4), 3)
+        path.write_bytes(b'junk')
+        with pytest.raises(ValueError, match="not a Shell Dash turn table"):
+            TurnTable.load(path)
+        with pytest.raises(ValueError, match="can't be tabulated"):
+            TurnTable('expectimax')
+    
+    def test_sampled_games_match_engine_statistics(self, turn_table):
+        sampled = turn_table.simulate(20000, seed=3)
+        assert sampled.games == 20000 and sum(sampled.wins) == 20000
+        assert sum(sampled.shells_per_turn.values()) == sampled.turns
+        assert sampled.turns / sampled.games == pytest.approx(9.95, abs=0.2)
+        assert sampled.wins[0] / sampled.games == pytest.approx(0.535, abs=0.02)
+    
+    def test_numpy_backend_samples_the_same_distribution(self, turn_table):
+        pytest.importorskip('numpy')
+        fast = turn_table.simulate(50000, seed=3, backend='numpy')
+        assert fast.game_length.count == 50000
+        assert fast.turns / fast.games == pytest.approx(9.95, abs=0.15)
+        assert fast.sun_expansions / fast.turns == pytest.approx(0.097, abs=0.01)
+    
+    def test_verify_accepts_the_table_and_rejects_a_wrong_one(self, turn_table, tmp_path, capsys):
+        assert turn_table.verify(400, seed=1).ok
+        wrong = TurnTable('leftmost', card_counts=[14, 10, 6, 6, 5, 10], max_flip_flops=0)
+        wrong.card_counts = turn_table.card_counts
+        check = wrong.verify(400, seed=1)
+        assert not check.ok
+        assert "MISMATCH" in check.report()
+        path = tmp_path / 'leftmost.tt'
+        turn_table.save(path)
+        assert main(['--verify-turn-table', str(path), '--games', '200', '--seed', '2']) == 0
+        assert "matches the engine" in capsys.readouterr().out
+
+
+class TestRuleSet:
+    def test_rules_are_validated_values_with_a_stable_key(self):
+        assert RuleSet() == STANDARD_RULES
+        assert RuleSet(card_counts=[20, 10, 6, 6, 5, 4]).key() == STANDARD_RULES.key() == '9f0a3ec04d6b4ccf'
+        assert RuleSet(win_shells=4).key() != STANDARD_RULES.key()
+        assert STANDARD_RULES.row_sizes() == [3, 6]
+        assert RuleSet(rows=2, sun_rows=2, max_rows=7).row_sizes() == [2, 4, 6, 8]
+        with pytest.raises(ValueError):
+            RuleSet(card_counts=[1, 2, 3])
+        with pytest.raises(ValueError):
+            STANDARD_RULES._replace(win_shells=0)
+        with pytest.raises(ValueError, match="deck is too small"):
+            RuleSet(rows=6, max_rows=18)
+    
+    def test_rules_fit_the_board_and_snapshot_formats(self):
+        with pytest.raises(ValueError, match="cols must be between 1 and 8"):
+            RuleSet(cols=9, card_counts=(200, 10, 6, 6, 5, 4))
+        with pytest.raises(ValueError, match="255"):
+            RuleSet(card_counts=(256, 10, 6, 6, 5, 4))
+        with pytest.raises(ValueError, match="255 cards"):
+            RuleSet(rows=40, max_rows=40, cols=8, card_counts=(255,) * 6)
+    
+    def test_widest_board_plays_a_whole_game(self):
+        rules = RuleSet(cols=8, card_counts=(200, 10, 6, 6, 5, 4))
+        game = ShellDashGame(seed=1, rules=rules)
+        game.reveal(7)
+        assert game.board.is_revealed(0, 7)
+        game = ShellDashGame(seed=1, rules=rules)
+        assert run_game(game, [RandomPolicy(1), RandomPolicy(2)]) in (1, 2)
+        copy = ShellDashGame().restore(game.snapshot())
+        assert copy.state() == game.state()
+    
+    def test_game_plays_by_its_rules(self):
+        rules = RuleSet(rows=2, cols=4, max_rows=4, sun_rows=1, win_shells=1)
+        game = ShellDashGame(seed=8, rules=rules)
+        assert (game.rows, game.cols, len(game.board)) == (2, 4, 2)
+        assert game.board_for_turn(0).codes == game.board.codes
+        assert game.expand_board()
+        game.turn_result.sun_expansions += 1
+        assert game.expand_board() and game.rows == 4
+        assert not game.expand_board()
+        assert game.board.codes == game.board_for_turn(0, 2, expanded=2).codes
+        game.shell_count = [1, 0]
+        assert game.check_winner() == 1
+    
+    def test_messages_follow_the_rules(self, capsys):
+        rules = RuleSet(cols=4, sun_rows=2, max_rows=7, win_shells=5)
+        game = ShellDashGame(seed=2, rules=rules, players=[LeftmostPolicy(), LeftmostPolicy()])
+        game.play()
+        out = capsys.readouterr().out
+        assert "Collect 5 " in out and "choosing cards A, B, C, or D" in out
+        assert "with 2 more rows" in out and "3 more rows" not in out
+        
+        game = ShellDashGame(seed=2, rules=rules, players=[LeftmostPolicy(), None])
+        game.board = Board.from_cards([['Sun', 'Sand', 'Sand', 'Sand']] * 3)
+        game.play_turn()
+        assert "Sun card! Added 2 more rows. Total rows: 5" in capsys.readouterr().out
+    
+    def test_exact_solution_and_backends_agree_under_other_rules(self):
+        rules = RuleSet(rows=2, cols=4, max_rows=5, sun_rows=1, win_shells=2)
+        exact = WinCalculator(rules=rules).win_probability()[0]
+        engine = simulate(10000, seed=1, rules=rules)
+        assert engine.wins[0] / engine.games == pytest.approx(exact, abs=0.03)
+        table = TurnTable('leftmost', rules=rules)
+        assert table.simulate(20000, seed=2).wins[0] / 20000 == pytest.approx(exact, abs=0.02)
+        pytest.importorskip('numpy')
+        fast = simulate(50000, seed=1, rules=rules, backend='numpy')
+        assert fast.wins[0] / fast.games == pytest.approx(exact, abs=0.01)
+        assert fast.turns / fast.games == pytest.approx(engine.turns / engine.games, rel=0.03)
+    
+    def test_turn_table_file_keeps_the_rules(self, tmp_path):
+        rules = RuleSet(rows=2, sun_rows=2, win_shells=2)
+        path = tmp_path / 'rules.tt'
+        TurnTable('random', rules=rules, max_flip_flops=2).save(path)
+        loaded = TurnTable.load(path)
+        assert loaded.rules == rules
+        assert sorted({rows for rows, _ in loaded.outcomes}) == [2, 4, 6]
+    
+    def test_stats_survive_a_json_round_trip(self):
+        stats = simulate(50, seed=4)
+        copy = SimulationStats.from_dict(json.loads(json.dumps(stats.to_dict())))
+        assert copy.report() == stats.report()
+        assert copy.game_length_sketch.quantile(0.9) == stats.game_length_sketch.quantile(0.9)
+    
+    def test_sweep_caches_each_rule_set(self, tmp_path, capsys):
+        grid = rule_grid(win_shells=[1, 2])
+        assert grid == [RuleSet(win_shells=1), RuleSet(win_shells=2)]
+        with pytest.raises(ValueError, match="Unknown rule"):
+            rule_grid(colour=[1])
+        first = sweep(grid, 300, seed=5, cache_dir=str(tmp_path))
+        assert [p.cached for p in first] == [False, False]
+        assert first[1].stats.wins == simulate(300, seed=5, rules=grid[1]).wins
+        assert len(list(tmp_path.iterdir())) == 2
+        
+        again = sweep(grid + [RuleSet(win_shells=3)], 300, seed=5, cache_dir=str(tmp_path))
+        assert [p.cached for p in again] == [True, True, False]
+        assert again[0].stats.report() == first[0].stats.report()
+        assert not sweep(grid, 300, seed=6, cache_dir=str(tmp_path))[0].cached
+        
+        main(['--sweep', 'win_shells=1,2', '--games', '300', '--seed', '5', '--cache-dir', str(tmp_path)])
+        out = capsys.readouterr().out
+        assert "2 rule sets, 0 simulated, 2 from the cache" in out
+    
+    def test_sweep_needs_games(self, tmp_path, capsys):
+        with pytest.raises(ValueError, match="at least one game"):
+            sweep([STANDARD_RULES], 0, cache_dir=None)
+        with pytest.raises(SystemExit):
+            main(['--sweep', 'win_shells=2', '--games', '0', '--cache-dir', str(tmp_path)])
+        assert "--games of at least 1" in capsys.readouterr().err
+
+
+class TestGameStore:
+    @pytest.fixture
+    def store_path(self, tmp_path):
+        pytest.importorskip('numpy')
+        path = tmp_path / 'games'
+        with GameStore(str(path), 'a') as store:
+            self.stats = simulate(600, seed=11, store=store)
+        return str(path)
+    
+    def test_records_every_simulated_game_in_order(self, store_path):
+        store = GameStore(store_path)
+        stats = self.stats
+        assert len(store) == 600
+        assert int(store.column('seed')[7]) == derive_seed(11, 7)
+        assert int((store.column('winner') == 1).sum()) == stats.wins[0]
+        assert int(store.column('turns').sum()) == stats.turns
+        assert int(store.column('flip_flops_used').sum()) == stats.flip_flops_used
+        assert int(store.column('sun_expansions').sum()) == stats.sun_expansions
+        winners = store.column('winner')
+        shells = [store.column('shells_1'), store.column('shells_2')]
+        assert all(shells[w - 1][i] >= 3 for i, w in enumerate(winners.tolist()))
+        assert set(store.column('rows').tolist()) <= {3, 6}
+    
+    def test_recorder_follows_a_single_game(self):
+        game = ShellDashGame(seed=5)
+        records = GameRecords()
+        records.attach(game)
+        winner = run_game(game, [LeftmostPolicy(), LeftmostPolicy()])
+        assert len(records) == 1
+        row = {name: column[0] for name, column in records.columns.items()}
+        assert (row['seed'], row['winner'], row['turns']) == (5, winner, game.turn_index)
+        assert (row['shells_1'], row['shells_2'], row['rows']) == (*game.shell_count, game.rows)
+    
+    def test_out_of_range_seeds_are_stored_as_their_low_64_bits(self):
+        for seed in (-1, 1 << 64 | 9):
+            game = ShellDashGame(seed=seed)
+            records = GameRecords()
+            records.attach(game)
+            run_game(game, [LeftmostPolicy(), LeftmostPolicy()])
+            assert records.columns['seed'][0] == seed & shelldash.MASK64
+            replay = ShellDashGame(seed=records.columns['seed'][0])
+            assert replay.board.codes == ShellDashGame(seed=seed).board.codes
+    
+    def test_sums_of_large_seeds_are_exact(self, tmp_path):
+        np = pytest.importorskip('numpy')
+        path = str(tmp_path / 'games')
+        seeds = [2 ** 63 + 5, 2 ** 63 + 7, 2 ** 64 - 1]
+        rows = {name: np.ones(3, dtype=dtype) for name, dtype, _ in shelldash.GAME_STORE_COLUMNS}
+        rows['seed'] = np.array(seeds, dtype=np.uint64)
+        rows['winner'] = np.array([1, 1, 2], dtype=np.uint8)
+        rows['turns'] = np.full(3, 2 ** 32 - 1, dtype=np.uint32)
+        with GameStore(path, 'a') as store:
+            store.append(rows)
+        with GameStore(path) as store:
+            assert store.query([], [], ['sum:seed', 'sum:turns']).rows == [(sum(seeds), 3 * (2 ** 32 - 1))]
+            assert store.query([], ['winner'], ['sum:seed']).rows == [(1, seeds[0] + seeds[1]), (2, seeds[2])]
+            assert store.query([], ['seed'], ['sum:seed']).rows == [(seed, seed) for seed in seeds]
+    
+    def test_columns_grow_in_chunks(self, tmp_path, monkeypatch):
+        np = pytest.importorskip('numpy')
+        monkeypatch.setattr(shelldash, 'GAME_STORE_CHUNK_ROWS', 100)
+        path = str(tmp_path / 'games')
+        rows = {name: np.arange(150) % 7 + 1 for name, _, _ in shelldash.GAME_STORE_COLUMNS}
+        with GameStore(path, 'a') as store:
+            store.append(rows)
+            assert len(GameStore(path)) == 0  # Not visible until flushed
+        assert (tmp_path / 'games' / 'turns.col').stat().st_size == 200 * 4
+        with GameStore(path, 'a') as store:
+            store.append(rows)
+        reread = GameStore(path)
+        assert len(reread) == 300
+        assert reread.column('turns').tolist() == (np.arange(300) % 150 % 7 + 1).tolist()
+        assert (tmp_path / 'games' / 'seed.col').stat().st_size == 300 * 8
+        with pytest.raises(ValueError, match="read-only"):
+            reread.append(rows)
+    
+    def test_query_filters_groups_and_aggregates(self, store_path):
+        np = pytest.importorskip('numpy')
+        store = GameStore(store_path)
+        turns, winner, rows = store.column('turns'), store.column('winner'), store.column('rows')
+        result = store.query(['turns>=8', 'flip_flops_used!=0'], ['rows', 'winner'],
+                             ['count', 'mean:turns', 'min:turns', 'max:sun_expansions'], block_rows=128)
+        assert result.columns == ['rows', 'winner', 'count', 'mean:turns', 'min:turns', 'max:sun_expansions']
+        selected = (turns >= 8) & (store.column('flip_flops_used') != 0)
+        expected = []
+        for key in sorted(set(zip(rows[selected].tolist(), winner[selected].tolist()))):
+            group = selected & (rows == key[0]) & (winner == key[1])
+            expected.append(key + (int(group.sum()), float(turns[group].mean()), int(turns[group].min()),
+                                   int(store.column('sun_expansions')[group].max())))
+        assert result.rows == pytest.approx(expected)
+        assert store.query(['turns>=8', 'flip_flops_used!=0'], ['rows', 'winner'], workers=3,
+                           block_rows=64).rows == [row[:3] for row in result.rows]
+        
+        by_seed = store.query(['turns>=15'], ['seed'], block_rows=128)
+        assert by_seed.rows == [(seed, 1) for seed in sorted(store.column('seed')[turns >= 15].tolist())]
+        assert store.query(['turns<0'], aggregates=['count', 'mean:turns']).rows == [(0, None)]
+        with pytest.raises(ValueError, match="Unknown column"):
+            store.query(['colour=1'])
+        with pytest.raises(ValueError, match="Bad aggregate"):
+            store.query(aggregates=['median:turns'])
+    
+    def test_command_line_records_and_queries(self, tmp_path, capsys):
+        pytest.importorskip('numpy')
+        path = str(tmp_path / 'games')
+        main(['--simulate', '200', '--seed', '2', '--game-store', path])
+        main(['--simulate', '100', '--seed', '3', '--game-store', path, '--workers', '2'])
+        capsys.readouterr()
+        assert main(['--query', path, '--group-by', 'winner', '--where', 'turns>0', '--agg', 'count,sum:turns']) == 0
+        out = capsys.readouterr().out
+        assert out.splitlines()[0].split() == ['winner', 'count', 'sum:turns']
+        assert "300 games scanned" in out
+    
+    def test_game_store_is_refused_where_nothing_would_be_recorded(self, tmp_path, capsys):
+        path = tmp_path / 'games'
+        for mode in (['--serve', '0'], ['--tournament', 'leftmost,random'], ['--sweep', 'win_shells=2'],
+                     ['--simulate', '10', '--backend', 'numpy']):
+            with pytest.raises(SystemExit):
+                main(mode + ['--game-store', str(path)])
+            assert "--game-store" in capsys.readouterr().err
+        assert not path.exists()